@@ -6,7 +6,15 @@ from sqlalchemy import engine_from_config, pool
 
 # Import the Base and models
 from app.db import Base
-from app.models import Message  # noqa: F401 - Import to register models
+from app.models import (  # noqa: F401 - Import to register models
+    MESSAGE_SEARCH_COLUMN,
+    MESSAGE_SEARCH_INDEX,
+    IdempotencyKey,
+    JobCheckpoint,
+    Message,
+    TaskRecord,
+    TaskResult,
+)
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -27,6 +35,14 @@ if database_url:
     config.set_main_option("sqlalchemy.url", database_url)
 
 
+def include_object(_obj, name, type_, reflected, compare_to):
+    """Keep autogenerate from dropping schema objects that are not mapped on purpose."""
+    # Partitions of messages (migration 006) only exist in the database
+    if type_ == "table" and reflected and compare_to is None and name.startswith("messages_"):
+        return False
+    return name not in (MESSAGE_SEARCH_COLUMN, MESSAGE_SEARCH_INDEX)
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -43,6 +59,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -65,7 +82,11 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,49 @@
+"""task records
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '002'
+down_revision: Union[str, None] = '001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Create task_records table
+    op.create_table(
+        'task_records',
+        sa.Column('task_id', sa.String(length=36), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('state', sa.String(length=16), nullable=False),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('task_id')
+    )
+    op.create_index('ix_task_records_created_at', 'task_records', ['created_at'], unique=False)
+    op.create_index(
+        'ix_task_records_state_created_at', 'task_records', ['state', 'created_at'], unique=False
+    )
+    op.create_index(
+        'ix_task_records_name_created_at', 'task_records', ['name', 'created_at'], unique=False
+    )
+
+
+def downgrade() -> None:
+    # Drop task_records table
+    op.drop_index('ix_task_records_name_created_at', table_name='task_records')
+    op.drop_index('ix_task_records_state_created_at', table_name='task_records')
+    op.drop_index('ix_task_records_created_at', table_name='task_records')
+    op.drop_table('task_records')
@@ -0,0 +1,38 @@
+"""task results
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Create task_results table (shared Celery result backend)
+    op.create_table(
+        'task_results',
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('value', sa.Text(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(
+        op.f('ix_task_results_expires_at'), 'task_results', ['expires_at'], unique=False
+    )
+
+
+def downgrade() -> None:
+    # Drop task_results table
+    op.drop_index(op.f('ix_task_results_expires_at'), table_name='task_results')
+    op.drop_table('task_results')
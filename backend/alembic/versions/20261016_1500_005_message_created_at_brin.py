@@ -0,0 +1,42 @@
+"""message created_at brin index
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        # BRIN index for time-range scans on the append-only messages table
+        op.create_index(
+            'ix_messages_created_at',
+            'messages',
+            ['created_at'],
+            unique=False,
+            postgresql_using='brin',
+            postgresql_concurrently=True,
+        )
+        # Duplicates the primary key index; only costs writes
+        op.drop_index('ix_messages_id', table_name='messages', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_messages_id', 'messages', ['id'], unique=False, postgresql_concurrently=True
+        )
+        op.drop_index(
+            'ix_messages_created_at', table_name='messages', postgresql_concurrently=True
+        )
@@ -0,0 +1,141 @@
+"""partition messages by created_at
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from datetime import UTC, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _is_partitioned(connection) -> bool:
+    return bool(
+        connection.execute(
+            sa.text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+                "WHERE partrelid = to_regclass('messages'))"
+            )
+        ).scalar()
+    )
+
+
+def upgrade() -> None:
+    # init_db.py may already have partitioned the table
+    connection = op.get_bind()
+    if _is_partitioned(connection):
+        return
+
+    # The existing heap becomes the partition for everything before next month;
+    # the maintain_message_partitions beat task creates the partitions after it
+    now = datetime.now(UTC)
+    boundary = f"{now.year + now.month // 12:04d}-{now.month % 12 + 1:02d}-01 00:00:00"
+
+    # Index build and constraint validation without blocking writes. Re-runnable:
+    # an index left invalid by a failed concurrent build is dropped first.
+    with op.get_context().autocommit_block():
+        index_valid = connection.execute(
+            sa.text(
+                "SELECT indisvalid FROM pg_index "
+                "WHERE indexrelid = to_regclass('ix_messages_id_created_at')"
+            )
+        ).scalar()
+        if index_valid is False:
+            op.execute("DROP INDEX CONCURRENTLY ix_messages_id_created_at")
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_id_created_at "
+            "ON messages (id, created_at)"
+        )
+        op.execute(
+            "ALTER TABLE messages DROP CONSTRAINT IF EXISTS messages_created_at_before_partitions"
+        )
+        op.execute(
+            "ALTER TABLE messages ADD CONSTRAINT messages_created_at_before_partitions "
+            f"CHECK (created_at < '{boundary}') NOT VALID"
+        )
+        op.execute(
+            "ALTER TABLE messages VALIDATE CONSTRAINT messages_created_at_before_partitions"
+        )
+
+    op.execute("ALTER TABLE messages RENAME TO messages_legacy")
+    # A partition's primary key must match the parent's (id, created_at)
+    op.execute("ALTER TABLE messages_legacy DROP CONSTRAINT messages_pkey")
+    op.execute(
+        "ALTER TABLE messages_legacy ADD CONSTRAINT messages_legacy_pkey "
+        "PRIMARY KEY USING INDEX ix_messages_id_created_at"
+    )
+    op.execute("ALTER INDEX ix_messages_created_at RENAME TO ix_messages_legacy_created_at")
+    op.execute(
+        "ALTER INDEX ix_messages_search_vector RENAME TO ix_messages_legacy_search_vector"
+    )
+    op.execute(
+        """
+        CREATE TABLE messages (
+            id integer NOT NULL DEFAULT nextval('messages_id_seq'::regclass),
+            content varchar NOT NULL,
+            created_at timestamp without time zone NOT NULL,
+            search_vector tsvector
+                GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
+            CONSTRAINT messages_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages.id")
+    # Indexes matching the partitioned ones below are adopted, not rebuilt
+    op.execute(
+        "ALTER TABLE messages ATTACH PARTITION messages_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ('{boundary}')"
+    )
+    op.execute(
+        "ALTER TABLE messages_legacy DROP CONSTRAINT messages_created_at_before_partitions"
+    )
+    op.execute("CREATE INDEX ix_messages_created_at ON messages USING brin (created_at)")
+    op.execute("CREATE INDEX ix_messages_search_vector ON messages USING gin (search_vector)")
+    # Takes rows until the beat task has created the partitions covering them
+    op.execute("CREATE TABLE messages_default PARTITION OF messages DEFAULT")
+
+
+def downgrade() -> None:
+    if not _is_partitioned(op.get_bind()):
+        return
+
+    # Copies every row back into a plain table; slow on large tables
+    op.execute("ALTER TABLE messages RENAME TO messages_partitioned")
+    op.execute(
+        "ALTER TABLE messages_partitioned RENAME CONSTRAINT messages_pkey "
+        "TO messages_partitioned_pkey"
+    )
+    op.execute("ALTER INDEX ix_messages_created_at RENAME TO ix_messages_partitioned_created_at")
+    op.execute(
+        "ALTER INDEX ix_messages_search_vector RENAME TO ix_messages_partitioned_search_vector"
+    )
+    op.execute(
+        """
+        CREATE TABLE messages (
+            id integer NOT NULL DEFAULT nextval('messages_id_seq'::regclass),
+            content varchar NOT NULL,
+            created_at timestamp without time zone NOT NULL,
+            search_vector tsvector
+                GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
+            CONSTRAINT messages_pkey PRIMARY KEY (id)
+        )
+        """
+    )
+    op.execute(
+        "INSERT INTO messages (id, content, created_at) "
+        "SELECT id, content, created_at FROM messages_partitioned"
+    )
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages.id")
+    op.execute("DROP TABLE messages_partitioned CASCADE")
+    op.execute("CREATE INDEX ix_messages_created_at ON messages USING brin (created_at)")
+    op.execute("CREATE INDEX ix_messages_search_vector ON messages USING gin (search_vector)")
@@ -0,0 +1,36 @@
+"""job checkpoints
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-16 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Create job_checkpoints table (resume positions of chunked maintenance jobs)
+    op.create_table(
+        'job_checkpoints',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=True),
+        sa.Column('processed', sa.Integer(), nullable=False),
+        sa.Column('rows_per_second', sa.Float(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    # Drop job_checkpoints table
+    op.drop_table('job_checkpoints')
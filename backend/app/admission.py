@@ -0,0 +1,205 @@
+"""
+Queue-depth admission control for the enqueue endpoints.
+
+When workers fall behind, accepting more tasks only grows the RabbitMQ
+backlog until the broker hits its memory watermark and blocks every
+publisher, including the API. The enqueue endpoints instead check how many
+messages are waiting in the queue a task is routed to and refuse new work
+past a threshold:
+
+- ``ADMISSION_QUEUE_SOFT_LIMIT``: ``429 Too Many Requests``
+- ``ADMISSION_QUEUE_HARD_LIMIT``: ``503 Service Unavailable``
+
+Both carry a ``Retry-After`` estimated from how fast the queue has been
+draining. Depths come from passive queue declares (which only read the
+queue's counters), made by a background task every
+``ADMISSION_REFRESH_INTERVAL`` seconds over one long-lived broker connection,
+so the broker sees one round-trip per queue and interval no matter the
+request rate and requests never wait for it. If the
+broker cannot be reached, requests are admitted and the publish itself
+reports the error.
+"""
+import asyncio
+import contextlib
+from dataclasses import dataclass
+import logging
+import math
+import time
+
+from amqp.exceptions import ChannelError
+from celery import Task
+from fastapi import HTTPException, status
+
+from app.celery_app import celery_app
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class QueueDepth:
+    """Messages ready in a queue, and how fast it drained since the previous reading."""
+
+    messages: int
+    drain_rate: float | None = None
+
+
+class QueueDepthMonitor:
+    """Queue depths read from the broker with passive declares by a background task."""
+
+    def __init__(self, app=celery_app, refresh_interval: float = 1.0):
+        self.app = app
+        self.refresh_interval = refresh_interval
+        self._queues: set[str] = set()
+        self._depths: dict[str, QueueDepth] = {}
+        self._read_at: float | None = None
+        self._task: asyncio.Task | None = None
+        self._connection = None
+        self._channel = None
+
+    def read(self, queues) -> dict[str, int]:
+        """
+        Read the number of ready messages in each queue (blocking).
+
+        Reuses one connection and channel across reads; after a connection
+        error both are reopened by the next read.
+        """
+        try:
+            return {queue: self._read_queue(queue) for queue in queues}
+        except Exception:
+            self.close()
+            raise
+
+    def _read_queue(self, queue: str) -> int:
+        if self._connection is None:
+            self._connection = self.app.connection_for_read()
+        if self._channel is None:
+            self._channel = self._connection.channel()
+        try:
+            return self._channel.queue_declare(queue=queue, passive=True).message_count
+        except ChannelError:
+            # Not declared yet: nothing is waiting. The broker closed the channel.
+            self._discard_channel()
+            return 0
+
+    def _discard_channel(self) -> None:
+        channel, self._channel = self._channel, None
+        if channel is not None:
+            with contextlib.suppress(Exception):
+                channel.close()
+
+    def close(self) -> None:
+        """Close the broker connection; the next read opens a new one (blocking)."""
+        self._discard_channel()
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            with contextlib.suppress(Exception):
+                connection.release()
+
+    def watch(self, queue: str) -> None:
+        """Include ``queue`` in every refresh."""
+        self._queues.add(queue)
+
+    def depth(self, queue: str) -> QueueDepth | None:
+        """
+        Return the last depth read for ``queue``, without waiting for the broker.
+
+        Returns None if the depth is unknown: the broker could not be reached,
+        or ``queue`` was not read yet (it is watched from now on).
+        """
+        self.watch(queue)
+        return self._depths.get(queue)
+
+    def start(self) -> None:
+        """Refresh the depths every ``refresh_interval`` seconds in a background task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background refresh and close the broker connection."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await asyncio.to_thread(self.close)
+
+    async def _run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    async def refresh(self) -> None:
+        """Read the depths of every watched queue."""
+        previous, previous_at = self._depths, self._read_at
+        try:
+            depths = await asyncio.to_thread(self.read, sorted(self._queues))
+        except Exception:
+            logger.warning("Could not read queue depths from the broker", exc_info=True)
+            depths = {}
+        now = time.monotonic()
+
+        self._depths = {}
+        for queue, messages in depths.items():
+            drain_rate = None
+            if queue in previous and previous_at is not None and now > previous_at:
+                drain_rate = (previous[queue].messages - messages) / (now - previous_at)
+            self._depths[queue] = QueueDepth(messages, drain_rate)
+        self._read_at = now
+
+
+def task_queue(task: Task) -> str:
+    """Name of the queue ``task`` is routed to."""
+    return task.app.amqp.router.route({}, task.name)["queue"].name
+
+
+def retry_after(depth: QueueDepth, limit: int, maximum: int) -> int:
+    """Seconds until ``depth`` is expected to fall below ``limit`` at its drain rate."""
+    if not depth.drain_rate or depth.drain_rate <= 0:
+        return maximum
+    return max(1, min(maximum, math.ceil((depth.messages - limit + 1) / depth.drain_rate)))
+
+
+async def check_capacity(task: Task, monitor: QueueDepthMonitor) -> None:
+    """
+    Refuse to enqueue ``task`` while its queue is over the admission limits.
+
+    Raises:
+        HTTPException: 503 past ``ADMISSION_QUEUE_HARD_LIMIT``, 429 past
+            ``ADMISSION_QUEUE_SOFT_LIMIT``, each with ``Retry-After``
+    """
+    queue = task_queue(task)
+    depth = monitor.depth(queue)
+    if depth is None:
+        return
+
+    hard, soft = settings.ADMISSION_QUEUE_HARD_LIMIT, settings.ADMISSION_QUEUE_SOFT_LIMIT
+    if depth.messages >= hard:
+        limit, status_code = hard, status.HTTP_503_SERVICE_UNAVAILABLE
+    elif depth.messages >= soft:
+        limit, status_code = soft, status.HTTP_429_TOO_MANY_REQUESTS
+    else:
+        return
+
+    # Estimated from the limit that was hit: a 429 clears once below the soft limit
+    seconds = retry_after(depth, limit, settings.ADMISSION_RETRY_AFTER_MAX)
+    raise HTTPException(
+        status_code=status_code,
+        detail=f"Queue '{queue}' has {depth.messages} tasks waiting; retry later",
+        headers={"Retry-After": str(seconds)},
+    )
+
+
+def require_capacity(task: Task):
+    """FastAPI dependency applying ``check_capacity`` for ``task``, if enabled."""
+    # Read from the first refresh on, not from the first request
+    queue_depth_monitor.watch(task_queue(task))
+
+    async def dependency() -> None:
+        if settings.ADMISSION_CONTROL_ENABLED:
+            await check_capacity(task, queue_depth_monitor)
+
+    return dependency
+
+
+queue_depth_monitor = QueueDepthMonitor(refresh_interval=settings.ADMISSION_REFRESH_INTERVAL)
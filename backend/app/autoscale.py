@@ -0,0 +1,219 @@
+"""
+Queue-depth driven worker pool autoscaling.
+
+Celery's stock autoscaler sizes the pool from the tasks a worker has already
+reserved, which prefetch caps at a few per process: it cannot see a backlog
+building up in RabbitMQ. ``QueueDepthAutoscaler`` instead sizes the pool from:
+
+- backlog: ready messages in the queues the worker consumes (passive
+  declares, made every ``AUTOSCALE_INTERVAL`` by a ``QueueDepthReader``
+  thread so broker round-trips never block the worker) plus tasks
+  prefetched by the worker but not started yet
+- latency: how long the oldest of those prefetched tasks has been waiting
+  since it was published (``published_at`` header)
+
+It grows the pool right away to one process per ``AUTOSCALE_BACKLOG_PER_PROCESS``
+backlogged tasks (plus the busy ones), and by at least one process while
+latency exceeds ``AUTOSCALE_LATENCY_TARGET``. It only shrinks, one process at a
+time, once the backlog would fit in fewer processes at *half* that ratio and
+latency is under half the target for ``AUTOSCALE_SCALE_DOWN_DELAY`` seconds;
+the gap between the two thresholds keeps the pool from flapping.
+
+Celery calls ``maybe_scale`` on every task message and, with prefork and an
+event loop (RabbitMQ), from the worker's hub every ``keepalive`` seconds; the
+autoscaler sets ``keepalive`` to ``AUTOSCALE_INTERVAL`` and decides at most
+once per interval. Other pools call it from the autoscaler thread.
+
+Enable it with ``--autoscale=MAX,MIN`` on the worker command line. Decisions
+are logged and exposed, with their inputs, in the autoscaler section of
+``celery inspect stats`` (and Flower).
+"""
+import logging
+import math
+import threading
+import time
+
+from celery.worker import state
+from celery.worker.autoscale import Autoscaler
+
+from app.admission import QueueDepthMonitor
+from app.celery_app import PUBLISHED_AT_HEADER
+from app.config import settings
+from app.metrics import AUTOSCALER_BACKLOG, AUTOSCALER_DECISIONS, AUTOSCALER_PROCESSES
+
+logger = logging.getLogger(__name__)
+
+
+class QueueDepthReader(threading.Thread):
+    """Daemon thread reading the ready messages in a worker's queues every ``interval``."""
+
+    def __init__(self, app, queues, interval: float):
+        super().__init__(name="QueueDepthReader", daemon=True)
+        self.monitor = QueueDepthMonitor(app)
+        self.queues = sorted(queues)
+        self.interval = interval
+        self.queued = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            self.queued = self.read()
+            self._stopped.wait(self.interval)
+
+    def read(self) -> int:
+        """Ready messages in ``queues``, or 0 if unknown."""
+        try:
+            return sum(self.monitor.read(self.queues).values())
+        except Exception:
+            logger.warning("Autoscaler could not read queue depths", exc_info=True)
+            return 0
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+class QueueDepthAutoscaler(Autoscaler):
+    """Autoscaler that sizes the pool from broker queue depth and task wait time."""
+
+    def __init__(self, *args, **kwargs):
+        # The worker's hub calls maybe_scale every keepalive seconds
+        kwargs.setdefault("keepalive", settings.AUTOSCALE_INTERVAL)
+        super().__init__(*args, **kwargs)
+        self.interval = settings.AUTOSCALE_INTERVAL
+        self.backlog_per_process = settings.AUTOSCALE_BACKLOG_PER_PROCESS
+        self.latency_target = settings.AUTOSCALE_LATENCY_TARGET
+        self.scale_down_delay = settings.AUTOSCALE_SCALE_DOWN_DELAY
+        self.scale_ups = 0
+        self.scale_downs = 0
+        self.backlog = 0
+        self.latency: float | None = None
+        self.last_decision: dict | None = None
+        self._low_since: float | None = None
+        self._decided_at: float | None = None
+        self._reader: QueueDepthReader | None = None
+
+    def maybe_scale(self, req=None):  # noqa: ARG002 - Autoscaler signature
+        """Resize the pool for the current load, at most once per ``interval``."""
+        now = time.monotonic()
+        if self._decided_at is not None and now - self._decided_at < self.interval:
+            return
+        self._decided_at = now
+
+        waiting = self.waiting_requests()
+        self.backlog = self.queued_tasks() + len(waiting)
+        self.latency = self.waiting_latency(waiting, time.time())
+        target, reason = self.decide(
+            self.processes, len(state.active_requests), self.backlog, self.latency, now
+        )
+        self.apply(target, reason)
+        AUTOSCALER_PROCESSES.set(self.processes)
+        AUTOSCALER_BACKLOG.set(self.backlog)
+
+    def queued_tasks(self) -> int:
+        """Ready messages in the queues this worker consumes, as last read by the reader."""
+        if self._reader is None:
+            self._reader = QueueDepthReader(
+                self.worker.app, self.worker.app.amqp.queues.consume_from, self.interval
+            )
+            self._reader.start()
+        return self._reader.queued
+
+    def stop(self):
+        if self._reader is not None:
+            self._reader.stop()
+        super().stop()
+
+    @staticmethod
+    def waiting_latency(requests, now: float) -> float | None:
+        """Seconds the oldest of ``requests`` has waited since it was published."""
+        published = [
+            float(request.request_dict[PUBLISHED_AT_HEADER])
+            for request in requests
+            if request.request_dict.get(PUBLISHED_AT_HEADER) is not None
+        ]
+        return now - min(published) if published else None
+
+    @staticmethod
+    def waiting_requests() -> list:
+        """Requests prefetched by this worker that have not started yet."""
+        return [
+            request
+            for request in list(state.reserved_requests)
+            if request not in state.active_requests
+        ]
+
+    def decide(
+        self, processes: int, active: int, backlog: int, latency: float | None, now: float
+    ) -> tuple[int, str]:
+        """
+        Choose the pool size for the current load.
+
+        Returns:
+            ``(target_processes, reason)``; the target equals ``processes``
+            when nothing should change
+        """
+        wanted = active + math.ceil(backlog / self.backlog_per_process)
+        target = min(max(wanted, self.min_concurrency), self.max_concurrency)
+        reason = "backlog"
+        if latency is not None and latency > self.latency_target:
+            target = max(target, min(processes + 1, self.max_concurrency))
+            reason = "latency"
+        if target > processes:
+            self._low_since = None
+            return target, reason
+
+        # Lower watermark: twice the backlog per process, half the latency target
+        relaxed = active + math.ceil(2 * backlog / self.backlog_per_process)
+        idle = (
+            max(relaxed, self.min_concurrency) < processes
+            and (latency is None or latency < self.latency_target / 2)
+        )
+        if not idle:
+            self._low_since = None
+            return processes, "steady"
+        if self._low_since is None:
+            self._low_since = now
+        if now - self._low_since < self.scale_down_delay:
+            return processes, "cooldown"
+        self._low_since = now  # Wait a full delay again before the next step down
+        return processes - 1, "idle"
+
+    def apply(self, target: int, reason: str) -> None:
+        """Resize the pool to ``target`` processes and record the decision."""
+        processes = self.processes
+        if target == processes:
+            return
+        if target > processes:
+            self.scale_up(target - processes)
+            self.scale_ups += 1
+        else:
+            self._shrink(processes - target)
+            self.scale_downs += 1
+        self.pool.maintain_pool()
+        AUTOSCALER_DECISIONS.labels("up" if target > processes else "down", reason).inc()
+        self.last_decision = {
+            "from": processes,
+            "to": target,
+            "reason": reason,
+            "backlog": self.backlog,
+            "latency": self.latency,
+            "at": time.time(),
+        }
+        logger.info(
+            "Autoscaler: %d -> %d processes (%s; backlog=%d, latency=%s)",
+            processes,
+            target,
+            reason,
+            self.backlog,
+            "n/a" if self.latency is None else f"{self.latency:.1f}s",
+        )
+
+    def info(self):
+        return {
+            **super().info(),
+            "backlog": self.backlog,
+            "latency": self.latency,
+            "scale_ups": self.scale_ups,
+            "scale_downs": self.scale_downs,
+            "last_decision": self.last_decision,
+        }
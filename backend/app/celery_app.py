@@ -1,4 +1,9 @@
+from dataclasses import dataclass
+import time
+
 from celery import Celery
+from celery.signals import before_task_publish, worker_init
+from kombu import Queue
 
 from app.config import settings
 
@@ -6,9 +11,53 @@ celery_app = Celery(
     "worker",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
-    include=["app.tasks"],
+    include=["app.tasks", "app.task_records", "app.metrics", "app.tracing"],
 )
 
+# Named queues, so a burst of long jobs cannot occupy the worker slots and
+# prefetch buffers that user-facing message creation needs. Start workers
+# bound to queues with ``-Q`` (see docker-compose.yml); a worker without
+# ``-Q`` consumes all of them.
+DEFAULT_QUEUE = "celery"
+MESSAGES_QUEUE = "messages"
+LONG_QUEUE = "long"
+MAINTENANCE_QUEUE = "maintenance"
+
+
+@dataclass(frozen=True, slots=True)
+class QueuePolicy:
+    """
+    How tasks of a queue are delivered.
+
+    Attributes:
+        prefetch_multiplier: Messages reserved per worker process; 1 keeps long
+            jobs from queueing up behind a busy process
+        acks_late: Acknowledge after the task ran, so it is redelivered if the
+            worker dies; only safe for tasks that can run twice
+    """
+
+    prefetch_multiplier: int
+    acks_late: bool
+
+
+QUEUE_POLICIES = {
+    DEFAULT_QUEUE: QueuePolicy(prefetch_multiplier=4, acks_late=False),
+    # Inserts are not idempotent, so a redelivery would duplicate the message
+    MESSAGES_QUEUE: QueuePolicy(prefetch_multiplier=4, acks_late=False),
+    LONG_QUEUE: QueuePolicy(prefetch_multiplier=1, acks_late=True),
+    MAINTENANCE_QUEUE: QueuePolicy(prefetch_multiplier=1, acks_late=True),
+}
+
+TASK_ROUTES = {
+    "app.tasks.create_message_task": MESSAGES_QUEUE,
+    "app.tasks.create_messages_bulk_task": MESSAGES_QUEUE,
+    "app.tasks.slow_task": LONG_QUEUE,
+    "app.tasks.maintain_message_partitions": MAINTENANCE_QUEUE,
+    "app.tasks.purge_expired_messages": MAINTENANCE_QUEUE,
+    "app.tasks.cleanup_idempotency_keys": MAINTENANCE_QUEUE,
+    "celery.backend_cleanup": MAINTENANCE_QUEUE,
+}
+
 # Celery configuration
 celery_app.conf.update(
     task_serializer="json",
@@ -20,4 +69,78 @@ celery_app.conf.update(
     task_time_limit=30 * 60,  # 30 minutes
     task_soft_time_limit=25 * 60,  # 25 minutes
     broker_connection_retry_on_startup=True,
+    # Emit task events so the API can track task states without inspect() broadcasts
+    worker_send_task_events=True,
+    task_send_sent_event=True,
+    # Producer connection pool shared by the API's publishing threads
+    broker_pool_limit=settings.TASK_PUBLISH_POOL_SIZE,
+    result_expires=settings.CELERY_RESULT_EXPIRES,
+    task_default_queue=DEFAULT_QUEUE,
+    task_queues=[Queue(name, routing_key=name) for name in QUEUE_POLICIES],
+    task_routes={name: {"queue": queue} for name, queue in TASK_ROUTES.items()},
+    # Only used when a worker is started with --autoscale=MAX,MIN
+    worker_autoscaler="app.autoscale:QueueDepthAutoscaler",
+    task_annotations={
+        name: {"acks_late": QUEUE_POLICIES[queue].acks_late}
+        for name, queue in TASK_ROUTES.items()
+    },
+    beat_schedule={
+        # Replaces (same name) the daily entry beat installs for backends without
+        # native expiry, e.g. the default app.result_backend:SQLResultBackend
+        "celery.backend_cleanup": {
+            "task": "celery.backend_cleanup",
+            "schedule": settings.RESULT_CLEANUP_INTERVAL,
+        },
+        # Creates upcoming messages partitions and drops expired ones
+        "maintain-message-partitions": {
+            "task": "app.tasks.maintain_message_partitions",
+            "schedule": settings.MESSAGE_PARTITION_MAINTENANCE_INTERVAL,
+        },
+        # Deletes messages past MESSAGE_RETENTION_DAYS in small chunks
+        "purge-expired-messages": {
+            "task": "app.tasks.purge_expired_messages",
+            "schedule": settings.MESSAGE_PURGE_INTERVAL,
+            # A run that waited a whole interval in the queue is superseded by the next one
+            "options": {"expires": settings.MESSAGE_PURGE_INTERVAL},
+        },
+        # Deletes expired Idempotency-Key records
+        "cleanup-idempotency-keys": {
+            "task": "app.tasks.cleanup_idempotency_keys",
+            "schedule": settings.IDEMPOTENCY_CLEANUP_INTERVAL,
+        },
+    },
 )
+
+if settings.CELERY_PUBLISH_CONFIRMS:
+    celery_app.conf.broker_transport_options = {"confirm_publish": True}
+
+
+# Task message header holding the publish time (Unix seconds), for queue wait measurements
+PUBLISHED_AT_HEADER = "published_at"
+
+
+@before_task_publish.connect
+def stamp_publish_time(headers=None, **_kwargs) -> None:
+    """Record when each task was published in its message headers."""
+    if headers is not None:
+        headers.setdefault(PUBLISHED_AT_HEADER, time.time())
+
+
+@worker_init.connect
+def apply_queue_prefetch(sender, **_kwargs) -> None:
+    """
+    Use the smallest prefetch multiplier of the queues a worker consumes.
+
+    Celery's prefetch is per worker, not per queue, so binding workers to
+    queues with ``-Q`` is what gives each queue its own prefetch. An explicit
+    ``--prefetch-multiplier`` is left alone.
+    """
+    if sender.prefetch_multiplier != sender.app.conf.worker_prefetch_multiplier:
+        return
+    multipliers = [
+        QUEUE_POLICIES[name].prefetch_multiplier
+        for name in sender.app.amqp.queues.consume_from
+        if name in QUEUE_POLICIES
+    ]
+    if multipliers:
+        sender.prefetch_multiplier = min(multipliers)
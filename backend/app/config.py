@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -17,7 +19,95 @@ class Settings(BaseSettings):
     # RabbitMQ & Celery
     RABBITMQ_URL: str
     CELERY_BROKER_URL: str
-    CELERY_RESULT_BACKEND: str
+    CELERY_RESULT_BACKEND: str = "app.result_backend:SQLResultBackend"
+    # Seconds results are kept by the result backend, and how often beat sweeps expired ones
+    CELERY_RESULT_EXPIRES: int = 24 * 60 * 60
+    RESULT_CLEANUP_INTERVAL: int = 5 * 60
+    # Producer connections kept for publishing; also the number of publishing threads
+    TASK_PUBLISH_POOL_SIZE: int = 8
+    # Wait for RabbitMQ publisher confirms before a publish is considered done
+    CELERY_PUBLISH_CONFIRMS: bool = False
+
+    # Task registry fed by Celery events (backs GET /tasks/)
+    TASK_EVENTS_ENABLED: bool = True
+    # Finished tasks are evicted first; in-flight ones only past the hard cap
+    TASK_REGISTRY_MAX_TASKS: int = 10_000
+    TASK_REGISTRY_MAX_IN_FLIGHT: int = 100_000
+
+    # Persistent task lifecycle records (backs GET /tasks/history)
+    TASK_RECORDS_ENABLED: bool = True
+    TASK_RECORDS_BATCH_SIZE: int = 500
+    TASK_RECORDS_FLUSH_INTERVAL_MS: int = 500
+
+    # Admission control on the enqueue endpoints: ready messages in the task's queue
+    # above which requests get 429 (soft) or 503 (hard), read every refresh interval
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_QUEUE_SOFT_LIMIT: int = 10_000
+    ADMISSION_QUEUE_HARD_LIMIT: int = 50_000
+    ADMISSION_REFRESH_INTERVAL: float = 1.0
+    ADMISSION_RETRY_AFTER_MAX: int = 60
+
+    # Worker pool autoscaling (app/autoscale.py, enabled with --autoscale=MAX,MIN):
+    # queued tasks per process, oldest-task wait target and scale-down hysteresis, in seconds
+    AUTOSCALE_INTERVAL: float = 5.0
+    AUTOSCALE_BACKLOG_PER_PROCESS: int = 10
+    AUTOSCALE_LATENCY_TARGET: float = 5.0
+    AUTOSCALE_SCALE_DOWN_DELAY: float = 60.0
+
+    # Prometheus metrics (app/metrics.py): GET /metrics on the API; workers serve theirs
+    # on WORKER_METRICS_PORT when set
+    METRICS_ENABLED: bool = True
+    WORKER_METRICS_PORT: int | None = None
+
+    # Tracing from request to task to SQL (app/tracing.py); the exporter is a
+    # "module:Class" path, JsonFileExporter appends spans to TRACING_FILE
+    TRACING_ENABLED: bool = False
+    TRACING_EXPORTER: str = "app.tracing:JsonFileExporter"
+    TRACING_FILE: str = "traces.jsonl"
+
+    # Task batching
+    TASK_BATCH_MAX_SIZE: int = 1000
+    # Concurrent per-task lookups for POST /tasks/status on backends without multi-get
+    TASK_STATUS_LOOKUP_CONCURRENCY: int = 8
+    MESSAGE_BULK_MAX_SIZE: int = 100_000
+
+    # GET /messages/{id} cache (TTLs in seconds; missing = ids that were not found)
+    MESSAGE_CACHE_SIZE: int = 10_000
+    MESSAGE_CACHE_TTL: float = 60.0
+    MESSAGE_CACHE_MISSING_TTL: float = 2.0
+    # "local" (this process only) or "events" (all replicas, via Celery events)
+    MESSAGE_CACHE_INVALIDATOR: Literal["local", "events"] = "local"
+    # Serialized GET /messages/ pages shared by all clients of an API process
+    MESSAGE_PAGE_CACHE_SIZE: int = 1000
+    MESSAGE_PAGE_CACHE_TTL: float = 2.0
+
+    # Range partitioning of messages on created_at (PostgreSQL, migration 006 or
+    # init_db.py); see app/partitions.py
+    MESSAGE_PARTITION_INTERVAL: Literal["day", "week", "month"] = "month"
+    MESSAGE_PARTITIONS_AHEAD: int = 3
+    MESSAGE_PARTITION_MAINTENANCE_INTERVAL: int = 60 * 60
+    # Drop messages older than this many days (None keeps everything)
+    MESSAGE_RETENTION_DAYS: int | None = None
+    # Chunked purge of rows past retention (app/retention.py): ids per chunk, pause
+    # between chunks, and the time budget of each run
+    MESSAGE_PURGE_INTERVAL: int = 15 * 60
+    MESSAGE_PURGE_CHUNK_SIZE: int = 5000
+    MESSAGE_PURGE_PAUSE_MS: int = 100
+    MESSAGE_PURGE_MAX_SECONDS: int = 10 * 60
+
+    # Idempotency-Key on POST /tasks/ and POST /messages/: seconds a key is remembered,
+    # plus an in-process cache of completed responses in front of the table
+    IDEMPOTENCY_KEY_TTL: int = 24 * 60 * 60
+    # Seconds an unfinished claim blocks retries (409) before a retry may take it over
+    IDEMPOTENCY_IN_PROGRESS_TIMEOUT: int = 30
+    IDEMPOTENCY_CACHE_SIZE: int = 10_000
+    IDEMPOTENCY_CACHE_TTL: float = 5 * 60
+    IDEMPOTENCY_CLEANUP_INTERVAL: int = 60 * 60
+
+    # Worker group commit for create_message_task (requires a thread pool worker)
+    MESSAGE_GROUP_COMMIT: bool = False
+    MESSAGE_GROUP_COMMIT_MAX_SIZE: int = 100
+    MESSAGE_GROUP_COMMIT_MAX_WAIT_MS: int = 10
 
 
 settings = Settings()
@@ -1,7 +1,25 @@
-from sqlalchemy import select
+from collections.abc import AsyncIterator
+from datetime import datetime, timedelta
+
+from sqlalchemy import (
+    Float,
+    Integer,
+    Row,
+    and_,
+    cast,
+    func,
+    insert,
+    literal,
+    literal_column,
+    or_,
+    select,
+    tuple_,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import Message
+from app.helpers import utc_now_naive
+from app.models import MESSAGE_SEARCH_COLUMN, MESSAGE_SEARCH_CONFIG, Message, TaskRecord
 from app.schemas import MessageCreate
 
 
@@ -14,7 +32,274 @@ async def create_message(db: AsyncSession, message: MessageCreate) -> Message:
     return db_message
 
 
-async def list_messages(db: AsyncSession, skip: int = 0, limit: int = 100) -> list[Message]:
-    """List messages from the database (async)."""
-    result = await db.execute(select(Message).offset(skip).limit(limit))
+async def get_message(db: AsyncSession, message_id: int) -> Message | None:
+    """Get a message by id, or None if it does not exist (async)."""
+    return await db.get(Message, message_id)
+
+
+async def list_messages(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> list[Message]:
+    """
+    List messages ordered by id from the database (async).
+
+    ``since``/``until`` bound ``created_at`` and prune partitions.
+    """
+    query = select(Message).order_by(Message.id).offset(skip).limit(limit)
+    result = await db.execute(_created_between(query, since, until))
+    return list(result.scalars().all())
+
+
+def _created_between(query, since: datetime | None, until: datetime | None):
+    """
+    Restrict a messages query to ``since <= created_at < until``.
+
+    On a partitioned ``messages`` table (see ``app.partitions``) PostgreSQL
+    then only scans the partitions covering that range.
+    """
+    if since is not None:
+        query = query.where(Message.created_at >= since)
+    if until is not None:
+        query = query.where(Message.created_at < until)
+    return query
+
+
+async def list_messages_after(
+    db: AsyncSession,
+    after_id: int | None = None,
+    limit: int = 100,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> list[Message]:
+    """
+    List messages ordered by id, starting after ``after_id`` (async).
+
+    Keyset pagination: seeks on the primary key index instead of scanning and
+    discarding ``OFFSET`` rows, so every page costs the same regardless of depth.
+    ``since``/``until`` bound ``created_at`` and prune partitions.
+    """
+    query = _created_between(select(Message).order_by(Message.id).limit(limit), since, until)
+    if after_id is not None:
+        query = query.where(Message.id > after_id)
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+
+async def message_window_stats(
+    db: AsyncSession,
+    *,
+    skip: int = 0,
+    after_id: int | None = None,
+    limit: int = 100,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> tuple[int, int | None, int | None]:
+    """
+    Return ``(count, min_id, max_id)`` of the ids a page query would return (async).
+
+    Reads only the primary key index (and ``created_at`` with ``since``/``until``),
+    so it is much cheaper than fetching the page. Messages are never updated in
+    place, so the triple changes whenever the page content does and serves as a
+    validator for conditional GETs.
+    """
+    window = select(Message.id).order_by(Message.id).offset(skip).limit(limit)
+    if after_id is not None:
+        window = window.where(Message.id > after_id)
+    window = _created_between(window, since, until).subquery()
+    result = await db.execute(select(func.count(), func.min(window.c.id), func.max(window.c.id)))
+    return tuple(result.one())
+
+
+async def search_messages(
+    db: AsyncSession,
+    query: str,
+    before: tuple[float, int] | None = None,
+    limit: int = 20,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> list[Row]:
+    """
+    Full-text search over message content, best match first (async).
+
+    On PostgreSQL, ``query`` uses web search syntax (``"exact phrase"``, ``or``,
+    ``-excluded``) against the GIN-indexed ``search_vector`` column and rows
+    are ranked with ``ts_rank_cd``. Other databases fall back to a
+    case-insensitive substring match with a rank of 0.
+
+    Args:
+        query: Search text
+        before: Keyset position ``(rank, id)`` of the last row of the previous
+            page; only rows after it in sort order are returned
+        limit: Maximum number of rows to return
+        since: Only search messages created at or after this time
+        until: Only search messages created before this time
+
+    Returns:
+        ``(id, content, created_at, rank)`` rows ordered by rank, then id, descending
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        tsquery = func.websearch_to_tsquery(MESSAGE_SEARCH_CONFIG, query)
+        vector = literal_column(f"{Message.__tablename__}.{MESSAGE_SEARCH_COLUMN}", TSVECTOR)
+        rank = func.ts_rank_cd(vector, tsquery, type_=Float)
+        condition = vector.bool_op("@@")(tsquery)
+    else:
+        rank = literal(0.0, Float)
+        condition = func.lower(Message.content).contains(query.lower(), autoescape=True)
+
+    rank_label = rank.label("rank")
+    statement = (
+        select(Message.id, Message.content, Message.created_at, rank_label)
+        .where(condition)
+        .order_by(rank_label.desc(), Message.id.desc())
+        .limit(limit)
+    )
+    if before is not None:
+        statement = statement.where(tuple_(rank, Message.id) < tuple_(*before))
+    result = await db.execute(_created_between(statement, since, until))
+    return list(result.all())
+
+
+STATS_ORIGIN = datetime(1970, 1, 1)
+
+
+async def count_messages_by_bucket(
+    db: AsyncSession, bucket: timedelta, since: datetime, until: datetime
+) -> list[tuple[datetime, int]]:
+    """
+    Count messages created in ``[since, until)`` per time bucket (async).
+
+    Buckets are aligned to multiples of ``bucket`` since the Unix epoch and
+    computed in SQL (``date_bin`` on PostgreSQL), so only one row per
+    non-empty bucket leaves the database. The range scan uses the BRIN index
+    on ``created_at`` and only the partitions covering the range.
+
+    Returns:
+        ``(bucket_start, count)`` pairs for non-empty buckets, oldest first
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        bucket_start = func.date_bin(bucket, Message.created_at, STATS_ORIGIN)
+    else:
+        seconds = int(bucket.total_seconds())
+        epoch = cast(func.strftime("%s", Message.created_at), Integer)
+        bucket_start = func.datetime(epoch // seconds * seconds, "unixepoch")
+
+    bucket_start = bucket_start.label("bucket_start")
+    result = await db.execute(
+        _created_between(select(bucket_start, func.count()), since, until)
+        .group_by(bucket_start)
+        .order_by(bucket_start)
+    )
+    return [
+        (start if isinstance(start, datetime) else datetime.fromisoformat(start), count)
+        for start, count in result.all()
+    ]
+
+
+async def stream_messages(
+    db: AsyncSession,
+    batch_size: int = 1000,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> AsyncIterator[list[Row]]:
+    """
+    Stream every message ordered by id in batches of plain rows (async).
+
+    Uses a server-side cursor, so only ``batch_size`` rows are held in memory
+    at a time regardless of table size. Rows are ``(id, content, created_at)``
+    tuples rather than ORM objects to skip identity-map bookkeeping.
+    ``since``/``until`` bound ``created_at`` and prune partitions.
+    """
+    query = _created_between(
+        select(Message.id, Message.content, Message.created_at).order_by(Message.id),
+        since,
+        until,
+    ).execution_options(yield_per=batch_size)
+    result = await db.stream(query)
+    async for rows in result.partitions():
+        yield rows
+
+
+async def bulk_create_messages(db: AsyncSession, messages: list[MessageCreate]) -> list[int]:
+    """
+    Create many messages at once and return their ids in input order (async).
+
+    On PostgreSQL the ids are reserved from the ``messages`` sequence in one
+    query and the rows are written with asyncpg's binary ``COPY``, avoiding a
+    flush and refresh per row. Other dialects fall back to a single multi-row
+    ``INSERT ... RETURNING``.
+    """
+    if not messages:
+        return []
+
+    created_at = utc_now_naive()
+    conn = await db.connection()
+
+    if conn.dialect.name != "postgresql":
+        result = await db.execute(
+            insert(Message).returning(Message.id, sort_by_parameter_order=True),
+            [{"content": message.content, "created_at": created_at} for message in messages],
+        )
+        return list(result.scalars().all())
+
+    result = await db.execute(
+        select(func.nextval(func.pg_get_serial_sequence("messages", "id"))).select_from(
+            func.generate_series(1, len(messages))
+        )
+    )
+    ids = list(result.scalars().all())
+
+    raw_connection = await conn.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        Message.__tablename__,
+        records=[
+            (id_, message.content, created_at) for id_, message in zip(ids, messages, strict=True)
+        ],
+        columns=["id", "content", "created_at"],
+    )
+    return ids
+
+
+async def list_task_records(
+    db: AsyncSession,
+    states: list[str] | None = None,
+    name: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    before: tuple[datetime, str] | None = None,
+    limit: int = 100,
+) -> list[TaskRecord]:
+    """
+    List task records, newest first (async).
+
+    Args:
+        states: Only include records in one of these states
+        name: Only include records of this task name
+        since: Only include tasks published at or after this time
+        until: Only include tasks published before this time
+        before: Keyset position ``(created_at, task_id)`` of the last record of
+            the previous page; only records after it in sort order are returned
+        limit: Maximum number of records to return
+    """
+    query = select(TaskRecord).order_by(TaskRecord.created_at.desc(), TaskRecord.task_id.desc())
+    if states:
+        query = query.where(TaskRecord.state.in_(states))
+    if name is not None:
+        query = query.where(TaskRecord.name == name)
+    if since is not None:
+        query = query.where(TaskRecord.created_at >= since)
+    if until is not None:
+        query = query.where(TaskRecord.created_at < until)
+    if before is not None:
+        created_at, task_id = before
+        query = query.where(
+            or_(
+                TaskRecord.created_at < created_at,
+                and_(TaskRecord.created_at == created_at, TaskRecord.task_id < task_id),
+            )
+        )
+    result = await db.execute(query.limit(limit))
     return list(result.scalars().all())
@@ -1,11 +1,44 @@
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config import settings
+from app.metrics import DB_CONNECTION_ACQUIRE
+
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool recording how long each checkout waits for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_CONNECTION_ACQUIRE.observe(time.perf_counter() - started)
+
+
+def async_engine_options(url: str) -> dict:
+    """Extra engine options: the timed pool wherever the dialect would use a queue pool."""
+    parsed = make_url(url)
+    if settings.METRICS_ENABLED and parsed.get_dialect().get_pool_class(parsed) is (
+        AsyncAdaptedQueuePool
+    ):
+        return {"poolclass": TimedAsyncAdaptedQueuePool}
+    return {}
+
 
 # Create database engines
-async_engine = create_async_engine(settings.DATABASE_URL, echo=settings.DEBUG, future=True)
+async_engine = create_async_engine(
+    settings.DATABASE_URL,
+    echo=settings.DEBUG,
+    future=True,
+    **async_engine_options(settings.DATABASE_URL),
+)
 sync_engine = create_engine(settings.DATABASE_URL_SYNC, echo=settings.DEBUG, future=True)
 
 # Create session makers
@@ -21,6 +54,13 @@ SyncSessionLocal = sessionmaker(
 Base = declarative_base()
 
 
+def dialect_insert(connection):
+    """Return the dialect-specific ``insert`` (with ``on_conflict_do_*``) for a connection."""
+    if connection.dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
 async def get_async_session() -> AsyncSession:
     """Dependency for FastAPI to get async database session."""
     async with AsyncSessionLocal() as session:
@@ -0,0 +1,156 @@
+"""
+Worker-side group commit for small write tasks.
+
+When many tiny tasks each open and commit their own transaction, the database
+spends most of its time on round-trips and fsyncs. A ``GroupCommitBuffer``
+collects items submitted by concurrently running tasks and hands them to a
+single flush callable once ``max_size`` items are waiting or ``max_wait_ms``
+has elapsed since the first one arrived. Every submitter blocks until its
+batch is flushed and then receives its own result (or exception), so each
+Celery task still returns and is acknowledged individually.
+
+If a batch fails before it is committed, its items are retried one per
+transaction, so a single bad row only fails its own task and not the rest of
+its batch. Retrying is only safe while nothing was committed, so the flush
+callable raises ``CommitOutcomeUnknownError`` when it cannot tell (the connection
+was lost during COMMIT), and work that must follow a commit (cache
+invalidation, building the results) goes in ``after_commit``, which is never
+retried.
+
+Batching only happens across tasks that run concurrently in the same
+process, so workers should use a thread-based pool (``--pool threads``) with
+a concurrency at least as large as ``max_size`` for this to pay off.
+"""
+from collections.abc import Callable
+from concurrent.futures import Future
+import logging
+import queue
+import threading
+import time
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class CommitOutcomeUnknownError(Exception):
+    """The batch may have been committed, so it must not be retried."""
+
+
+class GroupCommitBuffer:
+    """Buffer items from concurrent callers and flush them in batches."""
+
+    def __init__(
+        self,
+        flush: Callable[[list[Any]], list[Any]],
+        max_size: int = 100,
+        max_wait_ms: int = 10,
+        after_commit: Callable[[list[Any], list[Any]], list[Any]] | None = None,
+    ):
+        """
+        Args:
+            flush: Callable that persists a batch of items in one transaction
+                and returns one result per item, in the same order. If it
+                raises, nothing may have been committed, unless the exception
+                is ``CommitOutcomeUnknownError``
+            max_size: Maximum number of items written in one batch
+            max_wait_ms: Maximum time the first item of a batch waits for
+                more items before the batch is flushed
+            after_commit: Optional ``after_commit(items, results)`` run once a
+                batch is committed; its return value replaces the results
+        """
+        self._flush = flush
+        self._after_commit = after_commit
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: queue.Queue[tuple[Any, Future]] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, item: Any) -> Any:
+        """
+        Add an item to the current batch and wait for it to be flushed.
+
+        Returns:
+            The result produced by the flush callable for this item
+
+        Raises:
+            Exception: Whatever the flush callable raised for the batch
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="group-commit-flusher", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self) -> list[tuple[Any, Future]]:
+        """Block for the first item, then gather more until size or time runs out."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            self.flush_batch(self._collect())
+
+    def flush_batch(self, batch: list[tuple[Any, Future]]) -> None:
+        """
+        Flush one batch and resolve the future of every item in it.
+
+        A batch of several items that failed without committing is retried
+        item by item, so only the items that fail on their own get the exception.
+        """
+        items = [item for item, _ in batch]
+        try:
+            results = self._flush(items)
+        except CommitOutcomeUnknownError as e:
+            self._fail(batch, e)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            logger.warning(
+                "Group commit of %d items failed, committing them one by one",
+                len(batch),
+                exc_info=True,
+            )
+            for entry in batch:
+                self.flush_batch([entry])
+            return
+
+        # Not retried from here on: the batch is committed
+        if len(results) != len(items):
+            message = f"Group commit flush returned {len(results)} results for {len(items)} items"
+            self._fail(batch, RuntimeError(message))
+            return
+        if self._after_commit is not None:
+            try:
+                results = self._after_commit(items, results)
+            except Exception as e:
+                self._fail(batch, e)
+                return
+
+        for (_, future), result in zip(batch, results, strict=True):
+            future.set_result(result)
+
+    @staticmethod
+    def _fail(batch: list[tuple[Any, Future]], error: Exception) -> None:
+        for _, future in batch:
+            future.set_exception(error)
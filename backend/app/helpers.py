@@ -3,7 +3,11 @@ Helper functions for the application.
 
 This module contains utility functions used across different parts of the application.
 """
-from datetime import datetime, timezone
+import base64
+import binascii
+from datetime import datetime, timedelta, timezone
+import json
+import re
 
 
 def utc_now_naive() -> datetime:
@@ -23,3 +27,83 @@ def utc_now_naive() -> datetime:
         True
     """
     return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def to_naive_utc(dt: datetime) -> datetime:
+    """
+    Convert a datetime to naive UTC for comparison with database columns.
+
+    Aware datetimes are converted to UTC; naive ones are assumed to be UTC already.
+
+    Args:
+        dt: Datetime to normalize
+
+    Returns:
+        datetime: The same instant as a naive UTC datetime
+    """
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def encode_cursor(data: dict) -> str:
+    """
+    Encode pagination state into an opaque, URL-safe cursor string.
+
+    Args:
+        data: JSON-serializable pagination state (e.g. ``{"id": 42}``)
+
+    Returns:
+        str: Base64url-encoded cursor without padding
+    """
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    Decode a cursor produced by ``encode_cursor``.
+
+    Args:
+        cursor: Opaque cursor string received from a client
+
+    Returns:
+        dict: The pagination state stored in the cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+        TypeError: If the cursor does not hold a JSON object
+    """
+    message = f"Invalid cursor: '{cursor}'"
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(message) from e
+    if not isinstance(data, dict):
+        raise TypeError(message)
+    return data
+
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_DURATION_RE = re.compile(r"^(\d+)([smhd])$")
+
+
+def parse_duration(value: str) -> timedelta:
+    """
+    Parse a compact duration such as ``30s``, ``1m``, ``6h`` or ``1d``.
+
+    Args:
+        value: Positive integer followed by a unit (s, m, h or d)
+
+    Returns:
+        timedelta: The parsed duration
+
+    Raises:
+        ValueError: If the value is malformed or not positive
+    """
+    match = _DURATION_RE.match(value.strip())
+    if match is None or int(match.group(1)) == 0:
+        message = f"Invalid duration: '{value}'"
+        raise ValueError(message)
+    return timedelta(seconds=int(match.group(1)) * DURATION_UNITS[match.group(2)])
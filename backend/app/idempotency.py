@@ -0,0 +1,155 @@
+"""
+``Idempotency-Key`` support for ``POST /tasks/`` and ``POST /messages/``.
+
+A client that times out and retries would otherwise enqueue a second task or
+insert a second message. With an ``Idempotency-Key`` header, the first
+request claims the key in the ``idempotency_keys`` table and stores its
+response; a repeat with the same key gets that response back (with an
+``Idempotent-Replayed: true`` header) and nothing is enqueued or inserted.
+
+Claiming is a single ``INSERT ... ON CONFLICT`` that only overwrites expired
+keys, so two concurrent requests with the same key cannot both win; on
+PostgreSQL the loser waits for the winner's transaction and then replays it.
+A claim that never completed (the process died mid-request) is taken over by
+a retry after ``IDEMPOTENCY_IN_PROGRESS_TIMEOUT`` seconds instead of blocking
+the key until it expires.
+A key reused with a different request body is rejected with 422.
+
+Completed responses are immutable, so ``idempotency_cache`` keeps recent ones
+in memory and most replays never reach the database. Keys expire after
+``IDEMPOTENCY_KEY_TTL`` seconds; the ``cleanup_idempotency_keys`` beat task
+deletes expired rows.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+import hashlib
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db import dialect_insert
+from app.helpers import utc_now_naive
+from app.message_cache import MessageCache
+from app.models import IdempotencyKey
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+@dataclass(frozen=True, slots=True)
+class StoredResponse:
+    """Response recorded for an idempotency key; ``body`` None means still in progress."""
+
+    fingerprint: str
+    status_code: int | None
+    body: str | None
+
+
+def request_fingerprint(scope: str, payload: str) -> str:
+    """Hash identifying the request a key was first used with."""
+    return hashlib.sha256(f"{scope}\n{payload}".encode()).hexdigest()
+
+
+async def claim_key(
+    db: AsyncSession, scope: str, key: str, fingerprint: str
+) -> StoredResponse | None:
+    """
+    Claim ``key`` for a new request in the current transaction.
+
+    Returns:
+        None if the key was claimed and the caller should process the request
+        and call ``complete_key``; otherwise the earlier request's response
+    """
+    hit, stored = idempotency_cache.get((scope, key))
+    if hit:
+        return stored
+
+    now = utc_now_naive()
+    table = IdempotencyKey.__table__
+    values = {
+        "fingerprint": fingerprint,
+        "status_code": None,
+        "response": None,
+        "created_at": now,
+        "expires_at": now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+    }
+    conn = await db.connection()
+    statement = dialect_insert(conn)(table).values(scope=scope, key=key, **values)
+    claimed = await db.scalar(
+        statement.on_conflict_do_update(
+            index_elements=[table.c.scope, table.c.key],
+            set_=values,
+            where=or_(
+                table.c.expires_at <= now,
+                and_(
+                    table.c.response.is_(None),
+                    table.c.created_at
+                    <= now - timedelta(seconds=settings.IDEMPOTENCY_IN_PROGRESS_TIMEOUT),
+                ),
+            ),
+        ).returning(table.c.key)
+    )
+    if claimed is not None:
+        return None
+
+    row = (
+        await db.execute(
+            select(IdempotencyKey.fingerprint, IdempotencyKey.status_code, IdempotencyKey.response)
+            .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        )
+    ).one()
+    stored = StoredResponse(*row)
+    if stored.body is not None:
+        idempotency_cache.set((scope, key), stored)
+    return stored
+
+
+async def complete_key(
+    db: AsyncSession, scope: str, key: str, status_code: int, body: str
+) -> None:
+    """Record the response of the request that claimed ``key``."""
+    await db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        .values(status_code=status_code, response=body)
+    )
+
+
+async def release_key(db: AsyncSession, scope: str, key: str) -> None:
+    """Give up a claimed key (the request failed), so a retry is processed again."""
+    await db.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+    )
+
+
+def replay_response(stored: StoredResponse, fingerprint: str) -> Response:
+    """
+    Build the response for a repeated key.
+
+    Raises:
+        HTTPException: 422 if the key was used with a different request, 409
+            if the original request has not finished yet
+    """
+    if stored.fingerprint != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request",
+        )
+    if stored.body is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still being processed",
+            headers={"Retry-After": "1"},
+        )
+    return Response(
+        content=stored.body,
+        status_code=stored.status_code,
+        media_type="application/json",
+        headers={REPLAYED_HEADER: "true"},
+    )
+
+
+idempotency_cache = MessageCache(
+    max_size=settings.IDEMPOTENCY_CACHE_SIZE, ttl=settings.IDEMPOTENCY_CACHE_TTL
+)
@@ -1,32 +1,109 @@
+import asyncio
+from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+import csv
+from datetime import datetime, timedelta
+import io
+import json
+from typing import Literal
 import uuid
 
+from celery import group
+from celery.backends.base import KeyValueStoreBackend
 from celery.result import AsyncResult
-from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi import (
+    Body,
+    Depends,
+    FastAPI,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.admission import queue_depth_monitor, require_capacity
 from app.celery_app import celery_app
 from app.config import settings
-from app.crud import create_message, list_messages
-from app.db import Base, async_engine, get_async_session
+from app.crud import (
+    STATS_ORIGIN,
+    bulk_create_messages,
+    count_messages_by_bucket,
+    create_message,
+    get_message,
+    list_messages,
+    list_messages_after,
+    list_task_records,
+    message_window_stats,
+    search_messages,
+    stream_messages,
+)
+from app.db import AsyncSessionLocal, Base, async_engine, get_async_session
+from app.helpers import decode_cursor, encode_cursor, parse_duration, to_naive_utc, utc_now_naive
+from app.idempotency import (
+    claim_key,
+    complete_key,
+    release_key,
+    replay_response,
+    request_fingerprint,
+)
+from app.message_cache import CachedPage, message_cache, message_invalidator, page_cache
+from app.metrics import PrometheusMiddleware, render_metrics
+from app.publisher import require_shared_result_backend, task_publisher
 from app.schemas import (
+    MessageBulkCreateResponse,
+    MessageCacheStats,
     MessageCreate,
+    MessagePage,
     MessageResponse,
+    MessageSearchPage,
+    MessageStatsBucket,
+    MessageStatsResponse,
+    TaskBatchEnqueueResponse,
     TaskEnqueueResponse,
+    TaskHistoryResponse,
+    TaskListItem,
     TaskListResponse,
+    TaskStatusBatchRequest,
     TaskStatusResponse,
 )
+from app.task_events import stream_state, task_event_broadcaster
+from app.task_records import task_record_writer
+from app.task_registry import (
+    FINISHED_STATES,
+    IN_FLIGHT_STATES,
+    task_events_consumer,
+    task_registry,
+)
 from app.tasks import create_message_task, slow_task
+from app.tracing import TracingMiddleware
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events."""
+    require_shared_result_backend()
     # Startup: Create tables (for development only)
     async with async_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    if settings.TASK_EVENTS_ENABLED:
+        task_events_consumer.start()
+    await task_publisher.warm_up()
+    if settings.ADMISSION_CONTROL_ENABLED:
+        queue_depth_monitor.start()
     yield
     # Shutdown: Clean up
+    await queue_depth_monitor.stop()
+    if settings.TASK_EVENTS_ENABLED:
+        task_events_consumer.stop()
+    task_publisher.shutdown()
+    if settings.TASK_RECORDS_ENABLED:
+        task_record_writer.flush()
     await async_engine.dispose()
 
 
@@ -36,6 +113,9 @@ app = FastAPI(
     version="0.1.0",
     lifespan=lifespan,
 )
+app.add_middleware(TracingMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(PrometheusMiddleware)
 
 
 @app.get("/")
@@ -52,24 +132,84 @@ async def root():
     "/tasks/",
     response_model=TaskEnqueueResponse,
     status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require_capacity(create_message_task))],
 )
-async def enqueue_task(message: MessageCreate):
+async def enqueue_task(
+    message: MessageCreate,
+    idempotency_key: str | None = Header(None, min_length=1, max_length=255),
+):
     """
     Enqueue a Celery task to create a message asynchronously.
 
-    Returns the task ID for tracking.
+    Returns the task ID for tracking. The broker publish runs off the event loop.
+    With an ``Idempotency-Key`` header, a repeated request returns the task ID
+    of the first one instead of enqueueing another task.
+    """
+    if idempotency_key is None:
+        task = await task_publisher.delay(create_message_task, message.content)
+        # A task that was just published is PENDING; skip the result backend lookup
+        return TaskEnqueueResponse(task_id=task.id)
+
+    fingerprint = request_fingerprint("tasks", message.model_dump_json())
+    async with AsyncSessionLocal() as db:
+        stored = await claim_key(db, "tasks", idempotency_key, fingerprint)
+        if stored is not None:
+            return replay_response(stored, fingerprint)
+        # Retries see the claim as in progress (409) until the task is published
+        await db.commit()
+
+        try:
+            task = await task_publisher.delay(create_message_task, message.content)
+        except BaseException:
+            # Also on cancellation, so the key is not stuck in progress
+            await release_key(db, "tasks", idempotency_key)
+            await db.commit()
+            raise
+
+        response = TaskEnqueueResponse(task_id=task.id)
+        await complete_key(
+            db, "tasks", idempotency_key, status.HTTP_202_ACCEPTED, response.model_dump_json()
+        )
+        await db.commit()
+    return response
+
+
+@app.post(
+    "/tasks/batch",
+    response_model=TaskBatchEnqueueResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require_capacity(create_message_task))],
+)
+async def enqueue_task_batch(
+    messages: list[MessageCreate] = Body(
+        ..., min_length=1, max_length=settings.TASK_BATCH_MAX_SIZE
+    ),
+):
     """
-    task = create_message_task.delay(message.content)
-    print(task)
-    return TaskEnqueueResponse(task_id=task.id, status=task.state)
+    Enqueue many create-message tasks in a single broker round-trip.
+
+    The tasks are published as a Celery group, which reuses one producer
+    connection for every message. Returns the group ID plus the per-item
+    task IDs, in the same order as the request body.
+    """
+    job = group(create_message_task.s(message.content) for message in messages)
+    group_result = await task_publisher.apply_signature(job)
+    task_ids = [result.id for result in group_result.results]
+    return TaskBatchEnqueueResponse(
+        group_id=group_result.id,
+        task_ids=task_ids,
+        total=len(task_ids),
+        message=f"{len(task_ids)} tasks enqueued successfully",
+    )
 
 
 @app.post(
     "/tasks/slow",
     response_model=TaskEnqueueResponse,
     status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require_capacity(slow_task))],
 )
-def enqueue_slow_task(duration: int = 10):
+async def enqueue_slow_task(duration: int = 10):
     """
     Enqueue a slow test task that takes several seconds to complete.
 
@@ -78,72 +218,100 @@ def enqueue_slow_task(duration: int = 10):
     Args:
         duration: How many seconds the task should run (default: 10)
     """
-    task = slow_task.delay(duration)
+    task = await task_publisher.delay(slow_task, duration)
     return TaskEnqueueResponse(
-        task_id=task.id, status=task.state, message=f"Slow task enqueued for {duration} seconds"
+        task_id=task.id, message=f"Slow task enqueued for {duration} seconds"
     )
 
 
 @app.get("/tasks/", response_model=TaskListResponse)
-async def list_all_tasks():
-    """
-    List all active/pending Celery tasks.
-
-    Returns a list of task IDs and their current status for tasks that are:
-    - ACTIVE: Currently being executed by workers
-    - SCHEDULED: Waiting to be executed (scheduled for future)
-    - RESERVED: Queued but not yet active
-
-    Note: Completed tasks (SUCCESS/FAILURE) are not included as the application
-    uses RPC backend which doesn't persist results long-term. To track a specific
-    task, use GET /tasks/{task_id} immediately after creating it.
-
-    To see completed tasks, consider:
-    - Using a persistent result backend (Redis, Database)
-    - Implementing a custom task tracking system
-    - Checking the messages table (GET /messages/) for successfully created messages
-    """
-    # Get inspect instance
-    inspect = celery_app.control.inspect()
-
-    # Collect all tasks from different states
-    all_tasks = []
-    task_ids_seen = set()
-
-    # Active tasks (currently being executed)
-    active_tasks = inspect.active()
-    if active_tasks:
-        for worker, tasks in active_tasks.items():
-            for task in tasks:
-                task_id = task.get("id")
-                if task_id and task_id not in task_ids_seen:
-                    task_ids_seen.add(task_id)
-                    all_tasks.append({"task_id": task_id, "status": "ACTIVE"})
-
-    # Scheduled tasks (waiting to be executed)
-    scheduled_tasks = inspect.scheduled()
-    if scheduled_tasks:
-        for worker, tasks in scheduled_tasks.items():
-            for task in tasks:
-                task_id = task.get("request", {}).get("id")
-                if task_id and task_id not in task_ids_seen:
-                    task_ids_seen.add(task_id)
-                    all_tasks.append({"task_id": task_id, "status": "SCHEDULED"})
-
-    # Reserved tasks (queued but not yet active)
-    reserved_tasks = inspect.reserved()
-    if reserved_tasks:
-        for worker, tasks in reserved_tasks.items():
-            for task in tasks:
-                task_id = task.get("id")
-                if task_id and task_id not in task_ids_seen:
-                    task_ids_seen.add(task_id)
-                    all_tasks.append({"task_id": task_id, "status": "RESERVED"})
-
-    # Registered tasks (available task types - these are not task instances)
-    # We'll skip these as they are task definitions, not actual task executions
-
-    return TaskListResponse(tasks=all_tasks, total=len(all_tasks))
+async def list_all_tasks(
+    state: list[str] | None = Query(None),
+    name: str | None = None,
+):
+    """
+    List Celery tasks tracked from the worker event stream.
+
+    Answers from the in-memory task registry, so no broadcast to workers is made.
+    By default returns in-flight tasks:
+    - PENDING: Published but not yet received by a worker
+    - RESERVED: Received by a worker, waiting for a slot
+    - SCHEDULED: Received with an ETA/countdown in the future
+    - ACTIVE: Currently being executed by a worker
+    - RETRY: Failed and waiting to be retried
+
+    Args:
+        state: Only include tasks in these states (repeatable). Finished states
+            (SUCCESS, FAILURE, REVOKED, REJECTED) are only returned when requested.
+        name: Only include tasks with this task name (e.g. ``app.tasks.slow_task``)
+
+    Note: The registry only knows tasks whose events were received since this
+    API process started. Past ``TASK_REGISTRY_MAX_TASKS`` it forgets finished
+    tasks first, so in-flight tasks stay listed until they finish.
+    """
+    states = {value.upper() for value in state} if state else IN_FLIGHT_STATES
+    entries = task_registry.list_tasks(states=states, name=name)
+    tasks = [
+        TaskListItem(task_id=entry.task_id, status=entry.state, name=entry.name)
+        for entry in entries
+    ]
+    return TaskListResponse(tasks=tasks, total=len(tasks))
+
+
+@app.get("/tasks/history", response_model=TaskHistoryResponse)
+async def task_history(
+    state: list[str] | None = Query(None),
+    name: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Query persisted task lifecycle records, newest first.
+
+    Unlike ``GET /tasks/``, finished tasks are kept. Records are written in
+    batches, so the most recent transitions can take up to
+    ``TASK_RECORDS_FLUSH_INTERVAL_MS`` to appear.
+
+    Args:
+        state: Only include tasks in these states (repeatable)
+        name: Only include tasks with this task name
+        since: Only include tasks published at or after this time (UTC)
+        until: Only include tasks published before this time (UTC)
+        limit: Page size
+        cursor: ``next_cursor`` from the previous page
+    """
+    before = None
+    if cursor:
+        try:
+            data = decode_cursor(cursor)
+            before = (datetime.fromisoformat(data["created_at"]), str(data["task_id"]))
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid cursor: '{cursor}'",
+            ) from None
+
+    states = [value.upper() for value in state] if state else None
+    records = await list_task_records(
+        db,
+        states=states,
+        name=name,
+        since=to_naive_utc(since) if since else None,
+        until=to_naive_utc(until) if until else None,
+        before=before,
+        limit=limit + 1,
+    )
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        last = records[-1]
+        next_cursor = encode_cursor(
+            {"created_at": last.created_at.isoformat(), "task_id": last.task_id}
+        )
+    return TaskHistoryResponse(items=records, next_cursor=next_cursor)
 
 
 @app.get("/tasks/{task_id}", response_model=TaskStatusResponse)
@@ -165,6 +333,11 @@ async def get_task_status(task_id: str):
             detail=f"Invalid task ID format. Task ID must be a valid UUID, got: '{task_id}'"
         )
     
+    return await asyncio.to_thread(_get_task_status, task_id)
+
+
+def _get_task_status(task_id: str) -> TaskStatusResponse:
+    """Look up a task in the result backend (blocking)."""
     task_result = AsyncResult(task_id, app=celery_app)
 
     response = TaskStatusResponse(task_id=task_id, status=task_result.status)
@@ -177,6 +350,156 @@ async def get_task_status(task_id: str):
     return response
 
 
+def _status_from_meta(task_id: str, task_status: str, result) -> TaskStatusResponse:
+    """Build a status response from a task state and its result or exception."""
+    response = TaskStatusResponse(task_id=task_id, status=task_status)
+    if task_status == "SUCCESS":
+        response.result = result
+    elif task_status == "FAILURE":
+        response.result = {"error": str(result)}
+    return response
+
+
+# Shared by all requests, so batches on other backends never run more than
+# TASK_STATUS_LOOKUP_CONCURRENCY lookups at once
+_task_status_executor = ThreadPoolExecutor(
+    max_workers=settings.TASK_STATUS_LOOKUP_CONCURRENCY, thread_name_prefix="task-status"
+)
+
+
+def _lookup_task_status(task_id: str) -> TaskStatusResponse:
+    task_result = AsyncResult(task_id, app=celery_app)
+    return _status_from_meta(task_id, task_result.status, task_result.result)
+
+
+def _fetch_task_statuses(task_ids: list[str]) -> dict[str, TaskStatusResponse]:
+    """
+    Resolve many task states with as few backend round-trips as possible.
+
+    Key/value result backends (Redis, Memcached, ...) are read with a single
+    multi-get; other backends fall back to one lookup per task, run
+    ``TASK_STATUS_LOOKUP_CONCURRENCY`` at a time.
+    """
+    backend = celery_app.backend
+    if isinstance(backend, KeyValueStoreBackend):
+        keys = [backend.get_key_for_task(task_id) for task_id in task_ids]
+        try:
+            values = backend.mget(keys)
+        except NotImplementedError:
+            values = None
+        if values is not None:
+            if hasattr(values, "items"):
+                values = [values.get(key) for key in keys]
+            statuses = {}
+            for task_id, value in zip(task_ids, values, strict=True):
+                meta = backend.decode_result(value) if value else {"status": "PENDING"}
+                statuses[task_id] = _status_from_meta(task_id, meta["status"], meta.get("result"))
+            return statuses
+
+    return dict(
+        zip(task_ids, _task_status_executor.map(_lookup_task_status, task_ids), strict=True)
+    )
+
+
+@app.post("/tasks/status", response_model=dict[str, TaskStatusResponse])
+async def get_task_statuses(request: TaskStatusBatchRequest):
+    """
+    Get the status of many Celery tasks in one request.
+
+    Returns a map of task ID to status. Lookups run off the event loop and use
+    a single multi-get when the result backend supports it.
+
+    Raises:
+        HTTPException 422: If any task_id is not a valid UUID
+    """
+    task_ids = list(dict.fromkeys(request.task_ids))
+    invalid = []
+    for task_id in task_ids:
+        try:
+            uuid.UUID(task_id)
+        except ValueError:
+            invalid.append(task_id)
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid task ID format. Task IDs must be valid UUIDs, got: {invalid}",
+        )
+
+    return await asyncio.to_thread(_fetch_task_statuses, task_ids)
+
+
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def _sse(payload: dict) -> str:
+    return f"event: {payload['status']}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def _task_event_stream(task_id: str, request: Request) -> AsyncIterator[str]:
+    """Yield SSE frames for ``task_id`` until it finishes or the client disconnects."""
+    # Subscribe before reading the current state so no transition is missed
+    queue = task_event_broadcaster.subscribe(task_id)
+    try:
+        entry = task_registry.get(task_id)
+        if entry is not None:
+            current = {"task_id": task_id, "status": stream_state(entry.state)}
+        else:
+            # Unknown to the registry: the task may have finished before this process started
+            statuses = await asyncio.to_thread(_fetch_task_statuses, [task_id])
+            current = statuses[task_id].model_dump(exclude_none=True)
+        yield _sse(current)
+        if current["status"] in FINISHED_STATES:
+            return
+
+        while True:
+            try:
+                payload = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            yield _sse(payload)
+            if payload["status"] in FINISHED_STATES:
+                return
+    finally:
+        task_event_broadcaster.unsubscribe(task_id, queue)
+
+
+@app.get("/tasks/{task_id}/events")
+async def stream_task_events(task_id: str, request: Request):
+    """
+    Stream a task's state transitions as Server-Sent Events.
+
+    Sends the current state first, then STARTED, PROGRESS and the final
+    SUCCESS/FAILURE as they happen, and closes after a final state.
+    All subscribers share the API process's single Celery events consumer.
+
+    Raises:
+        HTTPException 404: If task_id is not a valid UUID format
+        HTTPException 409: If task events are disabled (``TASK_EVENTS_ENABLED``),
+            since the stream would never receive a transition
+    """
+    try:
+        uuid.UUID(task_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Invalid task ID format. Task ID must be a valid UUID, got: '{task_id}'",
+        ) from None
+    if not settings.TASK_EVENTS_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Task events are disabled on this server; poll GET /tasks/{task_id} instead",
+        )
+
+    return StreamingResponse(
+        _task_event_stream(task_id, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post(
     "/messages/",
     response_model=MessageResponse,
@@ -184,33 +507,426 @@ async def get_task_status(task_id: str):
 )
 async def create_message_endpoint(
     message: MessageCreate,
+    idempotency_key: str | None = Header(None, min_length=1, max_length=255),
     db: AsyncSession = Depends(get_async_session),
 ):
     """
     Create a message directly via FastAPI (synchronous operation).
 
     This endpoint creates the message immediately using async database access.
+    With an ``Idempotency-Key`` header, a repeated request returns the message
+    created by the first one instead of inserting another; the key is claimed
+    in the same transaction as the insert.
     """
+    if idempotency_key is not None:
+        fingerprint = request_fingerprint("messages", message.model_dump_json())
+        stored = await claim_key(db, "messages", idempotency_key, fingerprint)
+        if stored is not None:
+            return replay_response(stored, fingerprint)
+
     db_message = await create_message(db, message)
+    if idempotency_key is not None:
+        await complete_key(
+            db,
+            "messages",
+            idempotency_key,
+            status.HTTP_201_CREATED,
+            MessageResponse.model_validate(db_message).model_dump_json(),
+        )
+    # Commit before invalidating, or a concurrent read could re-cache the old state
+    await db.commit()
+    await message_invalidator.publish_async([db_message.id])
     return db_message
 
 
-@app.get("/messages/", response_model=list[MessageResponse])
+_message_list_adapter = TypeAdapter(list[MessageCreate])
+
+
+def _parse_bulk_messages(body: bytes, content_type: str) -> list[MessageCreate]:
+    """Parse a JSON array or an NDJSON body into validated messages."""
+    if content_type.startswith("application/x-ndjson"):
+        lines = [line for line in body.splitlines() if line.strip()]
+        body = b"[" + b",".join(lines) + b"]"
+    return _message_list_adapter.validate_json(body)
+
+
+@app.post(
+    "/messages/bulk",
+    response_model=MessageBulkCreateResponse,
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": MessageCreate.model_json_schema()}
+                },
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def bulk_create_messages_endpoint(
+    request: Request,
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Create many messages in one request.
+
+    Accepts either a JSON array of messages or an NDJSON body
+    (``Content-Type: application/x-ndjson``, one message object per line).
+    On PostgreSQL the rows are written with a single ``COPY``.
+    """
+    try:
+        messages = _parse_bulk_messages(
+            await request.body(), request.headers.get("content-type", "")
+        )
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors(include_url=False, include_context=False),
+        ) from None
+
+    if len(messages) > settings.MESSAGE_BULK_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.MESSAGE_BULK_MAX_SIZE} messages per request",
+        )
+
+    ids = await bulk_create_messages(db, messages)
+    # Commit first so the dropped single-message and page entries are not re-cached stale
+    await db.commit()
+    await message_invalidator.publish_async(ids)
+    return MessageBulkCreateResponse(
+        inserted=len(ids),
+        first_id=min(ids, default=None),
+        last_id=max(ids, default=None),
+    )
+
+
+_message_list_json = TypeAdapter(list[MessageResponse])
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an ``If-None-Match`` header matches ``etag`` (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag.removeprefix("W/")
+        for candidate in if_none_match.split(",")
+    )
+
+
+async def _render_message_page(
+    db: AsyncSession,
+    skip: int,
+    limit: int,
+    after_id: int | None,
+    cursor: str | None,
+    created: dict,
+) -> bytes:
+    """Query and serialize one page of ``GET /messages/`` as JSON bytes."""
+    if cursor is None:
+        messages = await list_messages(db, skip=skip, limit=limit, **created)
+        return _message_list_json.dump_json(
+            _message_list_json.validate_python(messages, from_attributes=True)
+        )
+
+    # Fetch one extra row to know whether another page exists
+    messages = await list_messages_after(db, after_id=after_id, limit=limit + 1, **created)
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = encode_cursor({"id": messages[-1].id})
+    return MessagePage(items=messages, next_cursor=next_cursor).model_dump_json().encode()
+
+
+@app.get("/messages/", response_model=list[MessageResponse] | MessagePage)
 async def list_messages_endpoint(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
+    cursor: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
     db: AsyncSession = Depends(get_async_session),
 ):
     """
     List all messages from the database.
 
-    Supports pagination with skip and limit parameters.
+    Supports two pagination modes:
+    - Offset (default): ``skip`` and ``limit``, returns a plain list
+    - Cursor: pass ``cursor`` (empty for the first page) and ``limit``; returns
+      ``{"items": [...], "next_cursor": ...}`` ordered by id. Follow
+      ``next_cursor`` until it is null. Each page costs the same regardless of depth.
+
+    ``since``/``until`` (UTC) only list messages created in ``[since, until)``;
+    on a partitioned table only the matching partitions are scanned.
+
+    Every page carries an ``ETag``. Send it back in ``If-None-Match`` to get
+    ``304 Not Modified`` (no body) while the page is unchanged. Serialized
+    pages are shared between clients for ``MESSAGE_PAGE_CACHE_TTL`` seconds;
+    new messages drop only the cached pages they can change.
     """
-    messages = await list_messages(db, skip=skip, limit=limit)
-    return messages
+    after_id = None
+    if cursor is not None:
+        if limit < 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="limit must be at least 1 when paginating with a cursor",
+            )
+        if cursor:
+            try:
+                after_id = int(decode_cursor(cursor)["id"])
+            except (KeyError, TypeError, ValueError):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid cursor: '{cursor}'",
+                ) from None
+
+    created = {
+        "since": to_naive_utc(since) if since else None,
+        "until": to_naive_utc(until) if until else None,
+    }
+    if cursor is None:
+        cache_key = ("offset", skip, limit, created["since"], created["until"])
+        window = {"skip": skip, "limit": limit}
+    else:
+        cache_key = ("cursor", after_id, limit, created["since"], created["until"])
+        window = {"after_id": after_id, "limit": limit + 1}
+    if_none_match = request.headers.get("if-none-match")
+
+    hit, page = page_cache.get(cache_key)
+    if hit:
+        etag, body = page.etag, page.body
+    else:
+        count, min_id, max_id = await message_window_stats(db, **window, **created)
+        etag = f'"{count}-{min_id}-{max_id}"'
+        body = None
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Cache": "HIT" if hit else "MISS"}
+
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if body is None:
+        body = await _render_message_page(db, skip, limit, after_id, cursor, created)
+        page_cache.set(cache_key, CachedPage(etag, body, max_id, count >= window["limit"]))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CSV_HEADER = ("id", "content", "created_at")
+
+
+def _rows_to_ndjson(rows) -> str:
+    return "".join(
+        json.dumps({"id": id_, "content": content, "created_at": created_at.isoformat()}) + "\n"
+        for id_, content, created_at in rows
+    )
+
+
+def _rows_to_csv(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows((id_, content, created_at.isoformat()) for id_, content, created_at in rows)
+    return buffer.getvalue()
+
+
+async def _export_messages(
+    fmt: str, since: datetime | None = None, until: datetime | None = None
+) -> AsyncIterator[str]:
+    """Yield the messages table one encoded batch at a time."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(EXPORT_CSV_HEADER)
+        yield buffer.getvalue()
+
+    encode = _rows_to_csv if fmt == "csv" else _rows_to_ndjson
+    # The session must live inside the generator: dependency cleanup runs
+    # before a StreamingResponse body is sent.
+    async with AsyncSessionLocal() as session:
+        async for rows in stream_messages(
+            session, batch_size=EXPORT_BATCH_SIZE, since=since, until=until
+        ):
+            yield encode(rows)
+
+
+@app.get("/messages/export")
+async def export_messages_endpoint(
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    since: datetime | None = None,
+    until: datetime | None = None,
+):
+    """
+    Stream every message as NDJSON (default) or CSV.
+
+    Rows are read through a server-side cursor and written out in batches,
+    so memory stays flat regardless of table size. ``since``/``until`` (UTC)
+    limit the export to a ``created_at`` range and only read the matching
+    partitions.
+    """
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_messages(
+            fmt,
+            since=to_naive_utc(since) if since else None,
+            until=to_naive_utc(until) if until else None,
+        ),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="messages.{fmt}"'},
+    )
+
+
+@app.get("/messages/search", response_model=MessageSearchPage)
+async def search_messages_endpoint(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Full-text search over message content, best match first.
+
+    Uses the GIN-indexed ``search_vector`` column. ``q`` accepts web search
+    syntax: ``"exact phrase"``, ``or`` and ``-excluded`` words.
+
+    Args:
+        q: Search text
+        limit: Page size
+        cursor: ``next_cursor`` from the previous page
+        since: Only search messages created at or after this time (UTC)
+        until: Only search messages created before this time (UTC)
+    """
+    before = None
+    if cursor:
+        try:
+            data = decode_cursor(cursor)
+            before = (float(data["rank"]), int(data["id"]))
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid cursor: '{cursor}'",
+            ) from None
+
+    rows = await search_messages(
+        db,
+        q,
+        before=before,
+        limit=limit + 1,
+        since=to_naive_utc(since) if since else None,
+        until=to_naive_utc(until) if until else None,
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor({"rank": rows[-1].rank, "id": rows[-1].id})
+    return MessageSearchPage(items=rows, next_cursor=next_cursor)
+
+
+MESSAGE_STATS_MAX_BUCKETS = 10_000
+
+
+@app.get("/messages/stats", response_model=MessageStatsResponse)
+async def message_stats(
+    bucket: str = "1m",
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Count messages per time bucket, aggregated in SQL.
+
+    Every bucket in the range is returned, including empty ones. Buckets are
+    aligned to multiples of ``bucket`` since the Unix epoch (UTC).
+
+    Args:
+        bucket: Bucket width such as ``30s``, ``1m``, ``15m``, ``1h`` or ``1d``
+        from_: Start of the range (UTC), defaults to one day before ``to``
+        to: End of the range, exclusive (UTC), defaults to now
+    """
+    try:
+        width = parse_duration(bucket)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from None
+
+    until = to_naive_utc(to) if to else utc_now_naive()
+    since = to_naive_utc(from_) if from_ else until - timedelta(days=1)
+    if since >= until:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'from' must be before 'to'",
+        )
+    if (until - since) / width > MESSAGE_STATS_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MESSAGE_STATS_MAX_BUCKETS} buckets per request; use a wider bucket",
+        )
+
+    counts = dict(await count_messages_by_bucket(db, width, since, until))
+    # Fill empty buckets so clients get an evenly spaced series
+    start = since - (since - STATS_ORIGIN) % width
+    buckets = []
+    while start < until:
+        buckets.append(MessageStatsBucket(start=start, count=counts.get(start, 0)))
+        start += width
+    return MessageStatsResponse(
+        bucket=bucket,
+        from_=since,
+        to=until,
+        total=sum(counts.values()),
+        buckets=buckets,
+    )
+
+
+@app.get("/messages/cache/stats", response_model=MessageCacheStats)
+async def message_cache_stats():
+    """Return size and hit/miss counters of this process's message cache."""
+    return message_cache.stats()
+
+
+@app.get("/messages/{message_id}", response_model=MessageResponse)
+async def get_message_endpoint(
+    message_id: int,
+    response: Response,
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Get a single message by id.
+
+    Served from an in-process LRU cache when possible (``X-Cache: HIT``);
+    misses, including ids that do not exist, are cached after one query.
+    """
+    hit, cached = message_cache.get(message_id)
+    if not hit:
+        db_message = await get_message(db, message_id)
+        cached = MessageResponse.model_validate(db_message) if db_message is not None else None
+        message_cache.set(message_id, cached)
+
+    cache_status = "HIT" if hit else "MISS"
+    if cached is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Message {message_id} not found",
+            headers={"X-Cache": cache_status},
+        )
+    response.headers["X-Cache"] = cache_status
+    return cached
 
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics in the text exposition format."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
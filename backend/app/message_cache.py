@@ -0,0 +1,226 @@
+"""
+In-process caches for message reads.
+
+``message_cache`` serves single-message lookups (``GET /messages/{id}``) and
+``page_cache`` holds serialized ``GET /messages/`` pages for a few seconds.
+A write only drops the pages its new ids can change (see ``CachedPage``).
+
+``MessageCache`` is a bounded LRU with a per-entry TTL. It also remembers ids
+that were looked up and not found, for a much shorter TTL, so clients polling
+for a message that a task has not written yet do not hit the database on
+every request.
+
+Writers call ``message_invalidator.publish(ids)`` after committing new
+messages; API endpoints ``await message_invalidator.publish_async(ids)`` so
+no broker I/O runs on the event loop. The invalidator is pluggable (``MESSAGE_CACHE_INVALIDATOR``):
+
+- ``local``: invalidates caches in the same process only
+- ``events``: sends a ``message-invalidate`` Celery event, which every API
+  replica receives through its ``TaskEventsConsumer`` (requires
+  ``TASK_EVENTS_ENABLED``), so writes made by workers or other replicas are
+  seen immediately
+"""
+import asyncio
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+from app.celery_app import celery_app
+from app.config import settings
+from app.task_registry import task_events_consumer
+
+logger = logging.getLogger(__name__)
+
+INVALIDATE_EVENT = "message-invalidate"
+
+_MISSING = object()
+
+
+class MessageCache:
+    """Thread-safe LRU cache of messages by id with TTL expiry and hit/miss counters."""
+
+    def __init__(self, max_size: int = 10_000, ttl: float = 60.0, missing_ttl: float = 2.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: OrderedDict[object, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> tuple[bool, object]:
+        """
+        Look up a message (or any other cached value) by key.
+
+        Returns:
+            ``(True, value)`` on a hit, where value is None for an id known
+            not to exist; ``(False, None)`` on a miss
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                value = entry[1]
+                return True, None if value is _MISSING else value
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value) -> None:
+        """Cache ``value`` under ``key``; None records that the message does not exist."""
+        ttl = self.ttl if value is not None else self.missing_ttl
+        if self.max_size <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, _MISSING if value is None else value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, message_ids: Iterable[int]) -> None:
+        """Drop any cached entries for ``message_ids``."""
+        with self._lock:
+            for message_id in message_ids:
+                if self._entries.pop(message_id, None) is not None:
+                    self.invalidations += 1
+
+    def invalidate_where(self, predicate: Callable[[object], bool]) -> None:
+        """Drop every cached value for which ``predicate(value)`` is true."""
+        with self._lock:
+            stale = [
+                key
+                for key, (_, value) in self._entries.items()
+                if value is not _MISSING and predicate(value)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def invalidate_all(self) -> None:
+        """Drop every entry, keeping the counters."""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self) -> dict:
+        """Return the cache size and counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class CachedPage(NamedTuple):
+    """A serialized ``GET /messages/`` page and the id window it was read from."""
+
+    etag: str
+    body: bytes
+    max_id: int | None
+    full: bool
+
+    def touched_by(self, message_ids: list[int]) -> bool:
+        """Whether creating ``message_ids`` can change this page."""
+        if not self.full:
+            return True
+        # Ids grow, so new rows land after a full window unless they commit out of order
+        return self.max_id is not None and any(
+            message_id <= self.max_id for message_id in message_ids
+        )
+
+
+class LocalInvalidator:
+    """Deliver invalidations to subscribers in the current process."""
+
+    def __init__(self):
+        self._subscribers: list[Callable[[list[int]], None]] = []
+
+    def subscribe(self, callback: Callable[[list[int]], None]) -> None:
+        """Call ``callback(ids)`` for every published invalidation."""
+        self._subscribers.append(callback)
+
+    def publish(self, message_ids: Iterable[int]) -> None:
+        """Invalidate ``message_ids`` in every subscribed cache."""
+        message_ids = list(message_ids)
+        for callback in self._subscribers:
+            callback(message_ids)
+
+    async def publish_async(self, message_ids: Iterable[int]) -> None:
+        """Like ``publish``, for callers on the event loop."""
+        self.publish(message_ids)
+
+
+class CeleryEventInvalidator(LocalInvalidator):
+    """Broadcast invalidations to every API replica as Celery events."""
+
+    def __init__(self, app=celery_app, consumer=task_events_consumer):
+        super().__init__()
+        self.app = app
+        consumer.add_listener(self._on_event)
+
+    def publish(self, message_ids: Iterable[int]) -> None:
+        message_ids = list(message_ids)
+        # Apply locally right away; the event also reaches this process later
+        super().publish(message_ids)
+        self._send(message_ids)
+
+    async def publish_async(self, message_ids: Iterable[int]) -> None:
+        message_ids = list(message_ids)
+        super().publish(message_ids)
+        # The broker publish blocks, so keep it off the event loop
+        await asyncio.to_thread(self._send, message_ids)
+
+    def _send(self, message_ids: list[int]) -> None:
+        try:
+            with self.app.events.default_dispatcher() as dispatcher:
+                dispatcher.send(INVALIDATE_EVENT, ids=message_ids)
+        except Exception:
+            logger.warning("Could not publish message cache invalidation", exc_info=True)
+
+    def _on_event(self, event: dict) -> None:
+        if event.get("type") == INVALIDATE_EVENT:
+            super().publish(event.get("ids") or [])
+
+
+def create_invalidator(kind: str) -> LocalInvalidator:
+    """Return the invalidator configured by ``MESSAGE_CACHE_INVALIDATOR``."""
+    if kind == "events":
+        return CeleryEventInvalidator()
+    return LocalInvalidator()
+
+
+message_cache = MessageCache(
+    max_size=settings.MESSAGE_CACHE_SIZE,
+    ttl=settings.MESSAGE_CACHE_TTL,
+    missing_ttl=settings.MESSAGE_CACHE_MISSING_TTL,
+)
+# Serialized GET /messages/ pages (CachedPage) keyed by query parameters
+page_cache = MessageCache(
+    max_size=settings.MESSAGE_PAGE_CACHE_SIZE, ttl=settings.MESSAGE_PAGE_CACHE_TTL
+)
+message_invalidator = create_invalidator(settings.MESSAGE_CACHE_INVALIDATOR)
+message_invalidator.subscribe(message_cache.invalidate)
+message_invalidator.subscribe(
+    lambda message_ids: page_cache.invalidate_where(lambda page: page.touched_by(message_ids))
+)
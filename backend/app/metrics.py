@@ -0,0 +1,232 @@
+"""
+Prometheus metrics for the API and the Celery workers.
+
+API (``GET /metrics``):
+
+- ``http_request_duration_seconds{method,route,status}``: latency per route
+  template (``/messages/{message_id}``, not the raw path)
+- ``http_requests_in_progress{method,route}``
+- ``db_connection_acquire_seconds``: time a session waited for a pooled
+  connection (``app.db.TimedAsyncAdaptedQueuePool``)
+
+Workers (from Celery signals, served on ``WORKER_METRICS_PORT``):
+
+- ``celery_task_runtime_seconds{task,state}``
+- ``celery_task_queue_wait_seconds{task}``: publish (``published_at`` header)
+  to start of execution
+- ``celery_task_failures_total{task,exception}``, ``celery_task_retries_total{task}``
+- ``celery_autoscaler_*``: pool size, backlog and decisions of
+  ``app.autoscale.QueueDepthAutoscaler``
+
+Prefork worker processes (and multi-process API servers) each keep their own
+counters. Set ``PROMETHEUS_MULTIPROC_DIR`` to an empty directory before the
+process starts and the values are shared through files in it and summed on
+scrape.
+"""
+import logging
+import os
+import threading
+import time
+
+from celery.signals import (
+    task_failure,
+    task_postrun,
+    task_prerun,
+    task_retry,
+    worker_process_shutdown,
+    worker_ready,
+)
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from starlette.routing import Match
+
+from app.celery_app import PUBLISHED_AT_HEADER
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+UNMATCHED_ROUTE = "<unmatched>"
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being served",
+    ["method", "route"],
+    multiprocess_mode="livesum",
+)
+DB_CONNECTION_ACQUIRE = Histogram(
+    "db_connection_acquire_seconds",
+    "Time spent waiting for a database connection from the pool",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+TASK_RUNTIME = Histogram(
+    "celery_task_runtime_seconds",
+    "Task execution time",
+    ["task", "state"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900),
+)
+TASK_QUEUE_WAIT = Histogram(
+    "celery_task_queue_wait_seconds",
+    "Time from publishing a task to the start of its execution",
+    ["task"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900),
+)
+TASK_FAILURES = Counter(
+    "celery_task_failures_total", "Tasks that raised an exception", ["task", "exception"]
+)
+TASK_RETRIES = Counter("celery_task_retries_total", "Task retries", ["task"])
+AUTOSCALER_PROCESSES = Gauge(
+    "celery_autoscaler_processes", "Worker pool processes", multiprocess_mode="liveall"
+)
+AUTOSCALER_BACKLOG = Gauge(
+    "celery_autoscaler_backlog",
+    "Tasks queued for the worker (broker plus prefetched)",
+    multiprocess_mode="liveall",
+)
+AUTOSCALER_DECISIONS = Counter(
+    "celery_autoscaler_decisions_total", "Pool resizes", ["direction", "reason"]
+)
+
+
+def metrics_registry() -> CollectorRegistry:
+    """Registry to expose: this process's metrics, or all processes' in multiprocess mode."""
+    if not MULTIPROCESS:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Return the metrics in the Prometheus text format and its content type."""
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+
+def route_template(scope) -> str:
+    """
+    Path template of the route handling ``scope``, used as the ``route`` label.
+
+    Unknown paths share one label so scanners cannot blow up label cardinality.
+    """
+    partial = None
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match is Match.FULL:
+            return route.path
+        if match is Match.PARTIAL and partial is None:
+            partial = route.path  # Path matched, method did not (405)
+    return partial or UNMATCHED_ROUTE
+
+
+class PrometheusMiddleware:
+    """
+    ASGI middleware recording per-route latency and in-flight requests.
+
+    A plain ASGI middleware rather than ``BaseHTTPMiddleware``, so streaming
+    responses (exports, SSE) pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(method, route, str(status_code)).observe(
+                time.perf_counter() - started
+            )
+            in_progress.dec()
+
+
+# Worker side: task_prerun and task_postrun run in the same worker process
+_task_started: dict[str, float] = {}
+_task_started_lock = threading.Lock()
+
+
+def on_task_prerun(task_id=None, task=None, **_kwargs):
+    """Record the start of a task and how long it waited in the queue."""
+    with _task_started_lock:
+        _task_started[task_id] = time.perf_counter()
+    published_at = task.request.get(PUBLISHED_AT_HEADER) if task is not None else None
+    if published_at is not None:
+        TASK_QUEUE_WAIT.labels(task.name).observe(max(0.0, time.time() - float(published_at)))
+
+
+def on_task_postrun(task_id=None, task=None, state=None, **_kwargs):
+    """Record the runtime of a finished task."""
+    with _task_started_lock:
+        started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_RUNTIME.labels(getattr(task, "name", "unknown"), state or "UNKNOWN").observe(
+            time.perf_counter() - started
+        )
+
+
+def on_task_failure(sender=None, exception=None, **_kwargs):
+    """Count a failed task by exception type."""
+    TASK_FAILURES.labels(getattr(sender, "name", "unknown"), type(exception).__name__).inc()
+
+
+def on_task_retry(sender=None, **_kwargs):
+    """Count a task retry."""
+    TASK_RETRIES.labels(getattr(sender, "name", "unknown")).inc()
+
+
+def on_worker_ready(**_kwargs):
+    """Serve the worker's metrics over HTTP from the main worker process."""
+    if settings.WORKER_METRICS_PORT is None:
+        return
+    start_http_server(settings.WORKER_METRICS_PORT, registry=metrics_registry())
+    logger.info("Serving worker metrics on port %d", settings.WORKER_METRICS_PORT)
+
+
+def on_worker_process_shutdown(pid=None, **_kwargs):
+    """Drop the live gauges of an exiting pool process."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+def connect_signals() -> None:
+    """Connect the worker metric handlers to Celery's signals."""
+    task_prerun.connect(on_task_prerun, weak=False)
+    task_postrun.connect(on_task_postrun, weak=False)
+    task_failure.connect(on_task_failure, weak=False)
+    task_retry.connect(on_task_retry, weak=False)
+    worker_ready.connect(on_worker_ready, weak=False)
+    worker_process_shutdown.connect(on_worker_process_shutdown, weak=False)
+
+
+if settings.METRICS_ENABLED:
+    connect_signals()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy import DDL, Column, DateTime, Float, Index, Integer, String, Text, event
 
 from app.db import Base
 from app.helpers import utc_now_naive
@@ -8,10 +8,101 @@ class Message(Base):
     """Message model for storing messages in the database."""
 
     __tablename__ = "messages"
+    __table_args__ = (
+        # Rows are appended in created_at order, so a tiny BRIN index is enough
+        # for time-range scans (GET /messages/stats)
+        Index("ix_messages_created_at", "created_at", postgresql_using="brin"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     content = Column(String, nullable=False)
     created_at = Column(DateTime, default=utc_now_naive, nullable=False)
 
     def __repr__(self):
         return f"<Message(id={self.id}, content={self.content})>"
+
+
+# Full-text search over Message.content (PostgreSQL only): a stored generated
+# tsvector column with a GIN index. It is deliberately not mapped, so ORM
+# queries never load it; crud.search_messages refers to it by name. Migration
+# 004 adds it to existing databases, the DDL below to ones built by create_all.
+MESSAGE_SEARCH_CONFIG = "english"
+MESSAGE_SEARCH_COLUMN = "search_vector"
+MESSAGE_SEARCH_INDEX = "ix_messages_search_vector"
+
+for _statement in (
+    f"ALTER TABLE messages ADD COLUMN {MESSAGE_SEARCH_COLUMN} tsvector "
+    f"GENERATED ALWAYS AS (to_tsvector('{MESSAGE_SEARCH_CONFIG}', content)) STORED",
+    f"CREATE INDEX {MESSAGE_SEARCH_INDEX} ON messages USING gin ({MESSAGE_SEARCH_COLUMN})",
+):
+    event.listen(
+        Message.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql")
+    )
+
+
+class TaskRecord(Base):
+    """Lifecycle record of a Celery task, written in batches from Celery signals."""
+
+    __tablename__ = "task_records"
+    __table_args__ = (
+        Index("ix_task_records_created_at", "created_at"),
+        Index("ix_task_records_state_created_at", "state", "created_at"),
+        Index("ix_task_records_name_created_at", "name", "created_at"),
+    )
+
+    task_id = Column(String(36), primary_key=True)
+    name = Column(String, nullable=True)
+    state = Column(String(16), nullable=False)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=utc_now_naive, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=utc_now_naive, nullable=False)
+
+    def __repr__(self):
+        return f"<TaskRecord(task_id={self.task_id}, name={self.name}, state={self.state})>"
+
+
+class TaskResult(Base):
+    """Celery result stored by ``app.result_backend.SQLResultBackend``."""
+
+    __tablename__ = "task_results"
+
+    key = Column(String(255), primary_key=True)
+    value = Column(Text, nullable=False)
+    expires_at = Column(DateTime, nullable=True, index=True)
+
+    def __repr__(self):
+        return f"<TaskResult(key={self.key}, expires_at={self.expires_at})>"
+
+
+class IdempotencyKey(Base):
+    """Response recorded for an ``Idempotency-Key`` header (see ``app.idempotency``)."""
+
+    __tablename__ = "idempotency_keys"
+
+    scope = Column(String(32), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    response = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=utc_now_naive, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey(scope={self.scope}, key={self.key})>"
+
+
+class JobCheckpoint(Base):
+    """Resume position and last throughput of a chunked maintenance job (see ``app.retention``)."""
+
+    __tablename__ = "job_checkpoints"
+
+    name = Column(String(64), primary_key=True)
+    position = Column(Integer, nullable=True)
+    processed = Column(Integer, default=0, nullable=False)
+    rows_per_second = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=utc_now_naive, nullable=False)
+
+    def __repr__(self):
+        return f"<JobCheckpoint(name={self.name}, position={self.position})>"
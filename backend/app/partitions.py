@@ -0,0 +1,294 @@
+"""
+Range partitioning of the ``messages`` table on ``created_at`` (PostgreSQL).
+
+On PostgreSQL, migration 006 (or ``init_db.py``) turns ``messages`` into a
+partitioned table. The existing heap is not copied: it is attached as the
+``messages_legacy`` partition, covering everything before the first new
+partition, and a ``messages_default`` partition catches rows no other
+partition covers. From then on:
+
+- ``ensure_partitions`` creates the next ``MESSAGE_PARTITIONS_AHEAD``
+  partitions (one per ``MESSAGE_PARTITION_INTERVAL``), run periodically by
+  the ``maintain_message_partitions`` beat task, moving any rows the default
+  partition holds for their range into them
+- ``drop_partitions_before`` detaches and drops partitions that are entirely
+  older than a cutoff, which removes their rows instantly and without vacuum
+
+Queries that filter on ``created_at`` (see the ``since``/``until`` arguments
+in ``app.crud``) only touch the partitions covering that range.
+
+Every function is a no-op on databases where ``messages`` is not partitioned.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import logging
+import re
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "messages"
+LEGACY_PARTITION = "messages_legacy"
+DEFAULT_PARTITION = "messages_default"
+_LEGACY_CHECK = "messages_created_at_before_partitions"
+
+_BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+@dataclass(frozen=True, slots=True)
+class Partition:
+    """A partition of ``messages`` covering ``[lower, upper)``; ``lower`` None means MINVALUE."""
+
+    name: str
+    lower: datetime | None
+    upper: datetime | None
+
+
+def period_start(moment: datetime, interval: str) -> datetime:
+    """Return the start of the ``day``, ``week`` (Monday) or ``month`` containing ``moment``."""
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "day":
+        return day
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    msg = f"Invalid partition interval: '{interval}'"
+    raise ValueError(msg)
+
+
+def next_period(start: datetime, interval: str) -> datetime:
+    """Return the start of the period following the one starting at ``start``."""
+    if interval == "day":
+        return start + timedelta(days=1)
+    if interval == "week":
+        return start + timedelta(weeks=1)
+    if interval == "month":
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    msg = f"Invalid partition interval: '{interval}'"
+    raise ValueError(msg)
+
+
+def partition_name(start: datetime) -> str:
+    """Name of the partition starting at ``start``, e.g. ``messages_p20261101``."""
+    return f"{PARENT_TABLE}_p{start:%Y%m%d}"
+
+
+def is_partitioned(connection) -> bool:
+    """Whether ``messages`` is a partitioned table on this connection's database."""
+    if connection.dialect.name != "postgresql":
+        return False
+    return bool(
+        connection.execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+                "WHERE partrelid = to_regclass(:table))"
+            ),
+            {"table": PARENT_TABLE},
+        ).scalar()
+    )
+
+
+def has_default_partition(connection) -> bool:
+    """Whether the partitioned ``messages`` table has a DEFAULT partition."""
+    return bool(
+        connection.execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+                "WHERE partrelid = to_regclass(:table) AND partdefid <> 0)"
+            ),
+            {"table": PARENT_TABLE},
+        ).scalar()
+    )
+
+
+def _parse_bound(value: str) -> datetime | None:
+    value = value.strip()
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def list_partitions(connection) -> list[Partition]:
+    """Return the partitions of ``messages`` ordered by lower bound."""
+    rows = connection.execute(
+        text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ),
+        {"table": PARENT_TABLE},
+    ).all()
+
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_RE.search(bound)
+        if match is None:  # DEFAULT partition
+            continue
+        partitions.append(Partition(name, _parse_bound(match[1]), _parse_bound(match[2])))
+    return sorted(partitions, key=lambda p: (p.lower is not None, p.lower))
+
+
+def create_partition(connection, start: datetime, end: datetime) -> str:
+    """
+    Create the partition for ``[start, end)`` and return its name.
+
+    PostgreSQL refuses a new partition while the default partition holds rows
+    in its range, so with a default partition the new table is filled with
+    those rows first and attached afterwards.
+    """
+    name = partition_name(start)
+    lower, upper = start.isoformat(sep=" "), end.isoformat(sep=" ")
+    if not has_default_partition(connection):
+        connection.execute(
+            text(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {PARENT_TABLE} '
+                f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+            )
+        )
+        return name
+
+    for statement in (
+        f'CREATE TABLE "{name}" (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING GENERATED)',
+        f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+            WHERE created_at >= '{lower}' AND created_at < '{upper}'
+            RETURNING id, content, created_at
+        )
+        INSERT INTO "{name}" (id, content, created_at) SELECT * FROM moved
+        """,
+        f'ALTER TABLE {PARENT_TABLE} ATTACH PARTITION "{name}" '
+        f"FOR VALUES FROM ('{lower}') TO ('{upper}')",
+    ):
+        connection.execute(text(statement))
+    return name
+
+
+def ensure_partitions(connection, interval: str, ahead: int, now: datetime) -> list[str]:
+    """
+    Create partitions so that the current period and ``ahead`` more are covered.
+
+    New partitions start where the newest existing one ends, so changing
+    ``interval`` later never produces overlapping ranges.
+
+    Returns:
+        Names of the partitions created
+    """
+    if not is_partitioned(connection):
+        return []
+
+    uppers = [p.upper for p in list_partitions(connection) if p.upper is not None]
+    start = max(uppers) if uppers else period_start(now, interval)
+    target = period_start(now, interval)
+    for _ in range(ahead + 1):
+        target = next_period(target, interval)
+
+    created = []
+    while start < target:
+        end = next_period(period_start(start, interval), interval)
+        created.append(create_partition(connection, start, end))
+        start = end
+    if created:
+        logger.info("Created message partitions: %s", ", ".join(created))
+    return created
+
+
+def drop_partitions_before(connection, cutoff: datetime) -> list[str]:
+    """
+    Detach and drop every partition whose rows are all older than ``cutoff``.
+
+    Returns:
+        Names of the partitions dropped
+    """
+    if not is_partitioned(connection):
+        return []
+
+    dropped = []
+    for partition in list_partitions(connection):
+        if partition.upper is None or partition.upper > cutoff:
+            continue
+        connection.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{partition.name}"'))
+        connection.execute(text(f'DROP TABLE "{partition.name}"'))
+        dropped.append(partition.name)
+    if dropped:
+        logger.info("Dropped message partitions: %s", ", ".join(dropped))
+    return dropped
+
+
+def prepare_messages_table(connection, boundary: datetime, concurrently: bool = False) -> None:
+    """
+    Get a plain ``messages`` table ready to become the legacy partition.
+
+    Builds the unique ``(id, created_at)`` index the partition's primary key
+    will use and validates a ``CHECK (created_at < boundary)`` constraint, so
+    ``partition_messages_table`` can attach the table without scanning it or
+    building an index under an exclusive lock. With ``concurrently`` (outside
+    a transaction) neither step blocks writes. Safe to re-run after a partial
+    failure: an index left invalid by a failed concurrent build is rebuilt
+    and the constraint is replaced.
+    """
+    bound = boundary.isoformat(sep=" ")
+    concurrently_sql = "CONCURRENTLY " if concurrently else ""
+    index_valid = connection.execute(
+        text(
+            "SELECT indisvalid FROM pg_index "
+            "WHERE indexrelid = to_regclass('ix_messages_id_created_at')"
+        )
+    ).scalar()
+    if index_valid is False:
+        connection.execute(text(f"DROP INDEX {concurrently_sql}ix_messages_id_created_at"))
+    for statement in (
+        f"CREATE UNIQUE INDEX {concurrently_sql}IF NOT EXISTS ix_messages_id_created_at "
+        f"ON {PARENT_TABLE} (id, created_at)",
+        f"ALTER TABLE {PARENT_TABLE} DROP CONSTRAINT IF EXISTS {_LEGACY_CHECK}",
+        f"ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT {_LEGACY_CHECK} "
+        f"CHECK (created_at < '{bound}') NOT VALID",
+        f"ALTER TABLE {PARENT_TABLE} VALIDATE CONSTRAINT {_LEGACY_CHECK}",
+    ):
+        connection.execute(text(statement))
+
+
+def partition_messages_table(connection, boundary: datetime) -> None:
+    """
+    Convert a plain ``messages`` table into one range-partitioned on ``created_at``.
+
+    The existing table is renamed to ``messages_legacy``, its primary key is
+    moved to the ``(id, created_at)`` index, and it is attached as the
+    partition for everything before ``boundary``; no rows are copied. A
+    ``messages_default`` partition takes rows no other partition covers. Run
+    ``prepare_messages_table`` with the same ``boundary`` first, then
+    ``ensure_partitions`` to create partitions from ``boundary`` on. Must run
+    in one transaction.
+    """
+    bound = boundary.isoformat(sep=" ")
+    for statement in (
+        f"ALTER TABLE {PARENT_TABLE} RENAME TO {LEGACY_PARTITION}",
+        # A partition's primary key must match the parent's (id, created_at)
+        f"ALTER TABLE {LEGACY_PARTITION} DROP CONSTRAINT messages_pkey",
+        f"ALTER TABLE {LEGACY_PARTITION} ADD CONSTRAINT messages_legacy_pkey "
+        "PRIMARY KEY USING INDEX ix_messages_id_created_at",
+        "ALTER INDEX IF EXISTS ix_messages_created_at RENAME TO ix_messages_legacy_created_at",
+        "ALTER INDEX IF EXISTS ix_messages_search_vector "
+        "RENAME TO ix_messages_legacy_search_vector",
+        f"""
+        CREATE TABLE {PARENT_TABLE} (
+            id integer NOT NULL DEFAULT nextval('messages_id_seq'::regclass),
+            content varchar NOT NULL,
+            created_at timestamp without time zone NOT NULL,
+            search_vector tsvector
+                GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
+            CONSTRAINT messages_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """,
+        f"ALTER SEQUENCE messages_id_seq OWNED BY {PARENT_TABLE}.id",
+        # Indexes matching the partitioned ones below are adopted, not rebuilt
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {LEGACY_PARTITION} "
+        f"FOR VALUES FROM (MINVALUE) TO ('{bound}')",
+        f"ALTER TABLE {LEGACY_PARTITION} DROP CONSTRAINT {_LEGACY_CHECK}",
+        f"CREATE INDEX ix_messages_created_at ON {PARENT_TABLE} USING brin (created_at)",
+        f"CREATE INDEX ix_messages_search_vector ON {PARENT_TABLE} USING gin (search_vector)",
+        f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT",
+    ):
+        connection.execute(text(statement))
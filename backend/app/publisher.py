@@ -0,0 +1,122 @@
+"""
+Non-blocking task publishing for async endpoints.
+
+``Task.delay()`` publishes to the broker synchronously: when RabbitMQ is slow
+(flow control, a reconnect, publisher confirms) the calling thread blocks. In
+an ``async def`` route that thread is the event loop, so every other request
+stalls with it. ``TaskPublisher`` runs publishes on a small dedicated thread
+pool sized to match Celery's broker producer pool (``broker_pool_limit``), so
+each publishing thread can hold a warm producer connection and the event loop
+only awaits a future.
+
+Results published from the pool must be readable from any thread, which rules
+out ``rpc://``: Celery addresses its replies to the publishing thread's
+``app.thread_oid``, so ``require_shared_result_backend`` refuses it at startup.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from functools import partial
+import logging
+
+from celery import Task
+from celery.backends.rpc import RPCBackend
+from celery.canvas import Signature
+from celery.result import AsyncResult
+
+from app.celery_app import celery_app
+from app.config import settings
+from app.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+
+def require_shared_result_backend(app=celery_app) -> None:
+    """
+    Refuse result backends that only the publishing thread can read.
+
+    Raises:
+        RuntimeError: if ``app`` uses the ``rpc://`` result backend
+    """
+    # rpc:// replies go to a queue named after the publishing thread
+    thread_bound = isinstance(app.backend, RPCBackend)
+    if thread_bound:
+        msg = (
+            "CELERY_RESULT_BACKEND=rpc:// cannot be used by the API: results would only "
+            "reach the publishing thread. Use app.result_backend:SQLResultBackend."
+        )
+        raise RuntimeError(msg)
+
+
+class TaskPublisher:
+    """Publish Celery tasks and canvases from async code without blocking the loop."""
+
+    def __init__(self, app=celery_app, pool_size: int = 8):
+        self.app = app
+        self.pool_size = pool_size
+        self._executor: ThreadPoolExecutor | None = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.pool_size, thread_name_prefix="task-publisher"
+            )
+        return self._executor
+
+    async def apply_async(self, task: Task, args=None, kwargs=None, **options) -> AsyncResult:
+        """Publish ``task`` like ``task.apply_async`` and return its ``AsyncResult``."""
+        with start_span(
+            f"publish {task.name}", kind="producer", attributes={"celery.task": task.name}
+        ) as span:
+            result = await self._run(partial(task.apply_async, args=args, kwargs=kwargs, **options))
+            if span is not None:
+                span.attributes["celery.task_id"] = result.id
+            return result
+
+    async def delay(self, task: Task, *args, **kwargs) -> AsyncResult:
+        """Publish ``task`` like ``task.delay``."""
+        return await self.apply_async(task, args=args, kwargs=kwargs)
+
+    async def apply_signature(self, signature: Signature, **options):
+        """Publish a signature or canvas (group, chain, ...) and return its result."""
+        name = getattr(signature, "name", None) or type(signature).__name__
+        with start_span(f"publish {name}", kind="producer", attributes={"celery.task": name}):
+            return await self._run(partial(signature.apply_async, **options))
+
+    async def warm_up(self) -> int:
+        """
+        Open broker connections for the producer pool ahead of the first request.
+
+        Returns:
+            Number of producer connections established
+        """
+        return await self._run(self._warm_up)
+
+    def _warm_up(self) -> int:
+        producers = []
+        try:
+            for _ in range(self.pool_size):
+                producer = self.app.producer_pool.acquire(block=True, timeout=5)
+                producers.append(producer)
+                producer.connection.ensure_connection(max_retries=1)
+        except Exception:
+            logger.warning("Could not warm up broker producer pool", exc_info=True)
+        finally:
+            for producer in producers:
+                producer.release()
+        return len(producers)
+
+    async def _run(self, func):
+        loop = asyncio.get_running_loop()
+        # Run in a copy of the caller's context, so the publish carries its trace
+        return await loop.run_in_executor(self.executor, contextvars.copy_context().run, func)
+
+    def shutdown(self) -> None:
+        """Wait for in-flight publishes and stop the publishing threads."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+task_publisher = TaskPublisher(pool_size=settings.TASK_PUBLISH_POOL_SIZE)
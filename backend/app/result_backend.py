@@ -0,0 +1,115 @@
+"""
+Celery result backend stored in the application's PostgreSQL database.
+
+With ``rpc://`` only the process that published a task can read its result,
+so behind a load balancer ``GET /tasks/{task_id}`` stays PENDING on every
+other API replica. ``SQLResultBackend`` keeps results in the ``task_results``
+table through the existing ``sync_engine`` instead, so any replica can serve
+status lookups.
+
+Rows are compact: a short key, the JSON-encoded result meta and an expiry
+time. Expired rows are never returned and are deleted in bounded chunks by
+``cleanup()``, which Celery beat runs through the built-in
+``celery.backend_cleanup`` task.
+
+It is the default ``CELERY_RESULT_BACKEND``::
+
+    CELERY_RESULT_BACKEND=app.result_backend:SQLResultBackend
+"""
+from datetime import timedelta
+
+from celery.backends.base import KeyValueStoreBackend
+from kombu.utils.encoding import bytes_to_str
+from sqlalchemy import delete, or_, select
+
+from app.db import dialect_insert, sync_engine
+from app.helpers import utc_now_naive
+from app.models import TaskResult
+
+CLEANUP_CHUNK_SIZE = 5000
+
+
+class SQLResultBackend(KeyValueStoreBackend):
+    """Key/value result backend on the ``task_results`` table."""
+
+    key_t = staticmethod(bytes_to_str)
+    task_keyprefix = "task:"
+    group_keyprefix = "group:"
+    chord_keyprefix = "chord:"
+    supports_autoexpire = False
+
+    def __init__(self, app=None, url=None, expires=None, engine=None, **kwargs):
+        super().__init__(app=app, url=url, **kwargs)
+        self.engine = engine if engine is not None else sync_engine
+        self.expires = self.prepare_expires(expires, type=int)
+
+    def _not_expired(self):
+        return or_(TaskResult.expires_at.is_(None), TaskResult.expires_at > utc_now_naive())
+
+    def get(self, key):
+        with self.engine.connect() as connection:
+            return connection.execute(
+                select(TaskResult.value).where(TaskResult.key == key, self._not_expired())
+            ).scalar()
+
+    def mget(self, keys):
+        keys = [bytes_to_str(key) for key in keys]
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(TaskResult.key, TaskResult.value).where(
+                    TaskResult.key.in_(keys), self._not_expired()
+                )
+            ).all()
+        return dict(rows)
+
+    def set(self, key, value):
+        expires_at = utc_now_naive() + timedelta(seconds=self.expires) if self.expires else None
+        with self.engine.begin() as connection:
+            statement = dialect_insert(connection)(TaskResult.__table__).values(
+                key=key, value=bytes_to_str(value), expires_at=expires_at
+            )
+            connection.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[TaskResult.key],
+                    set_={"value": statement.excluded.value, "expires_at": expires_at},
+                )
+            )
+
+    def delete(self, key):
+        with self.engine.begin() as connection:
+            connection.execute(delete(TaskResult).where(TaskResult.key == key))
+
+    def cleanup(self) -> int:
+        """
+        Delete expired results in chunks of ``CLEANUP_CHUNK_SIZE`` rows.
+
+        Each chunk is its own short transaction, so the sweep never holds
+        locks on a large part of the table.
+
+        Returns:
+            Number of rows deleted
+        """
+        now = utc_now_naive()
+        deleted = 0
+        while True:
+            expired = (
+                select(TaskResult.key)
+                .where(TaskResult.expires_at < now)
+                .limit(CLEANUP_CHUNK_SIZE)
+                .scalar_subquery()
+            )
+            with self.engine.begin() as connection:
+                count = connection.execute(
+                    delete(TaskResult).where(TaskResult.key.in_(expired))
+                ).rowcount
+            deleted += count
+            if count < CLEANUP_CHUNK_SIZE:
+                return deleted
+
+    def as_uri(self, include_password=False):  # noqa: ARG002 - no credentials in the URI
+        return f"{type(self).__module__}:{type(self).__name__}"
+
+    def __reduce__(self, args=(), kwargs=None):
+        kwargs = kwargs or {}
+        kwargs.update({"expires": self.expires})
+        return super().__reduce__(args, kwargs)
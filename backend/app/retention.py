@@ -0,0 +1,164 @@
+"""
+Chunked purge of messages older than the retention period.
+
+A single ``DELETE ... WHERE created_at < cutoff`` over a large table holds
+locks and generates WAL for as long as it runs, and competes with the API for
+I/O the whole time. ``purge_messages_before`` instead walks the primary key in
+ranges of ``chunk_size`` ids and deletes the expired rows of one range per
+short transaction, sleeping ``pause`` seconds between ranges so foreground
+queries get the database back in between.
+
+Ids are assigned in insert order, so expired rows sit at the low end of the
+id space. The walk stops at the first range that still holds rows after the
+delete (the retention frontier) and records where it stopped in
+``job_checkpoints``; the next run resumes there instead of rescanning ids
+that were already purged. Runs are bounded by ``max_seconds`` and simply
+continue from the checkpoint next time.
+
+On a partitioned ``messages`` table, whole partitions past retention are
+dropped by ``maintain_message_partitions``; this job removes the rest.
+"""
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+import logging
+import time
+
+from sqlalchemy import delete, func, select
+
+from app.db import dialect_insert
+from app.helpers import utc_now_naive
+from app.models import JobCheckpoint, Message
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "purge_expired_messages"
+
+
+@dataclass(slots=True)
+class PurgeResult:
+    """Outcome of one purge run."""
+
+    deleted: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+    rows_per_second: float = 0.0
+    position: int | None = None
+    done: bool = True
+
+
+def load_checkpoint(connection, name: str = JOB_NAME) -> int | None:
+    """Return the id the job ``name`` should resume from, or None to start at the beginning."""
+    return connection.scalar(select(JobCheckpoint.position).where(JobCheckpoint.name == name))
+
+
+def save_checkpoint(
+    connection, position: int | None, deleted: int, rows_per_second: float, name: str = JOB_NAME
+) -> None:
+    """Record the resume position of job ``name`` and add ``deleted`` to its total."""
+    now = utc_now_naive()
+    statement = dialect_insert(connection)(JobCheckpoint.__table__).values(
+        name=name,
+        position=position,
+        processed=deleted,
+        rows_per_second=rows_per_second,
+        updated_at=now,
+    )
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=[JobCheckpoint.name],
+            set_={
+                "position": position,
+                "processed": JobCheckpoint.processed + deleted,
+                "rows_per_second": rows_per_second,
+                "updated_at": now,
+            },
+        )
+    )
+
+
+def _rows_per_second(deleted: int, started: float) -> float:
+    elapsed = time.monotonic() - started
+    return deleted / elapsed if elapsed > 0 else 0.0
+
+
+def purge_messages_before(
+    engine,
+    cutoff: datetime,
+    *,
+    chunk_size: int = 5000,
+    pause: float = 0.1,
+    max_seconds: float = 600,
+    on_delete: Callable[[list[int]], None] | None = None,
+) -> PurgeResult:
+    """
+    Delete messages created before ``cutoff`` in bounded id-range chunks.
+
+    Args:
+        engine: Sync engine; every chunk runs in its own transaction
+        cutoff: Messages created before this time are deleted
+        chunk_size: Ids covered by one chunk (and so at most rows deleted by it)
+        pause: Seconds to sleep between chunks
+        max_seconds: Stop starting new chunks after this long; the next run
+            resumes from the checkpoint
+        on_delete: Called with the ids deleted by each chunk, after it commits
+
+    Returns:
+        PurgeResult; ``done`` is False when the run stopped at ``max_seconds``
+        with expired rows possibly left
+    """
+    started = time.monotonic()
+    with engine.connect() as connection:
+        position = load_checkpoint(connection)
+
+    result = PurgeResult(position=position, done=False)
+    while time.monotonic() - started < max_seconds:
+        if result.chunks:
+            time.sleep(pause)
+
+        with engine.begin() as connection:
+            # Seek past id gaps (and ranges emptied by earlier runs) on the primary key
+            lower = select(func.min(Message.id))
+            if position is not None:
+                lower = lower.where(Message.id >= position)
+            lower = connection.scalar(lower)
+            if lower is None:
+                result.done = True
+                break
+
+            in_range = (Message.id >= lower, Message.id < lower + chunk_size)
+            deleted = connection.scalars(
+                delete(Message)
+                .where(*in_range, Message.created_at < cutoff)
+                .returning(Message.id)
+            ).all()
+            # Rows left in the range are newer than the cutoff: the frontier was reached
+            frontier = connection.scalar(select(Message.id).where(*in_range).limit(1)) is not None
+            position = lower if frontier else lower + chunk_size
+            result.deleted += len(deleted)
+            result.chunks += 1
+            result.position = position
+            save_checkpoint(
+                connection, position, len(deleted), _rows_per_second(result.deleted, started)
+            )
+
+        if deleted and on_delete is not None:
+            on_delete(list(deleted))
+        logger.debug(
+            "Purged %d messages with ids in [%d, %d)", len(deleted), lower, lower + chunk_size
+        )
+        if frontier:
+            result.done = True
+            break
+
+    result.seconds = time.monotonic() - started
+    result.rows_per_second = _rows_per_second(result.deleted, started)
+    logger.info(
+        "Purged %d messages created before %s in %d chunks (%.0f rows/s)%s",
+        result.deleted,
+        cutoff.isoformat(),
+        result.chunks,
+        result.rows_per_second,
+        "" if result.done else "; time budget exhausted, will resume",
+    )
+    return result
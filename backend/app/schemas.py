@@ -19,6 +19,65 @@ class MessageResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class MessageBulkCreateResponse(BaseModel):
+    """Schema for bulk message creation response."""
+
+    inserted: int
+    first_id: int | None = None
+    last_id: int | None = None
+
+
+class MessageCacheStats(BaseModel):
+    """Schema for GET /messages/{id} cache statistics."""
+
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+    invalidations: int
+
+
+class MessagePage(BaseModel):
+    """Schema for a cursor-paginated page of messages."""
+
+    items: list[MessageResponse]
+    next_cursor: str | None = None
+
+
+class MessageSearchResult(MessageResponse):
+    """Schema for a full-text search hit."""
+
+    rank: float
+
+
+class MessageSearchPage(BaseModel):
+    """Schema for a cursor-paginated page of search results."""
+
+    items: list[MessageSearchResult]
+    next_cursor: str | None = None
+
+
+class MessageStatsBucket(BaseModel):
+    """Schema for the message count of one time bucket."""
+
+    start: datetime
+    count: int
+
+
+class MessageStatsResponse(BaseModel):
+    """Schema for time-bucketed message counts."""
+
+    bucket: str
+    from_: datetime = Field(alias="from")
+    to: datetime
+    total: int
+    buckets: list[MessageStatsBucket]
+
+    model_config = {"populate_by_name": True}
+
+
 class TaskEnqueueResponse(BaseModel):
     """Schema for task enqueue response."""
 
@@ -27,6 +86,16 @@ class TaskEnqueueResponse(BaseModel):
     message: str = "Task enqueued successfully"
 
 
+class TaskBatchEnqueueResponse(BaseModel):
+    """Schema for batch task enqueue response."""
+
+    group_id: str
+    task_ids: list[str]
+    total: int
+    status: str = "PENDING"
+    message: str = "Tasks enqueued successfully"
+
+
 class TaskStatusResponse(BaseModel):
     """Schema for task status response."""
 
@@ -35,11 +104,18 @@ class TaskStatusResponse(BaseModel):
     result: dict | None = None
 
 
+class TaskStatusBatchRequest(BaseModel):
+    """Schema for looking up the status of many tasks at once."""
+
+    task_ids: list[str] = Field(..., min_length=1, max_length=1000)
+
+
 class TaskListItem(BaseModel):
     """Schema for a task in the list."""
 
     task_id: str
     status: str
+    name: str | None = None
 
 
 class TaskListResponse(BaseModel):
@@ -47,3 +123,25 @@ class TaskListResponse(BaseModel):
 
     tasks: list[TaskListItem]
     total: int
+
+
+class TaskRecordResponse(BaseModel):
+    """Schema for a persisted task lifecycle record."""
+
+    task_id: str
+    name: str | None = None
+    state: str
+    error: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    updated_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+class TaskHistoryResponse(BaseModel):
+    """Schema for a cursor-paginated page of task records."""
+
+    items: list[TaskRecordResponse]
+    next_cursor: str | None = None
@@ -0,0 +1,118 @@
+"""
+Fan-out of Celery task events to Server-Sent Events subscribers.
+
+The API process already runs one ``TaskEventsConsumer`` (see
+``app.task_registry``). ``TaskEventBroadcaster`` registers itself as a listener
+on that consumer and forwards each task's events to the asyncio queues of the
+clients subscribed to it, so any number of ``GET /tasks/{task_id}/events``
+streams share a single broker connection.
+
+Tasks can report progress by emitting a custom event from a bound task::
+
+    self.send_event("task-progress", current=3, total=10)
+"""
+import asyncio
+import threading
+
+from app.task_registry import EVENT_STATES, task_events_consumer
+
+PROGRESS_EVENT = "task-progress"
+
+# Streams use Celery's state names; the registry reports started tasks as ACTIVE
+REGISTRY_TO_CELERY_STATES = {"ACTIVE": "STARTED"}
+
+
+def stream_state(state: str) -> str:
+    """Celery's name for a registry ``state`` (``ACTIVE`` becomes ``STARTED``)."""
+    return REGISTRY_TO_CELERY_STATES.get(state, state)
+
+# Fields Celery adds to every event; anything else on a progress event is progress data
+CELERY_EVENT_FIELDS = frozenset(
+    {"type", "uuid", "hostname", "timestamp", "utcoffset", "pid", "clock", "local_received"}
+)
+
+
+def event_payload(event: dict) -> dict | None:
+    """
+    Convert a raw Celery task event into the payload sent to SSE clients.
+
+    Returns:
+        dict with ``task_id`` and ``status`` (plus ``result``, ``error`` or
+        ``progress`` when present), or None for events that are not streamed
+    """
+    event_type = event.get("type")
+    if event_type == PROGRESS_EVENT:
+        progress = {k: v for k, v in event.items() if k not in CELERY_EVENT_FIELDS}
+        return {"task_id": event.get("uuid"), "status": "PROGRESS", "progress": progress}
+
+    state = EVENT_STATES.get(event_type)
+    if state is None:
+        return None
+    payload = {"task_id": event.get("uuid"), "status": stream_state(state)}
+    if "result" in event:
+        payload["result"] = event["result"]
+    if "exception" in event:
+        payload["error"] = event["exception"]
+    return payload
+
+
+class TaskEventBroadcaster:
+    """Route task events from the consumer thread to per-task asyncio queues."""
+
+    def __init__(self, max_queue_size: int = 100):
+        self.max_queue_size = max_queue_size
+        self._subscribers: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, task_id: str) -> asyncio.Queue:
+        """Return a queue receiving payloads for ``task_id`` on the running event loop."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue_size)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.setdefault(task_id, set()).add(subscriber)
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue) -> None:
+        """Stop delivering events for ``task_id`` to ``queue``."""
+        with self._lock:
+            subscribers = self._subscribers.get(task_id)
+            if not subscribers:
+                return
+            subscribers.difference_update({s for s in subscribers if s[1] is queue})
+            if not subscribers:
+                del self._subscribers[task_id]
+
+    def subscriber_count(self, task_id: str | None = None) -> int:
+        """Number of subscribed queues, for one task or in total."""
+        with self._lock:
+            if task_id is not None:
+                return len(self._subscribers.get(task_id, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, event: dict) -> None:
+        """Deliver an event to every subscriber of its task. Safe to call from any thread."""
+        task_id = event.get("uuid")
+        with self._lock:
+            subscribers = list(self._subscribers.get(task_id, ()))
+        if not subscribers:
+            return
+        payload = event_payload(event)
+        if payload is None:
+            return
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, payload)
+            except RuntimeError:
+                # The subscriber's event loop has already been closed
+                self.unsubscribe(task_id, queue)
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue, payload: dict) -> None:
+        # A slow client loses its oldest events rather than blocking everyone else
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(payload)
+
+
+task_event_broadcaster = TaskEventBroadcaster()
+task_events_consumer.add_listener(task_event_broadcaster.publish)
@@ -0,0 +1,213 @@
+"""
+Persistent task lifecycle records written from Celery signals.
+
+The ``rpc://`` result backend forgets finished tasks, so every publish, start
+and finish is also recorded in the ``task_records`` table. Signal handlers
+never touch the database themselves: they hand a small dict to the process's
+``TaskRecordWriter``, which coalesces transitions per task and upserts them
+in one transaction every ``TASK_RECORDS_FLUSH_INTERVAL_MS`` (or as soon as
+``TASK_RECORDS_BATCH_SIZE`` transitions are waiting).
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+
+from celery.signals import (
+    before_task_publish,
+    task_failure,
+    task_postrun,
+    task_prerun,
+    worker_process_shutdown,
+)
+from sqlalchemy import case, func
+
+from app.config import settings
+from app.db import dialect_insert, sync_engine
+from app.helpers import utc_now_naive
+from app.models import TaskRecord
+
+logger = logging.getLogger(__name__)
+
+PENDING = "PENDING"
+
+
+def merge_transitions(transitions: list[dict]) -> list[dict]:
+    """
+    Collapse transitions for the same task into one row, keeping arrival order.
+
+    Later values win, except that a PENDING transition never overrides a state
+    reported by a worker and the earliest ``created_at`` is kept.
+    """
+    rows: dict[str, dict] = {}
+    for transition in transitions:
+        row = rows.get(transition["task_id"])
+        if row is None:
+            rows[transition["task_id"]] = dict(transition)
+            continue
+        for key, value in transition.items():
+            if value is None:
+                continue
+            if key == "state" and value == PENDING:
+                continue
+            if key == "created_at":
+                value = min(value, row["created_at"])
+            row[key] = value
+    return list(rows.values())
+
+
+def upsert_task_records(connection, rows: list[dict]) -> None:
+    """Insert or merge task records with one ``INSERT ... ON CONFLICT`` statement."""
+    least = func.least if connection.dialect.name == "postgresql" else func.min
+    table = TaskRecord.__table__
+
+    statement = dialect_insert(connection)(table).values(rows)
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.task_id],
+        set_={
+            "name": func.coalesce(excluded.name, table.c.name),
+            "state": case((excluded.state == PENDING, table.c.state), else_=excluded.state),
+            "error": func.coalesce(excluded.error, table.c.error),
+            "created_at": least(excluded.created_at, table.c.created_at),
+            "started_at": func.coalesce(excluded.started_at, table.c.started_at),
+            "finished_at": func.coalesce(excluded.finished_at, table.c.finished_at),
+            "updated_at": excluded.updated_at,
+        },
+    )
+    connection.execute(statement)
+
+
+class TaskRecordWriter:
+    """Buffer task transitions in memory and flush them in batches from a thread."""
+
+    def __init__(self, engine=sync_engine, batch_size: int = 500, flush_interval_ms: int = 500):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: queue.Queue[dict] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    def record(self, task_id: str, state: str, **fields) -> None:
+        """Queue a transition for ``task_id``; never blocks on the database."""
+        now = utc_now_naive()
+        self._ensure_started()
+        self._queue.put(
+            {
+                "task_id": task_id,
+                "state": state,
+                "name": fields.get("name"),
+                "error": fields.get("error"),
+                "created_at": fields.get("created_at", now),
+                "started_at": fields.get("started_at"),
+                "finished_at": fields.get("finished_at"),
+                "updated_at": now,
+            }
+        )
+
+    def flush(self) -> int:
+        """Write everything currently queued. Returns the number of transitions written."""
+        transitions = []
+        while True:
+            try:
+                transitions.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._write(transitions)
+        return len(transitions)
+
+    def _ensure_started(self) -> None:
+        # Prefork workers inherit the parent's writer: start a thread per process
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._run, name="task-records-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            transitions = [self._queue.get()]
+            # Give other transitions up to flush_interval to join this batch
+            try:
+                while len(transitions) < self.batch_size:
+                    transitions.append(self._queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                pass
+            self._write(transitions)
+
+    def _write(self, transitions: list[dict]) -> None:
+        if not transitions:
+            return
+        try:
+            with self.engine.begin() as connection:
+                upsert_task_records(connection, merge_transitions(transitions))
+        except Exception:
+            logger.exception("Failed to write %d task record transitions", len(transitions))
+
+
+task_record_writer = TaskRecordWriter(
+    batch_size=settings.TASK_RECORDS_BATCH_SIZE,
+    flush_interval_ms=settings.TASK_RECORDS_FLUSH_INTERVAL_MS,
+)
+
+
+def on_before_task_publish(sender=None, headers=None, **_kwargs):
+    """Record a PENDING task as soon as it is published."""
+    headers = headers or {}
+    task_id = headers.get("id")
+    if task_id:
+        task_record_writer.record(task_id, PENDING, name=headers.get("task") or sender)
+
+
+def on_task_prerun(task_id=None, task=None, **_kwargs):
+    """Record that a worker started executing the task."""
+    task_record_writer.record(
+        task_id, "STARTED", name=getattr(task, "name", None), started_at=utc_now_naive()
+    )
+
+
+def on_task_postrun(task_id=None, task=None, state=None, **_kwargs):
+    """Record the final state of the task."""
+    task_record_writer.record(
+        task_id,
+        state or "SUCCESS",
+        name=getattr(task, "name", None),
+        finished_at=utc_now_naive(),
+    )
+
+
+def on_task_failure(task_id=None, exception=None, sender=None, **_kwargs):
+    """Record the error of a failed task."""
+    task_record_writer.record(
+        task_id,
+        "FAILURE",
+        name=getattr(sender, "name", None),
+        error=repr(exception)[:1000],
+        finished_at=utc_now_naive(),
+    )
+
+
+def on_worker_process_shutdown(**_kwargs):
+    """Flush pending transitions before a worker process exits."""
+    task_record_writer.flush()
+
+
+def connect_signals() -> None:
+    """Connect the task record handlers to Celery's signals."""
+    before_task_publish.connect(on_before_task_publish, weak=False)
+    task_prerun.connect(on_task_prerun, weak=False)
+    task_postrun.connect(on_task_postrun, weak=False)
+    task_failure.connect(on_task_failure, weak=False)
+    worker_process_shutdown.connect(on_worker_process_shutdown, weak=False)
+    atexit.register(task_record_writer.flush)
+
+
+if settings.TASK_RECORDS_ENABLED:
+    connect_signals()
@@ -0,0 +1,224 @@
+"""
+In-memory registry of Celery task states fed by the Celery events stream.
+
+``GET /tasks/`` used to call ``inspect().active()``, ``scheduled()`` and
+``reserved()``, each a broadcast that blocks until the worker reply timeout.
+Instead, a background ``TaskEventsConsumer`` thread listens to the task events
+that workers (``worker_send_task_events``) and publishers
+(``task_send_sent_event``) emit, and keeps a ``TaskRegistry`` indexed by task
+id, state and task name. Listing tasks is then a dictionary lookup.
+
+Past ``max_tasks`` the registry forgets finished tasks first, oldest first.
+Tasks still in flight are kept until they finish, unless there are more than
+``max_in_flight`` of them (e.g. their final events were lost).
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+import logging
+import threading
+import time
+
+from app.celery_app import celery_app
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Celery event type -> state reported by the API
+EVENT_STATES = {
+    "task-sent": "PENDING",
+    "task-received": "RESERVED",
+    "task-started": "ACTIVE",
+    "task-succeeded": "SUCCESS",
+    "task-failed": "FAILURE",
+    "task-retried": "RETRY",
+    "task-revoked": "REVOKED",
+    "task-rejected": "REJECTED",
+}
+
+IN_FLIGHT_STATES = frozenset({"PENDING", "RESERVED", "SCHEDULED", "ACTIVE", "RETRY"})
+FINISHED_STATES = frozenset({"SUCCESS", "FAILURE", "REVOKED", "REJECTED"})
+
+
+@dataclass(slots=True)
+class TaskEntry:
+    """Last known state of a single task."""
+
+    task_id: str
+    state: str
+    name: str | None = None
+    updated_at: float = 0.0
+
+
+class TaskRegistry:
+    """Thread-safe, bounded task registry with secondary indexes on state and name."""
+
+    def __init__(self, max_tasks: int = 10_000, max_in_flight: int = 100_000):
+        self.max_tasks = max_tasks
+        self.max_in_flight = max_in_flight
+        self._tasks: OrderedDict[str, TaskEntry] = OrderedDict()
+        # Finished task ids in the order they finished (finished states are final)
+        self._finished: OrderedDict[str, None] = OrderedDict()
+        self._by_state: dict[str, dict[str, None]] = {}
+        self._by_name: dict[str, dict[str, None]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def handle_event(self, event: dict) -> None:
+        """Apply a Celery task event to the registry; other events are ignored."""
+        state = EVENT_STATES.get(event.get("type"))
+        task_id = event.get("uuid")
+        if state is None or not task_id:
+            return
+        if state == "RESERVED" and event.get("eta"):
+            state = "SCHEDULED"
+        self.update(task_id, state, name=event.get("name"), timestamp=event.get("timestamp"))
+
+    def update(
+        self, task_id: str, state: str, name: str | None = None, timestamp: float | None = None
+    ) -> None:
+        """Record a state transition for ``task_id``."""
+        with self._lock:
+            entry = self._tasks.get(task_id)
+            if entry is None:
+                entry = TaskEntry(task_id=task_id, state=state, name=name)
+                self._tasks[task_id] = entry
+                self._index(entry)
+            else:
+                # Events can arrive out of order: finished states are final and
+                # a late task-sent never overrides what the worker reported.
+                if entry.state in FINISHED_STATES or state == "PENDING":
+                    return
+                self._unindex(entry)
+                entry.state = state
+                if name:
+                    entry.name = name
+                self._index(entry)
+                self._tasks.move_to_end(task_id)
+            entry.updated_at = timestamp or time.time()
+            self._evict()
+
+    def get(self, task_id: str) -> TaskEntry | None:
+        """Return the entry for ``task_id`` if it is being tracked."""
+        return self._tasks.get(task_id)
+
+    def list_tasks(
+        self, states: set[str] | frozenset[str] | None = None, name: str | None = None
+    ) -> list[TaskEntry]:
+        """
+        List tracked tasks, most recently updated last.
+
+        Args:
+            states: Only include tasks in one of these states (all if None)
+            name: Only include tasks with this task name
+        """
+        with self._lock:
+            if name is not None:
+                task_ids = self._by_name.get(name, {}).keys()
+                entries = [self._tasks[task_id] for task_id in task_ids]
+                if states is not None:
+                    entries = [entry for entry in entries if entry.state in states]
+            elif states is not None:
+                entries = [
+                    self._tasks[task_id]
+                    for state in states
+                    for task_id in self._by_state.get(state, {})
+                ]
+            else:
+                entries = list(self._tasks.values())
+        return sorted(entries, key=lambda entry: entry.updated_at)
+
+    def clear(self) -> None:
+        """Forget every tracked task."""
+        with self._lock:
+            self._tasks.clear()
+            self._finished.clear()
+            self._by_state.clear()
+            self._by_name.clear()
+
+    def _index(self, entry: TaskEntry) -> None:
+        self._by_state.setdefault(entry.state, {})[entry.task_id] = None
+        if entry.state in FINISHED_STATES:
+            self._finished[entry.task_id] = None
+        if entry.name:
+            self._by_name.setdefault(entry.name, {})[entry.task_id] = None
+
+    def _unindex(self, entry: TaskEntry) -> None:
+        self._by_state.get(entry.state, {}).pop(entry.task_id, None)
+        self._finished.pop(entry.task_id, None)
+        if entry.name:
+            self._by_name.get(entry.name, {}).pop(entry.task_id, None)
+
+    def _evict(self) -> None:
+        while len(self._tasks) > self.max_tasks and self._finished:
+            task_id = next(iter(self._finished))
+            self._unindex(self._tasks.pop(task_id))
+        while len(self._tasks) - len(self._finished) > self.max_in_flight:
+            # Least recently updated in-flight task
+            task_id = next(task_id for task_id in self._tasks if task_id not in self._finished)
+            self._unindex(self._tasks.pop(task_id))
+
+
+class TaskEventsConsumer:
+    """Background thread that feeds Celery task events into a ``TaskRegistry``."""
+
+    def __init__(self, registry: TaskRegistry, app=celery_app, retry_interval: float = 5.0):
+        self.registry = registry
+        self.app = app
+        self.retry_interval = retry_interval
+        self._receiver = None
+        self._listeners = []
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add_listener(self, listener) -> None:
+        """Also pass every received event to ``listener`` (called from the consumer thread)."""
+        self._listeners.append(listener)
+
+    def handle_event(self, event: dict) -> None:
+        """Update the registry, then notify listeners."""
+        self.registry.handle_event(event)
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception:
+                logger.exception("Task event listener %r failed", listener)
+
+    def start(self) -> None:
+        """Start consuming events in a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="task-events", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop consuming and wait for the thread to exit."""
+        self._stopped.set()
+        if self._receiver is not None:
+            self._receiver.should_stop = True
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                with self.app.connection_for_read() as connection:
+                    self._receiver = self.app.events.Receiver(
+                        connection, handlers={"*": self.handle_event}
+                    )
+                    # stop() may have run before the receiver existed
+                    self._receiver.should_stop = self._stopped.is_set()
+                    self._receiver.capture(limit=None, timeout=None, wakeup=True)
+            except Exception:
+                logger.exception("Task events consumer failed, retrying")
+                self._stopped.wait(self.retry_interval)
+
+
+task_registry = TaskRegistry(
+    max_tasks=settings.TASK_REGISTRY_MAX_TASKS,
+    max_in_flight=settings.TASK_REGISTRY_MAX_IN_FLIGHT,
+)
+task_events_consumer = TaskEventsConsumer(task_registry)
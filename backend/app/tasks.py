@@ -1,9 +1,21 @@
+from dataclasses import asdict
+from datetime import timedelta
+
 from celery import Task
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import DBAPIError
 
 from app.celery_app import celery_app
-from app.db import SyncSessionLocal
+from app.config import settings
+from app.db import SyncSessionLocal, sync_engine
+from app.group_commit import CommitOutcomeUnknownError, GroupCommitBuffer
 from app.helpers import utc_now_naive
-from app.models import Message
+from app.message_cache import message_invalidator
+from app.models import IdempotencyKey, Message
+from app.partitions import drop_partitions_before, ensure_partitions
+from app.retention import PurgeResult, purge_messages_before
+
+_message_buffer: GroupCommitBuffer | None = None
 
 
 class DatabaseTask(Task):
@@ -25,17 +37,80 @@ class DatabaseTask(Task):
             self._session = None
 
 
+def _insert_messages(session, rows: list[dict]) -> list:
+    """Insert message rows with one multi-row INSERT, returning (id, created_at) in order."""
+    result = session.execute(
+        insert(Message).returning(Message.id, Message.created_at, sort_by_parameter_order=True),
+        rows,
+    )
+    return result.all()
+
+
+def _flush_message_batch(rows: list[dict]) -> list:
+    """Write a group-commit batch of messages in one transaction."""
+    session = SyncSessionLocal()
+    try:
+        inserted = _insert_messages(session, rows)
+        try:
+            session.commit()
+        except DBAPIError as e:
+            # The server may have committed before the connection dropped
+            if e.connection_invalidated:
+                message = "Connection lost while committing a group-commit batch"
+                raise CommitOutcomeUnknownError(message) from e
+            raise
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    return inserted
+
+
+def _message_batch_results(rows: list[dict], inserted: list) -> list[dict]:
+    """Invalidate cached reads of a committed batch and build each task's result."""
+    message_invalidator.publish(row.id for row in inserted)
+    return [
+        {
+            "id": row.id,
+            "content": data["content"],
+            "created_at": row.created_at.isoformat(),
+        }
+        for row, data in zip(inserted, rows, strict=True)
+    ]
+
+
+def get_message_buffer() -> GroupCommitBuffer:
+    """Return this process's group-commit buffer for create_message_task."""
+    global _message_buffer  # noqa: PLW0603
+    if _message_buffer is None:
+        _message_buffer = GroupCommitBuffer(
+            _flush_message_batch,
+            max_size=settings.MESSAGE_GROUP_COMMIT_MAX_SIZE,
+            max_wait_ms=settings.MESSAGE_GROUP_COMMIT_MAX_WAIT_MS,
+            after_commit=_message_batch_results,
+        )
+    return _message_buffer
+
+
 @celery_app.task(bind=True, base=DatabaseTask, name="app.tasks.create_message_task")
 def create_message_task(self, content: str) -> dict:
     """
     Celery task to create a message in the database.
 
+    With ``MESSAGE_GROUP_COMMIT`` enabled, the insert is handed to the
+    process-wide group-commit buffer and committed together with other
+    concurrently running create-message tasks.
+
     Args:
         content: The message content to store
 
     Returns:
         dict with id, content, and created_at of the created message
     """
+    if settings.MESSAGE_GROUP_COMMIT:
+        return get_message_buffer().submit({"content": content, "created_at": utc_now_naive()})
+
     session = self.session
 
     try:
@@ -44,15 +119,127 @@ def create_message_task(self, content: str) -> dict:
         session.add(message)
         session.commit()
         session.refresh(message)
+        message_invalidator.publish([message.id])
 
         return {
             "id": message.id,
             "content": message.content,
             "created_at": message.created_at.isoformat(),
         }
-    except Exception as e:
+    except Exception:
+        session.rollback()
+        raise
+
+
+@celery_app.task(bind=True, base=DatabaseTask, name="app.tasks.create_messages_bulk_task")
+def create_messages_bulk_task(self, contents: list[str]) -> dict:
+    """
+    Celery task to create many messages in a single transaction.
+
+    All rows are written with one multi-row ``INSERT ... RETURNING`` statement
+    and a single commit, instead of an add/commit/refresh cycle per message.
+
+    Args:
+        contents: The message contents to store
+
+    Returns:
+        dict with the number of rows created and parallel lists of their ids
+        and created_at values, in the same order as ``contents``
+    """
+    if not contents:
+        return {"count": 0, "ids": [], "created_at": []}
+
+    session = self.session
+    created_at = utc_now_naive()
+
+    try:
+        rows = _insert_messages(
+            session, [{"content": content, "created_at": created_at} for content in contents]
+        )
+        session.commit()
+        message_invalidator.publish(row.id for row in rows)
+
+        return {
+            "count": len(rows),
+            "ids": [row.id for row in rows],
+            "created_at": [row.created_at.isoformat() for row in rows],
+        }
+    except Exception:
         session.rollback()
-        raise e
+        raise
+
+
+@celery_app.task(name="app.tasks.maintain_message_partitions")
+def maintain_message_partitions() -> dict:
+    """
+    Create upcoming ``messages`` partitions and drop expired ones.
+
+    Runs periodically from beat. Keeps ``MESSAGE_PARTITIONS_AHEAD`` future
+    partitions in place so inserts never fail, and with
+    ``MESSAGE_RETENTION_DAYS`` set drops whole partitions past retention.
+    Does nothing while ``messages`` is not partitioned.
+
+    Returns:
+        dict with the names of the partitions created and dropped
+    """
+    now = utc_now_naive()
+    with sync_engine.begin() as connection:
+        created = ensure_partitions(
+            connection,
+            settings.MESSAGE_PARTITION_INTERVAL,
+            settings.MESSAGE_PARTITIONS_AHEAD,
+            now,
+        )
+        dropped = []
+        if settings.MESSAGE_RETENTION_DAYS is not None:
+            dropped = drop_partitions_before(
+                connection, now - timedelta(days=settings.MESSAGE_RETENTION_DAYS)
+            )
+    return {"created": created, "dropped": dropped}
+
+
+@celery_app.task(name="app.tasks.purge_expired_messages")
+def purge_expired_messages() -> dict:
+    """
+    Delete messages older than ``MESSAGE_RETENTION_DAYS`` in small chunks.
+
+    Runs periodically from beat. Each run deletes at most
+    ``MESSAGE_PURGE_CHUNK_SIZE`` ids per transaction, sleeps
+    ``MESSAGE_PURGE_PAUSE_MS`` between chunks, stops after
+    ``MESSAGE_PURGE_MAX_SECONDS`` and resumes from its checkpoint on the next
+    run. Does nothing when no retention is configured.
+
+    Returns:
+        dict with rows deleted, chunks, seconds, rows_per_second, the resume
+        position and whether every expired row was reached
+    """
+    if settings.MESSAGE_RETENTION_DAYS is None:
+        return asdict(PurgeResult())
+
+    result = purge_messages_before(
+        sync_engine,
+        utc_now_naive() - timedelta(days=settings.MESSAGE_RETENTION_DAYS),
+        chunk_size=settings.MESSAGE_PURGE_CHUNK_SIZE,
+        pause=settings.MESSAGE_PURGE_PAUSE_MS / 1000,
+        max_seconds=settings.MESSAGE_PURGE_MAX_SECONDS,
+        on_delete=message_invalidator.publish,
+    )
+    return asdict(result)
+
+
+@celery_app.task(name="app.tasks.cleanup_idempotency_keys")
+def cleanup_idempotency_keys() -> dict:
+    """
+    Delete expired ``Idempotency-Key`` records.
+
+    Returns:
+        dict with the number of rows deleted
+    """
+    with sync_engine.begin() as connection:
+        result = connection.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at <= utc_now_naive())
+        )
+    return {"deleted": result.rowcount}
 
 
 @celery_app.task(name="app.tasks.slow_task")
@@ -0,0 +1,476 @@
+"""
+End-to-end tracing from HTTP request to Celery task to SQL.
+
+A trace is a tree of spans sharing a trace id:
+
+- ``POST /tasks/``: the request, opened by ``TracingMiddleware`` (continuing
+  an incoming W3C ``traceparent`` header, if any)
+- ``publish <task>``: the broker publish in ``TaskPublisher``; the publishing
+  span travels to the worker in the task's ``traceparent`` message header
+- ``queue <task>``: from the ``published_at`` header to the start of execution
+- ``task <task>``: execution, from ``task_prerun`` to ``task_postrun``
+- ``db <OPERATION>`` for each SQL statement, and ``db COMMIT`` for each session
+  commit (flush included), inside any of the above
+
+SQL is only traced inside a request or task span, so background threads do
+not produce stray traces. Finished spans go to a pluggable exporter: any
+object with ``export(span)``, named by ``TRACING_EXPORTER``. The default
+``JsonFileExporter`` appends one JSON object per span to ``TRACING_FILE``, to
+be inspected offline::
+
+    python -m app.tracing traces.jsonl              # slowest traces
+    python -m app.tracing traces.jsonl <trace_id>   # one trace as a tree
+
+Ids and the header follow the W3C Trace Context format, so an OpenTelemetry
+collector or SDK can take over from, or feed into, these traces.
+"""
+import argparse
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import secrets
+import threading
+import time
+from typing import Protocol
+
+from celery.signals import before_task_publish, task_failure, task_postrun, task_prerun
+from kombu.utils.imports import symbol_by_name
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.celery_app import PUBLISHED_AT_HEADER
+from app.config import settings
+from app.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+MAX_STATEMENT_LENGTH = 1000
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+@dataclass(frozen=True, slots=True)
+class SpanContext:
+    """Identifies the parent of a span: its trace, and its span unless it is a root."""
+
+    trace_id: str
+    span_id: str | None = None
+
+
+@dataclass(slots=True)
+class Span:
+    """A timed operation within a trace (times are Unix seconds)."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None = None
+    kind: str = "internal"
+    start: float = field(default_factory=time.time)
+    end: float | None = None
+    status: str = "ok"
+    attributes: dict = field(default_factory=dict)
+
+    @property
+    def traceparent(self) -> str:
+        """W3C ``traceparent`` header value making this span the remote parent."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @property
+    def duration(self) -> float | None:
+        return None if self.end is None else self.end - self.start
+
+    def record_error(self, exc: BaseException) -> None:
+        """Mark the span as failed by ``exc``."""
+        self.status = "error"
+        self.attributes["error.type"] = type(exc).__name__
+        self.attributes["error.message"] = str(exc)[:MAX_STATEMENT_LENGTH]
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "duration": self.duration, "pid": os.getpid()}
+
+
+def parse_traceparent(value: str | None) -> SpanContext | None:
+    """Parse a W3C ``traceparent`` header, or return None if it is missing or invalid."""
+    match = _TRACEPARENT_RE.match(value or "")
+    if match is None or not int(match.group(1), 16) or not int(match.group(2), 16):
+        return None
+    return SpanContext(match.group(1), match.group(2))
+
+
+class SpanExporter(Protocol):
+    """Receives every finished span; must be thread-safe."""
+
+    def export(self, span: Span) -> None: ...
+
+
+class JsonFileExporter:
+    """Append finished spans as JSON lines to a file, for offline analysis."""
+
+    def __init__(self, path: str | None = None):
+        self.path = path or settings.TRACING_FILE
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            # Reopen after a fork so pool processes do not share a file position
+            if self._file is None or self._pid != os.getpid():
+                # Kept open for the life of the process; line buffered
+                self._file = Path(self.path).open("a", buffering=1, encoding="utf-8")  # noqa: SIM115
+                self._pid = os.getpid()
+            self._file.write(line)
+
+
+class InMemoryExporter:
+    """Keep finished spans in a list (tests, debugging)."""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+
+_exporter: SpanExporter | None = None
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def load_exporter(path: str) -> SpanExporter:
+    """Instantiate the exporter class named by ``path`` (``module:Class``)."""
+    return symbol_by_name(path)()
+
+
+def set_exporter(exporter: SpanExporter | None) -> None:
+    """Send finished spans to ``exporter``; None turns tracing off."""
+    global _exporter  # noqa: PLW0603
+    _exporter = exporter
+
+
+def tracing_enabled() -> bool:
+    return _exporter is not None
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def begin_span(
+    name: str,
+    *,
+    parent: Span | SpanContext | None = None,
+    kind: str = "internal",
+    start: float | None = None,
+    attributes: dict | None = None,
+) -> Span | None:
+    """
+    Start a span without making it current; finish it with ``end_span``.
+
+    Args:
+        name: Span name
+        parent: Parent span or remote context; defaults to the current span,
+            or a new trace if there is none
+        kind: ``server``, ``client``, ``producer``, ``consumer`` or ``internal``
+        start: Start time in Unix seconds (default: now)
+        attributes: Initial attributes
+
+    Returns:
+        The span, or None when tracing is off
+    """
+    if _exporter is None:
+        return None
+    parent = parent or _current_span.get()
+    return Span(
+        name=name,
+        trace_id=parent.trace_id if parent else secrets.token_hex(16),
+        span_id=secrets.token_hex(8),
+        parent_id=parent.span_id if parent else None,
+        kind=kind,
+        start=time.time() if start is None else start,
+        attributes=dict(attributes or {}),
+    )
+
+
+def end_span(
+    span: Span | None, *, error: BaseException | None = None, end: float | None = None
+) -> None:
+    """Finish ``span`` (once) and hand it to the exporter."""
+    if span is None or span.end is not None:
+        return
+    span.end = time.time() if end is None else end
+    if error is not None:
+        span.record_error(error)
+    exporter = _exporter
+    if exporter is None:
+        return
+    try:
+        exporter.export(span)
+    except Exception:
+        logger.warning("Failed to export span %s", span.name, exc_info=True)
+
+
+@contextmanager
+def start_span(name: str, **kwargs) -> Iterator[Span | None]:
+    """Run the block in a new current span (see ``begin_span`` for the arguments)."""
+    span = begin_span(name, **kwargs)
+    if span is None:
+        yield None
+        return
+    token = _current_span.set(span)
+    error = None
+    try:
+        yield span
+    except BaseException as exc:
+        error = exc
+        raise
+    finally:
+        _current_span.reset(token)
+        end_span(span, error=error)
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracing_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        parent = parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        route = route_template(scope)
+        attributes = {
+            "http.method": scope["method"],
+            "http.route": route,
+            "http.target": scope["path"],
+        }
+
+        with start_span(
+            f"{scope['method']} {route}", parent=parent, kind="server", attributes=attributes
+        ) as span:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span.attributes["http.status_code"] = message["status"]
+                    if message["status"] >= 500:
+                        span.status = "error"
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+
+# Celery: propagate the context in task headers, trace queue wait and execution
+
+
+def on_before_task_publish(headers=None, **_kwargs):
+    """Make the publishing span the parent of the task's spans."""
+    span = current_span()
+    if span is not None and headers is not None:
+        headers.setdefault(TRACEPARENT_HEADER, span.traceparent)
+
+
+# task_prerun and task_postrun run in the same thread and context
+_task_spans: dict[str, tuple] = {}
+
+
+def on_task_prerun(task_id=None, task=None, **_kwargs):
+    """Record the queue wait and open the execution span of a task."""
+    if not tracing_enabled() or task is None:
+        return
+    request = task.request
+    parent = parse_traceparent(request.get(TRACEPARENT_HEADER)) or SpanContext(
+        secrets.token_hex(16)
+    )
+    attributes = {"celery.task": task.name, "celery.task_id": task_id}
+    now = time.time()
+
+    published_at = request.get(PUBLISHED_AT_HEADER)
+    if published_at is not None:
+        queue_span = begin_span(
+            f"queue {task.name}",
+            parent=parent,
+            kind="consumer",
+            start=min(float(published_at), now),
+            attributes=attributes,
+        )
+        end_span(queue_span, end=now)
+
+    span = begin_span(
+        f"task {task.name}",
+        parent=parent,
+        kind="consumer",
+        start=now,
+        attributes={**attributes, "celery.retries": request.get("retries") or 0},
+    )
+    _task_spans[task_id] = (span, _current_span.set(span))
+
+
+def on_task_failure(task_id=None, exception=None, **_kwargs):
+    """Mark the execution span of a failed task."""
+    entry = _task_spans.get(task_id)
+    if entry is not None and exception is not None:
+        entry[0].record_error(exception)
+
+
+def on_task_postrun(task_id=None, state=None, **_kwargs):
+    """Close the execution span of a task."""
+    entry = _task_spans.pop(task_id, None)
+    if entry is None:
+        return
+    span, token = entry
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        _current_span.set(None)
+    span.attributes["celery.state"] = state
+    if state == "FAILURE":
+        span.status = "error"
+    end_span(span)
+
+
+# SQLAlchemy: one span per statement and per session commit
+
+
+def on_before_cursor_execute(conn, _cursor, statement, _parameters, context, executemany):
+    if current_span() is None:
+        return
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+    context._trace_span = begin_span(
+        f"db {operation}",
+        kind="client",
+        attributes={
+            "db.system": conn.dialect.name,
+            "db.statement": statement[:MAX_STATEMENT_LENGTH],
+            "db.executemany": executemany,
+        },
+    )
+
+
+def on_after_cursor_execute(_conn, cursor, _statement, _parameters, context, _executemany):
+    span = getattr(context, "_trace_span", None)
+    if span is not None:
+        span.attributes["db.rowcount"] = cursor.rowcount
+        end_span(span)
+
+
+def on_handle_error(exception_context):
+    context = exception_context.execution_context
+    end_span(
+        getattr(context, "_trace_span", None), error=exception_context.original_exception
+    )
+
+
+def on_before_commit(session):
+    if current_span() is not None:
+        session.info["trace_commit_span"] = begin_span(
+            "db COMMIT", kind="client", attributes={"db.operation": "COMMIT"}
+        )
+
+
+def on_after_commit(session):
+    end_span(session.info.pop("trace_commit_span", None))
+
+
+def on_after_rollback(session):
+    span = session.info.pop("trace_commit_span", None)
+    if span is not None:
+        span.status = "error"
+        end_span(span)
+
+
+_SQL_EVENTS = [
+    (Engine, "before_cursor_execute", on_before_cursor_execute),
+    (Engine, "after_cursor_execute", on_after_cursor_execute),
+    (Engine, "handle_error", on_handle_error),
+    (Session, "before_commit", on_before_commit),
+    (Session, "after_commit", on_after_commit),
+    (Session, "after_rollback", on_after_rollback),
+]
+
+
+def connect_signals() -> None:
+    """Connect the tracing handlers to Celery's signals and SQLAlchemy's events."""
+    before_task_publish.connect(on_before_task_publish, weak=False)
+    task_prerun.connect(on_task_prerun, weak=False)
+    task_failure.connect(on_task_failure, weak=False)
+    task_postrun.connect(on_task_postrun, weak=False)
+    for target, name, handler in _SQL_EVENTS:
+        if not event.contains(target, name, handler):
+            event.listen(target, name, handler)
+
+
+if settings.TRACING_ENABLED:
+    set_exporter(load_exporter(settings.TRACING_EXPORTER))
+    connect_signals()
+
+
+# Offline analysis of JsonFileExporter output
+
+
+def load_spans(path: str) -> list[dict]:
+    """Read spans written by ``JsonFileExporter``."""
+    with Path(path).open(encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def format_trace(spans: list[dict]) -> str:
+    """Render the spans of one trace as an indented tree with offsets and durations."""
+    children = defaultdict(list)
+    ids = {span["span_id"] for span in spans}
+    for span in sorted(spans, key=lambda span: span["start"]):
+        children[span["parent_id"] if span["parent_id"] in ids else None].append(span)
+    origin = min(span["start"] for span in spans)
+
+    lines = []
+
+    def walk(parent_id, depth):
+        for span in children[parent_id]:
+            lines.append(
+                f"{(span['start'] - origin) * 1000:9.1f}ms {span['duration'] * 1000:9.1f}ms  "
+                f"{'  ' * depth}{span['name']}{' [error]' if span['status'] == 'error' else ''}"
+            )
+            walk(span["span_id"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Inspect traces written by JsonFileExporter")
+    parser.add_argument("path", help="JSON lines file (TRACING_FILE)")
+    parser.add_argument("trace_id", nargs="?", help="Trace to show (default: list the slowest)")
+    parser.add_argument("--limit", type=int, default=20, help="Traces to list")
+    args = parser.parse_args(argv)
+
+    traces = defaultdict(list)
+    for span in load_spans(args.path):
+        traces[span["trace_id"]].append(span)
+
+    if args.trace_id:
+        print(format_trace(traces[args.trace_id]) if args.trace_id in traces else "Not found")
+        return
+    durations = {
+        trace_id: max(s["end"] for s in spans) - min(s["start"] for s in spans)
+        for trace_id, spans in traces.items()
+    }
+    for trace_id in sorted(durations, key=durations.get, reverse=True)[: args.limit]:
+        root = min(traces[trace_id], key=lambda span: span["start"])
+        print(f"{trace_id}  {durations[trace_id] * 1000:9.1f}ms  {root['name']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+HTTP load benchmark for the main API endpoints.
+
+Sends requests at a fixed concurrency and reports throughput and latency
+percentiles for ``POST /messages/``, ``GET /messages/``, ``POST /tasks/`` and
+``GET /tasks/{task_id}``, in that order (the reads use what the writes
+created).
+
+By default the app runs in-process behind httpx's ASGI transport, on local
+stand-ins: a fresh SQLite database, and Celery's in-memory broker and result
+backend. No worker runs, so tasks stay PENDING and admission control is
+turned off. Use ``--database-url`` to point at a local PostgreSQL instead, or
+``--url`` to load a running server (e.g. uvicorn), HTTP stack included. Run
+from the ``backend`` directory::
+
+    python -m benchmarks.http_benchmark --output baseline.json
+    python -m benchmarks.http_benchmark --compare baseline.json
+
+``--compare`` prints the change per endpoint against an earlier ``--output``
+and exits with status 1 when throughput drops, or p95 latency grows, by more
+than ``--max-regression``.
+"""
+import argparse
+import asyncio
+from collections.abc import Callable
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+import itertools
+import json
+import os
+from pathlib import Path
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import uuid
+
+import httpx
+from sqlalchemy.engine import make_url
+
+
+@dataclass(frozen=True, slots=True)
+class Scenario:
+    """An endpoint to load: ``request(i)`` returns the i-th request's method, path and body."""
+
+    name: str
+    request: Callable[[int], tuple[str, str, dict | None]]
+    on_response: Callable[[httpx.Response], None] | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class Result:
+    """Throughput and latency of one scenario (latencies in milliseconds)."""
+
+    requests: int
+    errors: int
+    seconds: float
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+def scenarios() -> list[Scenario]:
+    """The benchmarked endpoints; ``GET /tasks/{task_id}`` polls tasks created before it."""
+    task_ids: list[str] = []
+
+    def task_path(i: int) -> str:
+        return f"/tasks/{task_ids[i % len(task_ids)] if task_ids else uuid.uuid4()}"
+
+    return [
+        Scenario(
+            "POST /messages/",
+            lambda i: ("POST", "/messages/", {"content": f"Benchmark message {i}"}),
+        ),
+        Scenario("GET /messages/", lambda _: ("GET", "/messages/?limit=20", None)),
+        Scenario(
+            "POST /tasks/",
+            lambda i: ("POST", "/tasks/", {"content": f"Benchmark task {i}"}),
+            on_response=lambda response: task_ids.append(response.json()["task_id"]),
+        ),
+        Scenario("GET /tasks/{task_id}", lambda i: ("GET", task_path(i), None)),
+    ]
+
+
+async def drive(
+    client: httpx.AsyncClient, scenario: Scenario, count: int, concurrency: int, offset: int = 0
+) -> tuple[list[float], int, float]:
+    """
+    Send ``count`` requests with ``concurrency`` in flight at all times.
+
+    Returns:
+        ``(latencies_ms, errors, seconds)``; responses >= 400 count as errors
+    """
+    indexes = itertools.count(offset)
+    latencies: list[float] = []
+    errors = 0
+
+    async def user() -> None:
+        nonlocal errors
+        while (i := next(indexes)) < offset + count:
+            method, path, body = scenario.request(i)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+            except httpx.HTTPError:
+                response = None
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response is None or response.status_code >= 400:
+                errors += 1
+            elif scenario.on_response is not None:
+                scenario.on_response(response)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int, warmup: int
+) -> Result:
+    """Warm the endpoint up, then measure ``requests`` requests."""
+    await drive(client, scenario, warmup, concurrency)
+    latencies, errors, seconds = await drive(client, scenario, requests, concurrency, warmup)
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return Result(
+        requests=requests,
+        errors=errors,
+        seconds=round(seconds, 3),
+        rps=round(requests / seconds, 1),
+        p50_ms=round(percentiles[49], 3),
+        p95_ms=round(percentiles[94], 3),
+        p99_ms=round(percentiles[98], 3),
+        max_ms=round(max(latencies), 3),
+    )
+
+
+def use_stand_ins(database_url: str) -> None:
+    """Point the app's settings at ``database_url`` and in-memory Celery; call before import."""
+    url = make_url(database_url)
+    sync_url = url.set(drivername=url.get_backend_name())
+    os.environ.update(
+        {
+            "DATABASE_URL": database_url,
+            "DATABASE_URL_SYNC": sync_url.render_as_string(hide_password=False),
+            "RABBITMQ_URL": "memory://",
+            "CELERY_BROKER_URL": "memory://",
+            "CELERY_RESULT_BACKEND": "cache+memory://",
+            "DEBUG": "False",
+            # Nothing consumes task events or drains the queues
+            "TASK_EVENTS_ENABLED": "False",
+            "ADMISSION_CONTROL_ENABLED": "False",
+        }
+    )
+
+
+@asynccontextmanager
+async def in_process_client(database_url: str):
+    """Client for the app served in-process on stand-ins, with its lifespan running."""
+    use_stand_ins(database_url)
+    from app.main import app  # noqa: PLC0415 - settings are read at import
+
+    async with (
+        app.router.lifespan_context(app),
+        httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=30
+        ) as client,
+    ):
+        yield client
+
+
+@asynccontextmanager
+async def server_client(url: str, concurrency: int):
+    """Client for a running server, with a connection per concurrent user."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        yield client
+
+
+def git_revision() -> str | None:
+    """Current commit (``-dirty`` with local changes), or None outside a git checkout."""
+    try:
+        completed = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
+
+
+def compare(baseline: dict, current: dict, max_regression: float) -> list[str]:
+    """Print each endpoint's change against ``baseline``; return the regressions."""
+    print(f"\nCompared with {baseline['meta'].get('revision')} ({baseline['meta']['created_at']})")
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:22} (not in baseline)")
+            continue
+        rps_change = result["rps"] / max(before["rps"], 1e-9) - 1
+        p95_change = result["p95_ms"] / max(before["p95_ms"], 1e-9) - 1
+        print(f"{name:22} req/s {rps_change:+7.1%}   p95 {p95_change:+7.1%}")
+        if rps_change < -max_regression:
+            regressions.append(f"{name}: throughput {rps_change:+.1%}")
+        if p95_change > max_regression:
+            regressions.append(f"{name}: p95 latency {p95_change:+.1%}")
+    return regressions
+
+
+async def benchmark(args: argparse.Namespace, database_url: str) -> dict:
+    if args.url:
+        client_context = server_client(args.url, args.concurrency)
+    else:
+        client_context = in_process_client(database_url)
+
+    results = {}
+    async with client_context as client:
+        for scenario in scenarios():
+            result = await run_scenario(
+                client, scenario, args.requests, args.concurrency, args.warmup
+            )
+            results[scenario.name] = asdict(result)
+            print(
+                f"{scenario.name:22} {result.rps:9.1f} req/s  p50={result.p50_ms:7.2f}ms  "
+                f"p95={result.p95_ms:7.2f}ms  p99={result.p99_ms:7.2f}ms  errors={result.errors}"
+            )
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "created_at": datetime.now(UTC).isoformat(),
+            "target": args.url or "in-process",
+            "database": None if args.url else make_url(database_url).drivername,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "python": platform.python_version(),
+        },
+        "results": results,
+    }
+
+
+def main(args: argparse.Namespace) -> int:
+    if args.requests < 2:
+        raise SystemExit("--requests must be at least 2")
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+
+    print(
+        f"{args.requests} requests per endpoint, concurrency {args.concurrency}, "
+        f"target {args.url or 'in-process'}"
+    )
+    with tempfile.TemporaryDirectory(prefix="http-benchmark-") as tmp:
+        database_url = args.database_url or f"sqlite+aiosqlite:///{Path(tmp) / 'benchmark.db'}"
+        report = asyncio.run(benchmark(args, database_url))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nWrote {args.output}")
+    if baseline is None:
+        return 0
+    regressions = compare(baseline, report, args.max_regression)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000, help="Measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight")
+    parser.add_argument("--warmup", type=int, default=100, help="Unmeasured requests first")
+    parser.add_argument("--url", help="Load a running server instead of the in-process app")
+    parser.add_argument(
+        "--database-url", help="Async database URL for the in-process app (default: temp SQLite)"
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file from an earlier --output")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.10,
+        help="Allowed throughput drop / p95 growth against --compare (fraction)",
+    )
+    raise SystemExit(main(parser.parse_args()))
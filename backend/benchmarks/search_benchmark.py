@@ -0,0 +1,131 @@
+"""
+Benchmark message search: ``ILIKE`` scan vs. the GIN-indexed ``search_vector``.
+
+Seeds the ``messages`` table up to ``--rows`` rows of random words (generated
+server-side, so seeding a few million rows takes seconds), then times each
+query repeatedly with both strategies and prints latency percentiles.
+
+Requires PostgreSQL with migrations applied (``alembic upgrade head``). Run
+from the ``backend`` directory::
+
+    python -m benchmarks.search_benchmark --rows 2000000
+
+Seeded rows are real messages; use a throwaway database.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import func, select, text
+
+from app.crud import search_messages
+from app.db import AsyncSessionLocal, async_engine
+from app.models import Message
+
+VOCABULARY = [
+    "order", "payment", "invoice", "shipping", "customer", "account", "refund", "delivery",
+    "report", "update", "error", "request", "service", "status", "product", "support",
+    "message", "warehouse", "billing", "address", "ticket", "priority", "schedule", "review",
+    "network", "server", "upload", "download", "backup", "restore", "login", "password",
+    "profile", "settings", "notification", "email", "phone", "contract", "renewal", "discount",
+]
+# Appended to ~0.1% of rows to benchmark a selective term
+RARE_WORD = "kumquat"
+QUERIES = ["payment", "refund delivery", '"shipping address"', RARE_WORD]
+
+SEED_SQL = text(
+    """
+    INSERT INTO messages (content, created_at)
+    SELECT (
+            SELECT string_agg(words[1 + floor(random() * cardinality(words))::int], ' ')
+            FROM generate_series(1, :words_per_message)
+            WHERE g.n IS NOT NULL
+        ) || CASE WHEN random() < 0.001 THEN ' ' || :rare_word ELSE '' END,
+        localtimestamp - random() * interval '365 days'
+    FROM generate_series(1, :count) AS g(n),
+        (SELECT CAST(:vocabulary AS text[]) AS words) AS v
+    """
+)
+
+
+async def seed(rows: int, batch_size: int, words_per_message: int) -> None:
+    """Insert random messages until the table holds at least ``rows`` rows."""
+    async with AsyncSessionLocal() as session:
+        existing = await session.scalar(select(func.count()).select_from(Message))
+        while existing < rows:
+            count = min(batch_size, rows - existing)
+            await session.execute(
+                SEED_SQL,
+                {
+                    "count": count,
+                    "words_per_message": words_per_message,
+                    "rare_word": RARE_WORD,
+                    "vocabulary": VOCABULARY,
+                },
+            )
+            await session.commit()
+            existing += count
+            print(f"seeded {existing}/{rows} rows")
+        await session.execute(text("ANALYZE messages"))
+        await session.commit()
+
+
+async def ilike_search(session, query: str, limit: int) -> list:
+    """Baseline: substring scan, newest first."""
+    result = await session.execute(
+        select(Message.id, Message.content, Message.created_at)
+        .where(Message.content.ilike(f"%{query.replace(chr(34), '')}%"))
+        .order_by(Message.id.desc())
+        .limit(limit)
+    )
+    return list(result.all())
+
+
+async def time_query(search, query: str, repeat: int, limit: int) -> list[float]:
+    """Run ``search`` ``repeat`` times, returning latencies in milliseconds."""
+    latencies = []
+    async with AsyncSessionLocal() as session:
+        await search(session, query, limit)  # warm caches and the connection
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await search(session, query, limit)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(latencies: list[float]) -> str:
+    """Format p50/p95/max of a list of latencies."""
+    percentiles = statistics.quantiles(latencies, n=100)
+    return f"p50={percentiles[49]:8.2f}ms  p95={percentiles[94]:8.2f}ms  max={max(latencies):8.2f}ms"
+
+
+async def main(args: argparse.Namespace) -> None:
+    if args.repeat < 2:
+        raise SystemExit("--repeat must be at least 2")
+    if async_engine.dialect.name != "postgresql":
+        raise SystemExit("The search benchmark requires PostgreSQL (DATABASE_URL)")
+    async_engine.echo = False  # DEBUG=True would log every statement
+
+    await seed(args.rows, args.batch_size, args.words_per_message)
+
+    async def fulltext_search(session, query, limit):
+        return await search_messages(session, query, limit=limit)
+
+    print(f"\n{args.repeat} runs per query, limit={args.limit}")
+    for query in QUERIES:
+        for label, search in (("ilike", ilike_search), ("fulltext", fulltext_search)):
+            latencies = await time_query(search, query, args.repeat, args.limit)
+            print(f"{query!r:24} {label:9} {summarize(latencies)}")
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Table size to benchmark")
+    parser.add_argument("--batch-size", type=int, default=200_000, help="Rows per seed INSERT")
+    parser.add_argument("--words-per-message", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per query")
+    parser.add_argument("--limit", type=int, default=20, help="Page size")
+    asyncio.run(main(parser.parse_args()))
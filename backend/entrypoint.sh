@@ -23,5 +23,11 @@ python init_db.py
 echo "Installing taskipy..."
 pip install --no-cache-dir taskipy==1.14.1 || echo "Warning: taskipy installation failed, continuing anyway..."
 
+# Metric files from a previous run would be summed with the new processes' values
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 echo "Starting application..."
 exec "$@"
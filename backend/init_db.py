@@ -1,7 +1,23 @@
 """Database initialization script."""
 import asyncio
+from app.config import settings
 from app.db import sync_engine, Base
-from app.models import Message
+from app.helpers import utc_now_naive
+from app.models import (  # noqa: F401 - Import to register models
+    IdempotencyKey,
+    JobCheckpoint,
+    Message,
+    TaskRecord,
+    TaskResult,
+)
+from app.partitions import (
+    ensure_partitions,
+    is_partitioned,
+    next_period,
+    partition_messages_table,
+    period_start,
+    prepare_messages_table,
+)
 
 
 def init_db():
@@ -9,6 +25,24 @@ def init_db():
     print("Creating database tables...")
     Base.metadata.create_all(bind=sync_engine)
     print("Database tables created successfully!")
+    init_partitions()
+
+
+def init_partitions():
+    """Partition the messages table by created_at (PostgreSQL only)."""
+    interval = settings.MESSAGE_PARTITION_INTERVAL
+    now = utc_now_naive()
+    with sync_engine.begin() as connection:
+        if connection.dialect.name != "postgresql":
+            print("Skipping message partitioning: requires PostgreSQL")
+            return
+        if not is_partitioned(connection):
+            print("Partitioning messages table...")
+            boundary = next_period(period_start(now, interval), interval)
+            prepare_messages_table(connection, boundary)
+            partition_messages_table(connection, boundary)
+        created = ensure_partitions(connection, interval, settings.MESSAGE_PARTITIONS_AHEAD, now)
+    print(f"Message partitions ready ({len(created)} created)")
 
 
 if __name__ == "__main__":
@@ -11,10 +11,16 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from unittest.mock import AsyncMock, patch
 
-from app.celery_app import celery_app
-from app.db import Base
-from app.models import Message
-from app.tasks import DatabaseTask
+# Settings are read at import: keep the task record writer (and its threads
+# writing to the configured database) off unless a test enables it
+os.environ["TASK_RECORDS_ENABLED"] = "False"
+
+from app.celery_app import celery_app  # noqa: E402
+from app.db import Base  # noqa: E402
+from app.idempotency import idempotency_cache  # noqa: E402
+from app.message_cache import message_cache, page_cache  # noqa: E402
+from app.models import Message  # noqa: E402
+from app.tasks import DatabaseTask  # noqa: E402
 
 
 @contextmanager
@@ -142,6 +148,15 @@ def setup_test_env():
     # Cleanup is automatic when test ends
 
 
+@pytest.fixture(scope="function", autouse=True)
+def clear_message_caches():
+    """Start every test with empty in-process message caches."""
+    message_cache.clear()
+    page_cache.clear()
+    idempotency_cache.clear()
+    yield
+
+
 @pytest.fixture(scope="function")
 def reset_database_task_session():
     """Reset DatabaseTask._session between tests."""
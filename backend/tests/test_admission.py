@@ -0,0 +1,187 @@
+"""Tests for queue-depth admission control on the enqueue endpoints."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi.testclient import TestClient
+import pytest
+
+from app.admission import QueueDepth, QueueDepthMonitor, retry_after, task_queue
+from app.celery_app import celery_app
+from app.main import app
+from app.tasks import create_message_task, slow_task
+
+client = TestClient(app)
+
+
+def test_read_counts_ready_messages():
+    """Test that passive declares report the messages waiting in each queue."""
+    with celery_app.connection_for_write() as connection:
+        queue = connection.SimpleQueue("admission-test")
+        for i in range(3):
+            queue.put({"n": i})
+        depths = QueueDepthMonitor().read(["admission-test", "admission-missing"])
+        queue.clear()
+        queue.close()
+
+    assert depths == {"admission-test": 3, "admission-missing": 0}
+
+
+def test_read_reuses_connection_and_reconnects_after_errors():
+    """Test that reads share one connection and channel, reopened only after a failure."""
+    app = MagicMock()
+    connection = app.connection_for_read.return_value
+    channel = connection.channel.return_value
+    channel.queue_declare.return_value.message_count = 4
+    monitor = QueueDepthMonitor(app=app)
+
+    assert monitor.read(["celery", "messages"]) == {"celery": 4, "messages": 4}
+    assert monitor.read(["celery"]) == {"celery": 4}
+    app.connection_for_read.assert_called_once()
+    connection.channel.assert_called_once()
+
+    channel.queue_declare.side_effect = ConnectionError("connection reset")
+    with pytest.raises(ConnectionError):
+        monitor.read(["celery"])
+    connection.release.assert_called_once()
+
+    channel.queue_declare.side_effect = None
+    assert monitor.read(["celery"]) == {"celery": 4}
+    assert app.connection_for_read.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_refresh_reads_watched_queues():
+    """Test that a refresh reads every watched queue in one broker connection."""
+    monitor = QueueDepthMonitor()
+    monitor.watch("messages")
+    monitor.watch("celery")
+    with patch.object(monitor, "read", return_value={"celery": 5, "messages": 0}) as read:
+        await monitor.refresh()
+
+    assert monitor.depth("celery") == QueueDepth(5)
+    read.assert_called_once_with(["celery", "messages"])
+
+
+def test_depth_never_reads_the_broker():
+    """Test that an unread queue is unknown (admitted) and watched from then on."""
+    monitor = QueueDepthMonitor()
+    with patch.object(monitor, "read") as read:
+        assert monitor.depth("celery") is None
+
+    read.assert_not_called()
+    assert monitor._queues == {"celery"}
+
+
+@pytest.mark.asyncio
+async def test_depth_tracks_drain_rate():
+    """Test that consecutive readings yield how fast the queue drains."""
+    monitor = QueueDepthMonitor()
+    monitor.watch("celery")
+    with patch.object(monitor, "read", side_effect=[{"celery": 100}, {"celery": 40}]):
+        await monitor.refresh()
+        await monitor.refresh()
+
+    depth = monitor.depth("celery")
+    assert depth.messages == 40
+    assert depth.drain_rate > 0
+
+
+@pytest.mark.asyncio
+async def test_depth_unknown_when_broker_unreachable():
+    """Test that a failed read admits requests instead of failing them."""
+    monitor = QueueDepthMonitor()
+    monitor.watch("celery")
+    with patch.object(monitor, "read", side_effect=ConnectionError("broker down")):
+        await monitor.refresh()
+
+    assert monitor.depth("celery") is None
+
+
+@pytest.mark.asyncio
+async def test_background_refresh():
+    """Test that the started monitor keeps refreshing until stopped."""
+    monitor = QueueDepthMonitor(refresh_interval=0.01)
+    monitor.watch("celery")
+    with patch.object(monitor, "read", return_value={"celery": 7}) as read:
+        monitor.start()
+        for _ in range(100):
+            if read.call_count >= 2:
+                break
+            await asyncio.sleep(0.01)
+        await monitor.stop()
+
+    assert read.call_count >= 2
+    assert monitor.depth("celery") == QueueDepth(7, drain_rate=0.0)
+
+
+@pytest.mark.parametrize(
+    ("depth", "expected"),
+    [
+        (QueueDepth(150, drain_rate=10.0), 6),
+        (QueueDepth(100_000, drain_rate=1.0), 60),
+        (QueueDepth(101, drain_rate=1000.0), 1),
+        (QueueDepth(150), 60),
+        (QueueDepth(150, drain_rate=-5.0), 60),
+    ],
+)
+def test_retry_after(depth, expected):
+    """Test that Retry-After follows the drain rate, bounded to [1, maximum]."""
+    assert retry_after(depth, limit=100, maximum=60) == expected
+
+
+def test_task_queue():
+    """Test that the queue is taken from the task routing."""
+    assert task_queue(create_message_task) == "messages"
+    assert task_queue(slow_task) == "long"
+
+
+@pytest.mark.parametrize(
+    ("messages", "status_code", "retry"),
+    [(12_000, 429, "3"), (53_000, 503, "4"), (9_999, 202, None)],
+)
+def test_enqueue_admission(messages, status_code, retry):
+    """Test that enqueue endpoints reject work past the soft and hard limits."""
+    with (
+        patch("app.admission.queue_depth_monitor.depth") as depth,
+        patch("app.main.task_publisher.delay", new_callable=AsyncMock) as delay,
+        patch("app.admission.settings") as settings,
+    ):
+        depth.return_value = QueueDepth(messages, drain_rate=1000.0)
+        delay.return_value = MagicMock(id="12345678-1234-5678-1234-567812345678")
+        settings.ADMISSION_CONTROL_ENABLED = True
+        settings.ADMISSION_QUEUE_SOFT_LIMIT = 10_000
+        settings.ADMISSION_QUEUE_HARD_LIMIT = 50_000
+        settings.ADMISSION_RETRY_AFTER_MAX = 60
+
+        response = client.post("/tasks/", json={"content": "Admitted?"})
+
+    assert response.status_code == status_code
+    # Time to drain below the limit that was hit, at 1000 messages/second
+    assert response.headers.get("Retry-After") == retry
+    if status_code != 202:
+        delay.assert_not_called()
+
+
+def test_enqueue_admission_per_task_queue():
+    """Test that each endpoint checks the queue of the task it enqueues."""
+    with (
+        patch("app.admission.check_capacity", new_callable=AsyncMock) as check,
+        patch("app.main.task_publisher.delay", new_callable=AsyncMock) as delay,
+    ):
+        delay.return_value = MagicMock(id="12345678-1234-5678-1234-567812345678")
+        client.post("/tasks/slow?duration=1")
+
+    assert check.call_args.args[0] is slow_task
+
+
+def test_enqueue_admission_disabled():
+    """Test that no depth is read when admission control is off."""
+    with (
+        patch("app.admission.queue_depth_monitor.depth") as depth,
+        patch("app.admission.settings") as settings,
+    ):
+        settings.ADMISSION_CONTROL_ENABLED = False
+        response = client.post("/tasks/slow?duration=1")
+
+    assert response.status_code == 202
+    depth.assert_not_called()
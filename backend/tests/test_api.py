@@ -1,7 +1,20 @@
+import csv
+import io
+import json
+from unittest.mock import patch
+import uuid
+
 import pytest
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
 
+from app.db import AsyncSessionLocal
 from app.main import app
+from app.models import Message
+from app.helpers import encode_cursor
+from app.idempotency import idempotency_cache
+from app.message_cache import message_invalidator, page_cache
+from app.publisher import task_publisher
 
 
 # Mark all tests in this module as integration and async tests
@@ -63,6 +76,23 @@ async def test_list_messages():
         assert len(messages) > 0
 
 
+@pytest.mark.asyncio(loop_scope="session")
+async def test_list_messages_created_range():
+    """Test that since/until restrict both pagination modes to a created_at range."""
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        created = (await client.post("/messages/", json={"content": "In range"})).json()
+        at = created["created_at"]
+
+        listed = await client.get("/messages/", params={"since": at, "limit": 1000})
+        assert created["id"] in [message["id"] for message in listed.json()]
+        assert all(message["created_at"] >= at for message in listed.json())
+
+        page = await client.get("/messages/", params={"cursor": "", "until": at, "limit": 1000})
+        assert created["id"] not in [message["id"] for message in page.json()["items"]]
+
+
 @pytest.mark.asyncio(loop_scope="session")
 async def test_enqueue_task():
     """
@@ -110,3 +140,331 @@ async def test_get_task_status():
         assert "status" in data
         # Without worker running, status will be PENDING
         assert data["status"] in ["PENDING", "STARTED", "SUCCESS"]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_export_messages_ndjson():
+    """Test streaming all messages as NDJSON."""
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        await client.post("/messages/", json={"content": "Exported message"})
+
+        response = await client.get("/messages/export")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert len(rows) > 0
+        assert set(rows[0]) == {"id", "content", "created_at"}
+        assert "Exported message" in [row["content"] for row in rows]
+        ids = [row["id"] for row in rows]
+        assert ids == sorted(ids)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_export_messages_csv():
+    """Test streaming all messages as CSV with a header row."""
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        await client.post("/messages/", json={"content": "Exported, with comma"})
+
+        response = await client.get("/messages/export?format=csv")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows[0] == ["id", "content", "created_at"]
+        assert "Exported, with comma" in [row[1] for row in rows[1:]]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_export_messages_invalid_format():
+    """Test that unsupported export formats are rejected."""
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.get("/messages/export?format=xml")
+        assert response.status_code == 422
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_bulk_create_messages_json():
+    """Test bulk creating messages from a JSON array."""
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.post(
+            "/messages/bulk",
+            json=[{"content": f"Bulk JSON {i}"} for i in range(3)],
+        )
+        assert response.status_code == 201
+        data = response.json()
+        assert data["inserted"] == 3
+        assert data["last_id"] - data["first_id"] == 2
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_bulk_create_messages_ndjson():
+    """Test bulk creating messages from an NDJSON body."""
+    body = "\n".join(json.dumps({"content": f"Bulk NDJSON {i}"}) for i in range(4)) + "\n"
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.post(
+            "/messages/bulk",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 201
+        assert response.json()["inserted"] == 4
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_bulk_create_messages_invalid_item():
+    """Test that one invalid item rejects the whole bulk request."""
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.post(
+            "/messages/bulk", json=[{"content": "ok"}, {"content": ""}]
+        )
+        assert response.status_code == 422
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_bulk_create_messages_invalidates_after_commit():
+    """Test that caches are invalidated only once the new rows are visible to other sessions."""
+    visible = []
+
+    async def publish_async(ids):
+        async with AsyncSessionLocal() as session:
+            found = await session.scalars(select(Message.id).where(Message.id.in_(ids)))
+            visible.append(sorted(found))
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        with patch.object(message_invalidator, "publish_async", publish_async):
+            response = await client.post(
+                "/messages/bulk", json=[{"content": "Committed 1"}, {"content": "Committed 2"}]
+            )
+        assert response.status_code == 201
+        data = response.json()
+        assert visible == [[data["first_id"], data["last_id"]]]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_bulk_create_messages_empty():
+    """Test that an empty bulk request inserts nothing."""
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.post("/messages/bulk", json=[])
+        assert response.status_code == 201
+        assert response.json() == {"inserted": 0, "first_id": None, "last_id": None}
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_message_is_cached():
+    """Test that a message is read from the database once, then from the cache."""
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        created = (await client.post("/messages/", json={"content": "Cached"})).json()
+
+        first = await client.get(f"/messages/{created['id']}")
+        second = await client.get(f"/messages/{created['id']}")
+        assert first.status_code == second.status_code == 200
+        assert first.json() == second.json() == created
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT"
+
+        message_invalidator.publish([created["id"]])
+        third = await client.get(f"/messages/{created['id']}")
+        assert third.headers["X-Cache"] == "MISS"
+
+        stats = (await client.get("/messages/cache/stats")).json()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+        assert stats["invalidations"] == 1
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_message_not_found():
+    """Test that unknown ids return 404 and the miss is cached."""
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        first = await client.get("/messages/999999999")
+        second = await client.get("/messages/999999999")
+        assert first.status_code == second.status_code == 404
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT"
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_list_messages_conditional_get():
+    """Test that an unchanged page returns 304 and a write changes the ETag."""
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        created = (await client.post("/messages/", json={"content": "ETag 1"})).json()
+        params = {"cursor": encode_cursor({"id": created["id"] - 1}), "limit": 5}
+
+        first = await client.get("/messages/", params=params)
+        assert first.status_code == 200
+        assert first.headers["X-Cache"] == "MISS"
+        etag = first.headers["ETag"]
+        assert [item["id"] for item in first.json()["items"]] == [created["id"]]
+
+        cached = await client.get("/messages/", params=params)
+        assert cached.headers["X-Cache"] == "HIT"
+        assert cached.content == first.content
+
+        not_modified = await client.get(
+            "/messages/", params=params, headers={"If-None-Match": etag}
+        )
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["ETag"] == etag
+
+        await client.post("/messages/", json={"content": "ETag 2"})
+        changed = await client.get("/messages/", params=params, headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+        assert len(changed.json()["items"]) == 2
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_list_messages_conditional_get_offset_mode():
+    """Test that offset pages are validated without being re-serialized."""
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        await client.post("/messages/", json={"content": "ETag offset"})
+        first = await client.get("/messages/?skip=0&limit=3")
+        assert isinstance(first.json(), list)
+
+        # Page cache dropped: the validator alone decides the 304
+        page_cache.clear()
+        response = await client.get(
+            "/messages/?skip=0&limit=3", headers={"If-None-Match": f'W/{first.headers["ETag"]}'}
+        )
+        assert response.status_code == 304
+        assert response.headers["X-Cache"] == "MISS"
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_search_messages():
+    """Test searching messages with cursor pagination."""
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        for i in range(3):
+            await client.post("/messages/", json={"content": f"Searchable kumquat {i}"})
+
+        first = await client.get("/messages/search", params={"q": "kumquat", "limit": 2})
+        assert first.status_code == 200
+        data = first.json()
+        assert len(data["items"]) == 2
+        assert {"id", "content", "created_at", "rank"} <= set(data["items"][0])
+
+        rest = await client.get(
+            "/messages/search", params={"q": "kumquat", "limit": 2, "cursor": data["next_cursor"]}
+        )
+        assert len(rest.json()["items"]) >= 1
+        contents = [item["content"] for item in data["items"] + rest.json()["items"]]
+        assert len(contents) == len(set(contents))
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_search_messages_invalid_params():
+    """Test that empty queries and malformed cursors are rejected."""
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        assert (await client.get("/messages/search", params={"q": ""})).status_code == 422
+        response = await client.get("/messages/search", params={"q": "x", "cursor": "bad"})
+        assert response.status_code == 400
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_message_stats_default_range():
+    """Test per-minute counts over the last day include a just-created message."""
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        await client.post("/messages/", json={"content": "Counted"})
+        response = await client.get("/messages/stats")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["bucket"] == "1m"
+    assert len(data["buckets"]) in (1440, 1441)
+    assert data["total"] >= 1
+    assert data["total"] == sum(bucket["count"] for bucket in data["buckets"])
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_create_message_idempotency_key():
+    """Test that a retried message create returns the original message without inserting."""
+    key = f"message-{uuid.uuid4()}"
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        first = await client.post(
+            "/messages/", json={"content": "Once only"}, headers={"Idempotency-Key": key}
+        )
+        # Drop the in-process copy so the replay is served from the table
+        idempotency_cache.clear()
+        retry = await client.post(
+            "/messages/", json={"content": "Once only"}, headers={"Idempotency-Key": key}
+        )
+        cached = await client.post(
+            "/messages/", json={"content": "Once only"}, headers={"Idempotency-Key": key}
+        )
+        conflict = await client.post(
+            "/messages/", json={"content": "Something else"}, headers={"Idempotency-Key": key}
+        )
+        matches = await client.get("/messages/search", params={"q": "Once only"})
+
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+    for replay in (retry, cached):
+        assert replay.status_code == 201
+        assert replay.headers["Idempotent-Replayed"] == "true"
+        assert replay.json() == first.json()
+    assert conflict.status_code == 422
+    assert sum(item["content"] == "Once only" for item in matches.json()["items"]) == 1
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_enqueue_task_idempotency_key():
+    """Test that a retried enqueue returns the original task id without publishing again."""
+    key = f"task-{uuid.uuid4()}"
+    published = []
+    publish = task_publisher.apply_async
+
+    async def record_publish(*args, **kwargs):
+        result = await publish(*args, **kwargs)
+        published.append(result.id)
+        return result
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        with patch.object(task_publisher, "apply_async", side_effect=record_publish):
+            first = await client.post(
+                "/tasks/", json={"content": "Enqueue once"}, headers={"Idempotency-Key": key}
+            )
+            retry = await client.post(
+                "/tasks/", json={"content": "Enqueue once"}, headers={"Idempotency-Key": key}
+            )
+
+    assert first.status_code == 202
+    assert retry.status_code == 202
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert published == [first.json()["task_id"]]
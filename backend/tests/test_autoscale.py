@@ -0,0 +1,158 @@
+"""Tests for the queue-depth driven worker autoscaler."""
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from app.autoscale import QueueDepthAutoscaler, QueueDepthReader
+from app.celery_app import PUBLISHED_AT_HEADER, celery_app
+from app.tasks import slow_task
+
+
+class FakePool:
+    def __init__(self, processes):
+        self.num_processes = processes
+
+    def grow(self, n):
+        self.num_processes += n
+
+    def shrink(self, n):
+        self.num_processes -= n
+
+    def maintain_pool(self):
+        pass
+
+
+@pytest.fixture
+def autoscaler():
+    """Autoscaler with max 8 / min 2 processes, 10 tasks per process, 5s latency target."""
+    with patch("app.autoscale.settings") as settings:
+        settings.AUTOSCALE_INTERVAL = 5.0
+        settings.AUTOSCALE_BACKLOG_PER_PROCESS = 10
+        settings.AUTOSCALE_LATENCY_TARGET = 5.0
+        settings.AUTOSCALE_SCALE_DOWN_DELAY = 60.0
+        worker = SimpleNamespace(app=celery_app)
+        yield QueueDepthAutoscaler(FakePool(2), 8, 2, worker=worker)
+
+
+def test_scales_up_with_backlog(autoscaler):
+    """Test that the pool grows at once to cover the backlog."""
+    assert autoscaler.decide(2, active=2, backlog=35, latency=None, now=0) == (6, "backlog")
+
+
+def test_scale_up_is_bounded(autoscaler):
+    """Test that the pool never grows past max_concurrency."""
+    assert autoscaler.decide(2, active=2, backlog=10_000, latency=None, now=0)[0] == 8
+
+
+def test_scales_up_on_latency(autoscaler):
+    """Test that tasks waiting too long add a process even with a small backlog."""
+    assert autoscaler.decide(3, active=3, backlog=1, latency=12.0, now=0) == (4, "latency")
+
+
+def test_holds_between_watermarks(autoscaler):
+    """Test that a backlog between the two thresholds neither grows nor shrinks the pool."""
+    # Needs 2 + 15/10 -> 4 processes to grow, fits 4 only at half the ratio
+    assert autoscaler.decide(4, active=2, backlog=15, latency=None, now=0) == (4, "steady")
+
+
+def test_scales_down_after_delay(autoscaler):
+    """Test that shrinking waits for the scale-down delay and goes one process at a time."""
+    assert autoscaler.decide(6, active=1, backlog=0, latency=None, now=0) == (6, "cooldown")
+    assert autoscaler.decide(6, active=1, backlog=0, latency=None, now=59) == (6, "cooldown")
+    assert autoscaler.decide(6, active=1, backlog=0, latency=None, now=60) == (5, "idle")
+    assert autoscaler.decide(5, active=1, backlog=0, latency=None, now=61) == (5, "cooldown")
+    assert autoscaler.decide(5, active=1, backlog=0, latency=None, now=120) == (4, "idle")
+
+
+def test_load_resets_scale_down_delay(autoscaler):
+    """Test that a burst during the cooldown restarts the scale-down delay."""
+    autoscaler.decide(6, active=1, backlog=0, latency=None, now=0)
+    assert autoscaler.decide(6, active=6, backlog=0, latency=None, now=30)[1] == "steady"
+    assert autoscaler.decide(6, active=1, backlog=0, latency=None, now=70) == (6, "cooldown")
+
+
+def test_never_below_min(autoscaler):
+    """Test that an idle pool stays at min_concurrency."""
+    assert autoscaler.decide(2, active=0, backlog=0, latency=None, now=1000) == (2, "steady")
+
+
+def test_apply_records_decisions(autoscaler):
+    """Test that resizing updates the pool and the exposed counters."""
+    autoscaler.backlog = 40
+    autoscaler.apply(6, "backlog")
+    autoscaler.apply(5, "idle")
+    autoscaler.apply(5, "steady")
+
+    info = autoscaler.info()
+    assert info["current"] == 5
+    assert (info["scale_ups"], info["scale_downs"]) == (1, 1)
+    assert info["last_decision"]["from"] == 6
+    assert info["last_decision"]["to"] == 5
+    assert info["last_decision"]["reason"] == "idle"
+    assert (info["max"], info["min"]) == (8, 2)
+
+
+def test_waiting_latency():
+    """Test that latency is the age of the oldest waiting task."""
+    requests = [
+        SimpleNamespace(request_dict={PUBLISHED_AT_HEADER: 100.0}),
+        SimpleNamespace(request_dict={PUBLISHED_AT_HEADER: 90.0}),
+        SimpleNamespace(request_dict={}),
+    ]
+    assert QueueDepthAutoscaler.waiting_latency(requests, now=110.0) == 20.0
+    assert QueueDepthAutoscaler.waiting_latency([], now=110.0) is None
+
+
+def test_reader_sums_consumed_queues():
+    """Test that the reader thread keeps the ready messages of the worker's queues."""
+    reader = QueueDepthReader(celery_app, {"long": None, "maintenance": None}, interval=60)
+    with patch.object(reader.monitor, "read", return_value={"long": 25, "maintenance": 5}) as read:
+        reader.start()
+        for _ in range(100):
+            if reader.queued:
+                break
+            time.sleep(0.01)
+        reader.stop()
+        reader.join(timeout=1)
+
+    read.assert_called_once_with(["long", "maintenance"])
+    assert reader.queued == 30
+    assert not reader.is_alive()
+
+
+def test_reader_unknown_depth_is_zero():
+    """Test that a failed read counts as no backlog."""
+    reader = QueueDepthReader(celery_app, ["celery"], interval=60)
+    with patch.object(reader.monitor, "read", side_effect=ConnectionError("broker down")):
+        assert reader.read() == 0
+
+
+def test_maybe_scale_like_the_hub(autoscaler):
+    """Test scaling from the hub's calls: throttled to one decision per interval."""
+    assert autoscaler.keepalive == autoscaler.interval == 5.0
+    reader = SimpleNamespace(queued=30, start=lambda: None)
+    with patch("app.autoscale.QueueDepthReader", return_value=reader) as reader_cls:
+        # Timer tick, then a task message right after it
+        autoscaler.maybe_scale()
+        assert (autoscaler.backlog, autoscaler.processes) == (30, 3)
+        reader.queued = 80
+        autoscaler.maybe_scale(SimpleNamespace())
+        assert autoscaler.processes == 3
+
+        autoscaler._decided_at -= autoscaler.interval
+        autoscaler.maybe_scale()
+
+    reader_cls.assert_called_once()
+    assert autoscaler.processes == 8
+    assert autoscaler.info()["scale_ups"] == 2
+
+
+def test_published_at_header():
+    """Test that published tasks carry their publish time for latency measurements."""
+    slow_task.apply_async(args=(1,), queue="autoscale-test")
+    with celery_app.connection_for_read() as connection:
+        message = connection.default_channel.basic_get("autoscale-test")
+
+    assert message.headers[PUBLISHED_AT_HEADER] > 0
@@ -0,0 +1,92 @@
+"""Tests for task routing, per-queue delivery policies and worker prefetch."""
+from types import SimpleNamespace
+
+import pytest
+
+from app.celery_app import (
+    QUEUE_POLICIES,
+    TASK_ROUTES,
+    apply_queue_prefetch,
+    celery_app,
+)
+from app.tasks import (
+    cleanup_idempotency_keys,
+    create_message_task,
+    create_messages_bulk_task,
+    maintain_message_partitions,
+    purge_expired_messages,
+    slow_task,
+)
+
+
+def _routed_queue(name: str) -> str:
+    return celery_app.amqp.router.route({}, name)["queue"]
+
+
+@pytest.mark.parametrize(
+    ("task", "queue"),
+    [
+        (create_message_task, "messages"),
+        (create_messages_bulk_task, "messages"),
+        (slow_task, "long"),
+        (maintain_message_partitions, "maintenance"),
+        (purge_expired_messages, "maintenance"),
+        (cleanup_idempotency_keys, "maintenance"),
+    ],
+)
+def test_task_routes(task, queue):
+    """Test that each task is published to its dedicated queue with a matching routing key."""
+    routed = _routed_queue(task.name)
+    assert routed.name == queue
+    assert routed.routing_key == queue
+
+
+def test_unrouted_tasks_use_default_queue():
+    """Test that tasks without a route go to the default queue."""
+    assert _routed_queue("app.tasks.unknown").name == celery_app.conf.task_default_queue
+
+
+def test_every_routed_queue_is_declared():
+    """Test that workers without -Q consume every queue tasks are routed to."""
+    declared = {queue.name for queue in celery_app.conf.task_queues}
+    assert set(TASK_ROUTES.values()) <= declared
+    assert celery_app.conf.task_default_queue in declared
+
+
+def test_acks_late_follows_queue_policy():
+    """Test that long jobs are acknowledged late and message inserts early."""
+    assert slow_task.acks_late is True
+    assert purge_expired_messages.acks_late is True
+    assert create_message_task.acks_late is False
+    assert create_messages_bulk_task.acks_late is False
+
+
+def _worker(consume_from, prefetch_multiplier=None):
+    app = SimpleNamespace(
+        conf=SimpleNamespace(worker_prefetch_multiplier=4),
+        amqp=SimpleNamespace(queues=SimpleNamespace(consume_from=consume_from)),
+    )
+    return SimpleNamespace(app=app, prefetch_multiplier=prefetch_multiplier or 4)
+
+
+@pytest.mark.parametrize(
+    ("queues", "expected"),
+    [
+        ({"messages": None}, QUEUE_POLICIES["messages"].prefetch_multiplier),
+        ({"long": None, "maintenance": None}, 1),
+        ({"messages": None, "long": None}, 1),
+        ({"custom": None}, 4),
+    ],
+)
+def test_apply_queue_prefetch(queues, expected):
+    """Test that a worker gets the most conservative prefetch of its queues."""
+    worker = _worker(queues)
+    apply_queue_prefetch(sender=worker)
+    assert worker.prefetch_multiplier == expected
+
+
+def test_apply_queue_prefetch_keeps_explicit_value():
+    """Test that --prefetch-multiplier on the command line wins."""
+    worker = _worker({"long": None}, prefetch_multiplier=8)
+    apply_queue_prefetch(sender=worker)
+    assert worker.prefetch_multiplier == 8
@@ -5,7 +5,7 @@ import pytest
 from unittest.mock import Mock, patch, PropertyMock
 from datetime import datetime
 
-from app.tasks import create_message_task, slow_task, DatabaseTask
+from app.tasks import create_message_task, create_messages_bulk_task, slow_task, DatabaseTask
 from app.models import Message
 
 
@@ -70,6 +70,48 @@ class TestCreateMessageTask:
             assert result["content"] == special_content
 
 
+class TestCreateMessagesBulkTask:
+    """Tests for create_messages_bulk_task."""
+
+    def test_create_messages_bulk_task_success(self, mock_sync_session_local, test_db_session, reset_database_task_session):
+        """Test that all messages are inserted and ids come back in order."""
+        contents = [f"Bulk message {i}" for i in range(5)]
+
+        with patch('app.tasks.SyncSessionLocal', mock_sync_session_local):
+            DatabaseTask._session = None
+            result = create_messages_bulk_task(contents)
+
+        assert result["count"] == 5
+        assert len(result["ids"]) == 5
+        assert len(result["created_at"]) == 5
+
+        for message_id, content in zip(result["ids"], contents):
+            message = test_db_session.query(Message).filter_by(id=message_id).first()
+            assert message is not None
+            assert message.content == content
+
+    def test_create_messages_bulk_task_empty(self, mock_sync_session_local, test_db_session, reset_database_task_session):
+        """Test that an empty list is a no-op."""
+        with patch('app.tasks.SyncSessionLocal', mock_sync_session_local):
+            DatabaseTask._session = None
+            result = create_messages_bulk_task([])
+
+        assert result == {"count": 0, "ids": [], "created_at": []}
+        assert test_db_session.query(Message).count() == 0
+
+    def test_create_messages_bulk_task_rollback_on_error(self, reset_database_task_session):
+        """Test that the transaction is rolled back when the insert fails."""
+        mock_session = Mock()
+        mock_session.execute.side_effect = Exception("Database error")
+
+        with patch.object(create_messages_bulk_task, '_session', mock_session):
+            with pytest.raises(Exception, match="Database error"):
+                create_messages_bulk_task(["a", "b"])
+
+        mock_session.rollback.assert_called_once()
+        mock_session.commit.assert_not_called()
+
+
 class TestSlowTask:
     """Tests for slow_task."""
 
@@ -108,6 +150,7 @@ class TestCeleryTaskIntegration:
         
         # Check if tasks are registered
         assert "app.tasks.create_message_task" in celery_app.tasks
+        assert "app.tasks.create_messages_bulk_task" in celery_app.tasks
         assert "app.tasks.slow_task" in celery_app.tasks
 
     def test_task_names(self):
@@ -1,7 +1,22 @@
 """Tests for CRUD operations."""
 
-from app.crud import list_messages, create_message
+from app.crud import (
+    bulk_create_messages,
+    count_messages_by_bucket,
+    create_message,
+    list_messages,
+    list_messages_after,
+    message_window_stats,
+    search_messages,
+    stream_messages,
+)
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.dialects import postgresql
+
 from app.models import Message
+from app.schemas import MessageCreate
 
 
 async def test_create_message_async(async_test_db_session, mock_db_time):
@@ -104,3 +119,138 @@ async def test_list_messages_with_fixture_pagination(async_db_with_messages):
     assert len(messages) == 2
     assert messages[0].content == "First test message"
     assert messages[1].content == "Second test message"
+
+
+async def test_list_messages_after(async_db_with_messages):
+    """Test keyset pagination returns messages after the given id, in id order."""
+    first_page = await list_messages_after(async_db_with_messages, limit=2)
+    assert [m.content for m in first_page] == ["First test message", "Second test message"]
+
+    second_page = await list_messages_after(
+        async_db_with_messages, after_id=first_page[-1].id, limit=2
+    )
+    assert [m.content for m in second_page] == ["Third test message"]
+
+    empty_page = await list_messages_after(
+        async_db_with_messages, after_id=second_page[-1].id, limit=2
+    )
+    assert empty_page == []
+
+
+async def test_message_window_stats(async_db_with_messages):
+    """Test that window stats describe exactly the ids a page query returns."""
+    page = await list_messages_after(async_db_with_messages, limit=2)
+    stats = await message_window_stats(async_db_with_messages, limit=2)
+    assert stats == (2, page[0].id, page[-1].id)
+
+    count, _, max_id = await message_window_stats(async_db_with_messages, skip=1, limit=10)
+    assert count == 2
+
+    assert await message_window_stats(async_db_with_messages, after_id=max_id) == (0, None, None)
+
+
+async def test_stream_messages_batches(async_db_with_messages):
+    """Test that stream_messages yields every row in id order, in bounded batches."""
+    batches = [rows async for rows in stream_messages(async_db_with_messages, batch_size=2)]
+
+    assert [len(rows) for rows in batches] == [2, 1]
+    contents = [row.content for rows in batches for row in rows]
+    assert contents == ["First test message", "Second test message", "Third test message"]
+
+
+async def test_bulk_create_messages(async_test_db_session):
+    """Test bulk creation returns one id per message, in input order."""
+    messages = [MessageCreate(content=f"Bulk {i}") for i in range(3)]
+
+    ids = await bulk_create_messages(async_test_db_session, messages)
+
+    assert len(ids) == 3
+    saved = await list_messages_after(async_test_db_session, limit=10)
+    assert [m.id for m in saved] == ids
+    assert [m.content for m in saved] == ["Bulk 0", "Bulk 1", "Bulk 2"]
+
+
+async def test_search_messages_fallback(async_db_with_messages):
+    """Test case-insensitive substring search with keyset paging on non-PostgreSQL databases."""
+    rows = await search_messages(async_db_with_messages, "SECOND")
+    assert [row.content for row in rows] == ["Second test message"]
+
+    first_page = await search_messages(async_db_with_messages, "test", limit=2)
+    assert [row.content for row in first_page] == ["Third test message", "Second test message"]
+    last = first_page[-1]
+    second_page = await search_messages(
+        async_db_with_messages, "test", before=(last.rank, last.id), limit=2
+    )
+    assert [row.content for row in second_page] == ["First test message"]
+
+    assert await search_messages(async_db_with_messages, "100%") == []
+
+
+async def test_search_messages_postgresql_query():
+    """Test that PostgreSQL searches the tsvector column and ranks with ts_rank_cd."""
+    db = MagicMock()
+    db.get_bind.return_value.dialect.name = "postgresql"
+    db.execute = AsyncMock(return_value=MagicMock())
+
+    await search_messages(db, "hello world", before=(0.5, 10), limit=5)
+
+    sql = str(db.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "messages.search_vector @@ websearch_to_tsquery" in sql
+    assert "ts_rank_cd(messages.search_vector" in sql
+    assert "ORDER BY rank DESC, messages.id DESC" in sql
+
+
+async def test_count_messages_by_bucket(async_test_db_session):
+    """Test that messages are counted per epoch-aligned bucket within the range."""
+    for created_at in (
+        datetime(2026, 1, 1, 12, 0, 5),
+        datetime(2026, 1, 1, 12, 0, 59),
+        datetime(2026, 1, 1, 12, 2, 0),
+        datetime(2026, 1, 1, 13, 0, 0),  # outside the range
+    ):
+        async_test_db_session.add(Message(content="stat", created_at=created_at))
+    await async_test_db_session.commit()
+
+    counts = await count_messages_by_bucket(
+        async_test_db_session,
+        timedelta(minutes=1),
+        datetime(2026, 1, 1, 12, 0),
+        datetime(2026, 1, 1, 13, 0),
+    )
+    assert counts == [(datetime(2026, 1, 1, 12, 0), 2), (datetime(2026, 1, 1, 12, 2), 1)]
+
+
+async def test_count_messages_by_bucket_postgresql_query():
+    """Test that PostgreSQL buckets with date_bin."""
+    db = MagicMock()
+    db.get_bind.return_value.dialect.name = "postgresql"
+    db.execute = AsyncMock(return_value=MagicMock())
+
+    await count_messages_by_bucket(
+        db, timedelta(minutes=5), datetime(2026, 1, 1), datetime(2026, 1, 2)
+    )
+
+    sql = str(db.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "date_bin(" in sql
+    assert "GROUP BY date_bin(" in sql
+
+
+async def test_created_at_range_filters(async_test_db_session):
+    """Test that since/until bound created_at in list, search and stream queries."""
+    for day in (1, 2, 3):
+        async_test_db_session.add(Message(content=f"day {day}", created_at=datetime(2026, 1, day)))
+    await async_test_db_session.commit()
+    since, until = datetime(2026, 1, 2), datetime(2026, 1, 3)
+
+    listed = await list_messages_after(async_test_db_session, since=since, until=until)
+    assert [m.content for m in listed] == ["day 2"]
+
+    found = await search_messages(async_test_db_session, "day", since=since)
+    assert [row.content for row in found] == ["day 3", "day 2"]
+
+    streamed = [
+        row.content
+        async for rows in stream_messages(async_test_db_session, until=until)
+        for row in rows
+    ]
+    assert streamed == ["day 1", "day 2"]
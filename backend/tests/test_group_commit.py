@@ -0,0 +1,168 @@
+"""Tests for the worker-side group-commit buffer."""
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.group_commit import CommitOutcomeUnknownError, GroupCommitBuffer
+from app.helpers import utc_now_naive
+from app.models import Message
+from app.tasks import _flush_message_batch, _message_batch_results, create_message_task
+
+
+pytestmark = [pytest.mark.unit]
+
+
+def test_submit_returns_individual_results():
+    """Test that concurrent submitters share batches but get their own results."""
+    batches = []
+
+    def flush(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    buffer = GroupCommitBuffer(flush, max_size=50, max_wait_ms=200)
+
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        results = list(executor.map(buffer.submit, range(20)))
+
+    assert results == [i * 10 for i in range(20)]
+    assert sum(len(batch) for batch in batches) == 20
+    assert len(batches) < 20
+
+
+def test_batch_never_exceeds_max_size():
+    """Test that a batch is flushed as soon as max_size items are waiting."""
+    batches = []
+
+    def flush(items):
+        batches.append(list(items))
+        return items
+
+    buffer = GroupCommitBuffer(flush, max_size=3, max_wait_ms=200)
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        list(executor.map(buffer.submit, range(10)))
+
+    assert all(len(batch) <= 3 for batch in batches)
+
+
+def test_flush_error_is_raised_for_every_item():
+    """Test that a failed flush propagates the exception to each submitter."""
+
+    def flush(items):
+        raise ValueError("Database error")
+
+    buffer = GroupCommitBuffer(flush, max_size=10, max_wait_ms=1)
+
+    with pytest.raises(ValueError, match="Database error"):
+        buffer.submit("a")
+
+
+def test_failed_batch_falls_back_to_single_items():
+    """Test that one bad item fails only its own submitter, not its batch neighbours."""
+    flushed = []
+
+    def flush(items):
+        if "bad" in items:
+            raise ValueError("Bad row")
+        flushed.append(list(items))
+        return [item.upper() for item in items]
+
+    buffer = GroupCommitBuffer(flush, max_size=10, max_wait_ms=1)
+    batch = [(item, Future()) for item in ("a", "bad", "c")]
+
+    buffer.flush_batch(batch)
+
+    assert [future.result() for item, future in batch if item != "bad"] == ["A", "C"]
+    with pytest.raises(ValueError, match="Bad row"):
+        batch[1][1].result()
+    assert flushed == [["a"], ["c"]]
+
+
+def test_unknown_commit_outcome_is_not_retried():
+    """Test that a batch that may have been committed fails without per-item retries."""
+    calls = []
+
+    def flush(items):
+        calls.append(list(items))
+        raise CommitOutcomeUnknownError("connection lost")
+
+    buffer = GroupCommitBuffer(flush, max_size=10, max_wait_ms=1)
+    batch = [(item, Future()) for item in ("a", "b")]
+
+    buffer.flush_batch(batch)
+
+    assert calls == [["a", "b"]]
+    for _, future in batch:
+        with pytest.raises(CommitOutcomeUnknownError):
+            future.result()
+
+
+def test_after_commit_failure_is_not_retried():
+    """Test that an error after the commit fails the batch instead of writing it again."""
+    flushed = []
+
+    def flush(items):
+        flushed.append(list(items))
+        return items
+
+    def after_commit(_items, _results):
+        raise ConnectionError("invalidation failed")
+
+    buffer = GroupCommitBuffer(flush, max_size=10, max_wait_ms=1, after_commit=after_commit)
+    batch = [(item, Future()) for item in ("a", "b")]
+
+    buffer.flush_batch(batch)
+
+    assert flushed == [["a", "b"]]
+    with pytest.raises(ConnectionError):
+        batch[1][1].result()
+
+
+def test_after_commit_builds_results():
+    """Test that after_commit turns the flushed results into each submitter's result."""
+    buffer = GroupCommitBuffer(
+        lambda items: [len(item) for item in items],
+        max_size=10,
+        max_wait_ms=1,
+        after_commit=lambda items, results: list(zip(items, results, strict=True)),
+    )
+    assert buffer.submit("abc") == ("abc", 3)
+
+
+def test_flush_result_count_mismatch():
+    """Test that a flush returning the wrong number of results fails the batch."""
+    buffer = GroupCommitBuffer(lambda items: [], max_size=10, max_wait_ms=1)
+
+    with pytest.raises(RuntimeError, match="0 results for 1 items"):
+        buffer.submit("a")
+
+
+def test_flush_message_batch(mock_sync_session_local, test_db_session):
+    """Test that a batch of message rows is inserted in one transaction."""
+    rows = [{"content": f"Grouped {i}", "created_at": utc_now_naive()} for i in range(5)]
+
+    with patch('app.tasks.SyncSessionLocal', mock_sync_session_local):
+        results = _message_batch_results(rows, _flush_message_batch(rows))
+
+    assert [result["content"] for result in results] == [f"Grouped {i}" for i in range(5)]
+    for result in results:
+        message = test_db_session.query(Message).filter_by(id=result["id"]).first()
+        assert message is not None
+        assert message.content == result["content"]
+
+
+def test_create_message_task_uses_buffer_when_enabled(reset_database_task_session):
+    """Test create_message_task delegates to the group-commit buffer when enabled."""
+    buffer = MagicMock()
+    buffer.submit.return_value = {"id": 1, "content": "Grouped", "created_at": "2024-01-01T00:00:00"}
+
+    with patch('app.tasks.settings.MESSAGE_GROUP_COMMIT', True), \
+            patch('app.tasks._message_buffer', buffer):
+        result = create_message_task("Grouped")
+
+    assert result["id"] == 1
+    submitted = buffer.submit.call_args.args[0]
+    assert submitted["content"] == "Grouped"
+    assert "created_at" in submitted
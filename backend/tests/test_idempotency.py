@@ -0,0 +1,185 @@
+"""Tests for Idempotency-Key handling."""
+import asyncio
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import select, update
+
+from app.helpers import utc_now_naive
+from app.idempotency import (
+    StoredResponse,
+    claim_key,
+    replay_response,
+    request_fingerprint,
+)
+from app.main import app, enqueue_task
+from app.models import IdempotencyKey
+from app.schemas import MessageCreate
+from app.tasks import cleanup_idempotency_keys
+
+client = TestClient(app)
+
+
+def test_request_fingerprint_depends_on_scope_and_payload():
+    """Test that the fingerprint distinguishes endpoints and bodies."""
+    payload = '{"content":"x"}'
+    assert request_fingerprint("tasks", payload) == request_fingerprint("tasks", payload)
+    assert request_fingerprint("tasks", payload) != request_fingerprint("messages", payload)
+    assert request_fingerprint("tasks", payload) != request_fingerprint("tasks", "{}")
+
+
+def test_replay_response():
+    """Test that a completed record is replayed with its status code and body."""
+    response = replay_response(StoredResponse("abc", 202, '{"task_id":"1"}'), "abc")
+
+    assert response.status_code == 202
+    assert response.body == b'{"task_id":"1"}'
+    assert response.headers["Idempotent-Replayed"] == "true"
+
+
+def test_replay_response_rejects_different_request():
+    """Test that reusing a key with another body is a 422."""
+    with pytest.raises(HTTPException) as exc_info:
+        replay_response(StoredResponse("abc", 201, "{}"), "def")
+    assert exc_info.value.status_code == 422
+
+
+def test_replay_response_in_progress():
+    """Test that a key whose request has not finished yet is a 409 with Retry-After."""
+    with pytest.raises(HTTPException) as exc_info:
+        replay_response(StoredResponse("abc", None, None), "abc")
+    assert exc_info.value.status_code == 409
+    assert exc_info.value.headers == {"Retry-After": "1"}
+
+
+@pytest.fixture
+def idempotency_store():
+    """Keys held in memory instead of the idempotency_keys table."""
+    keys = {}
+
+    async def claim_key(_db, scope, key, fingerprint):
+        if (scope, key) in keys:
+            return keys[(scope, key)]
+        keys[(scope, key)] = StoredResponse(fingerprint, None, None)
+        return None
+
+    async def complete_key(_db, scope, key, status_code, body):
+        keys[(scope, key)] = StoredResponse(keys[(scope, key)].fingerprint, status_code, body)
+
+    async def release_key(_db, scope, key):
+        del keys[(scope, key)]
+
+    with (
+        patch("app.main.AsyncSessionLocal", return_value=AsyncMock()),
+        patch("app.main.claim_key", claim_key),
+        patch("app.main.complete_key", complete_key),
+        patch("app.main.release_key", release_key),
+    ):
+        yield keys
+
+
+def test_enqueue_task_publish_failure_releases_key(idempotency_store):
+    """Test that a failed publish frees the key so the retry enqueues the task."""
+    headers = {"Idempotency-Key": "publish-failure"}
+    body = {"content": "Retry me"}
+    with patch("app.main.task_publisher.delay", new_callable=AsyncMock) as delay:
+        delay.side_effect = ConnectionError("broker down")
+        with pytest.raises(ConnectionError):
+            client.post("/tasks/", json=body, headers=headers)
+        assert idempotency_store == {}
+
+        delay.side_effect = None
+        delay.return_value.id = "published-task"
+        response = client.post("/tasks/", json=body, headers=headers)
+
+    assert response.status_code == 202
+    assert response.json()["task_id"] == "published-task"
+    assert "Idempotent-Replayed" not in response.headers
+    assert delay.call_count == 2
+
+
+def test_enqueue_task_records_response_after_publish(idempotency_store):
+    """Test that the key stays in progress during the publish and replays the published id."""
+    headers = {"Idempotency-Key": "publish-order"}
+    body = {"content": "Once"}
+    seen_during_publish = []
+
+    async def delay(*_args):
+        seen_during_publish.append(idempotency_store[("tasks", "publish-order")].body)
+        return MagicMock(id="published-task")
+
+    with patch("app.main.task_publisher.delay", side_effect=delay):
+        first = client.post("/tasks/", json=body, headers=headers)
+        replay = client.post("/tasks/", json=body, headers=headers)
+
+    assert seen_during_publish == [None]
+    assert first.json()["task_id"] == replay.json()["task_id"] == "published-task"
+    assert replay.headers["Idempotent-Replayed"] == "true"
+
+
+@pytest.mark.asyncio
+async def test_enqueue_task_cancelled_publish_releases_key(idempotency_store):
+    """Test that a request cancelled during the publish does not leave the key in progress."""
+    delay = AsyncMock(side_effect=asyncio.CancelledError)
+    with (
+        patch("app.main.task_publisher.delay", delay),
+        pytest.raises(asyncio.CancelledError),
+    ):
+        await enqueue_task(MessageCreate(content="Cancelled"), idempotency_key="cancelled")
+
+    assert idempotency_store == {}
+
+
+@pytest.mark.asyncio
+async def test_stale_in_progress_claim_is_taken_over(async_test_db_session):
+    """Test that a claim that never completed blocks retries only for the in-progress timeout."""
+    db = async_test_db_session
+    fingerprint = request_fingerprint("tasks", "{}")
+
+    assert await claim_key(db, "tasks", "abandoned", fingerprint) is None
+    await db.commit()
+    assert await claim_key(db, "tasks", "abandoned", fingerprint) == StoredResponse(
+        fingerprint, None, None
+    )
+
+    await db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.key == "abandoned")
+        .values(created_at=utc_now_naive() - timedelta(minutes=5))
+    )
+    assert await claim_key(db, "tasks", "abandoned", fingerprint) is None
+
+
+def test_idempotency_key_too_long():
+    """Test that over-long keys are rejected."""
+    response = client.post(
+        "/messages/", json={"content": "x"}, headers={"Idempotency-Key": "k" * 256}
+    )
+    assert response.status_code == 422
+
+
+def test_cleanup_idempotency_keys(test_db_engine, test_db_session):
+    """Test that the beat task deletes only expired records."""
+    now = utc_now_naive()
+    test_db_session.add_all(
+        [
+            IdempotencyKey(
+                scope="tasks", key="old", fingerprint="f", created_at=now,
+                expires_at=now - timedelta(seconds=1),
+            ),
+            IdempotencyKey(
+                scope="tasks", key="new", fingerprint="f", created_at=now,
+                expires_at=now + timedelta(hours=1),
+            ),
+        ]
+    )
+    test_db_session.commit()
+
+    with patch("app.tasks.sync_engine", test_db_engine):
+        result = cleanup_idempotency_keys()
+
+    assert result == {"deleted": 1}
+    assert list(test_db_session.scalars(select(IdempotencyKey.key))) == ["new"]
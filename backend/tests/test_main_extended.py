@@ -1,11 +1,18 @@
 """Comprehensive tests for main.py endpoints to achieve full coverage."""
 import pytest
-from datetime import datetime
+from datetime import datetime, timedelta
+import threading
+import uuid
 from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi.testclient import TestClient
 
-from app.main import app, lifespan
+from app.config import settings
+from app.helpers import encode_cursor
+from app.main import _etag_matches, app, lifespan
+from app.message_cache import page_cache
 from app.models import Message
+from app.schemas import TaskStatusResponse
+from app.task_registry import task_registry
 
 
 client = TestClient(app)
@@ -51,6 +58,33 @@ def test_get_task_status_with_valid_uuid():
     assert "status" in data
 
 
+def test_enqueue_task_batch():
+    """Test enqueueing a batch of create-message tasks as one group."""
+    response = client.post(
+        "/tasks/batch",
+        json=[{"content": "Batch 1"}, {"content": "Batch 2"}, {"content": "Batch 3"}],
+    )
+    assert response.status_code == 202
+    data = response.json()
+    assert "group_id" in data
+    assert data["total"] == 3
+    assert len(data["task_ids"]) == 3
+    assert len(set(data["task_ids"])) == 3
+    assert data["status"] == "PENDING"
+
+
+def test_enqueue_task_batch_empty():
+    """Test that an empty batch is rejected."""
+    response = client.post("/tasks/batch", json=[])
+    assert response.status_code == 422
+
+
+def test_enqueue_task_batch_invalid_item():
+    """Test that a batch with an invalid message is rejected as a whole."""
+    response = client.post("/tasks/batch", json=[{"content": "ok"}, {"content": ""}])
+    assert response.status_code == 422
+
+
 # =============================================================================
 # Lifespan and Application Lifecycle Tests
 # =============================================================================
@@ -61,7 +95,12 @@ async def test_lifespan_startup_and_shutdown():
     """Test lifespan context manager (lines 26-30)."""
     mock_app = MagicMock()
     
-    with patch('app.main.async_engine') as mock_engine:
+    with patch('app.main.async_engine') as mock_engine, \
+            patch('app.main.task_events_consumer') as mock_consumer, \
+            patch('app.main.task_publisher') as mock_publisher, \
+            patch('app.main.queue_depth_monitor') as mock_monitor:
+        mock_publisher.warm_up = AsyncMock()
+        mock_monitor.stop = AsyncMock()
         mock_conn = AsyncMock()
         mock_engine.begin.return_value.__aenter__.return_value = mock_conn
         mock_engine.begin.return_value.__aexit__.return_value = None
@@ -75,6 +114,12 @@ async def test_lifespan_startup_and_shutdown():
         
         # Verify shutdown: dispose was called (line 30)
         mock_engine.dispose.assert_called_once()
+        mock_consumer.start.assert_called_once()
+        mock_consumer.stop.assert_called_once()
+        mock_publisher.warm_up.assert_awaited_once()
+        mock_publisher.shutdown.assert_called_once()
+        mock_monitor.start.assert_called_once()
+        mock_monitor.stop.assert_awaited_once()
 
 
 # =============================================================================
@@ -82,145 +127,123 @@ async def test_lifespan_startup_and_shutdown():
 # =============================================================================
 
 
-def test_list_all_tasks_with_active_tasks():
-    """Test list_all_tasks with active tasks (lines 114-121)."""
-    mock_active = {
-        "worker1": [
-            {"id": "task-1", "name": "app.tasks.slow_task"},
-            {"id": "task-2", "name": "app.tasks.create_message_task"}
-        ]
-    }
-    
-    with patch('app.main.celery_app.control.inspect') as mock_inspect:
-        mock_inspector = MagicMock()
-        mock_inspector.active.return_value = mock_active
-        mock_inspector.scheduled.return_value = None
-        mock_inspector.reserved.return_value = None
-        mock_inspect.return_value = mock_inspector
-        
-        response = client.get("/tasks/")
-        assert response.status_code == 200
-        data = response.json()
-        assert data["total"] == 2
-        assert len(data["tasks"]) == 2
-        assert data["tasks"][0]["status"] == "ACTIVE"
-        assert data["tasks"][1]["status"] == "ACTIVE"
-
-
-def test_list_all_tasks_with_scheduled_tasks():
-    """Test list_all_tasks with scheduled tasks (lines 124-131)."""
-    mock_scheduled = {
-        "worker1": [
-            {"request": {"id": "scheduled-1"}},
-            {"request": {"id": "scheduled-2"}}
-        ]
-    }
-    
-    with patch('app.main.celery_app.control.inspect') as mock_inspect:
-        mock_inspector = MagicMock()
-        mock_inspector.active.return_value = None
-        mock_inspector.scheduled.return_value = mock_scheduled
-        mock_inspector.reserved.return_value = None
-        mock_inspect.return_value = mock_inspector
-        
-        response = client.get("/tasks/")
-        assert response.status_code == 200
-        data = response.json()
-        assert data["total"] == 2
-        assert all(task["status"] == "SCHEDULED" for task in data["tasks"])
+@pytest.fixture
+def registry():
+    """Provide an empty shared task registry and clear it afterwards."""
+    task_registry.clear()
+    yield task_registry
+    task_registry.clear()
+
+
+def test_list_all_tasks_empty(registry):
+    """Test list_all_tasks with no tracked tasks."""
+    response = client.get("/tasks/")
+    assert response.status_code == 200
+    assert response.json() == {"tasks": [], "total": 0}
 
 
-def test_list_all_tasks_with_reserved_tasks():
-    """Test list_all_tasks with reserved tasks (lines 134-141)."""
-    mock_reserved = {
-        "worker1": [
-            {"id": "reserved-1"},
-            {"id": "reserved-2"}
-        ]
+def test_list_all_tasks_with_active_tasks(registry):
+    """Test list_all_tasks reports started tasks as ACTIVE."""
+    registry.handle_event({"type": "task-received", "uuid": "task-1", "name": "app.tasks.slow_task"})
+    registry.handle_event({"type": "task-started", "uuid": "task-1"})
+    registry.handle_event(
+        {"type": "task-received", "uuid": "task-2", "name": "app.tasks.create_message_task"}
+    )
+    registry.handle_event({"type": "task-started", "uuid": "task-2"})
+
+    response = client.get("/tasks/")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 2
+    assert all(task["status"] == "ACTIVE" for task in data["tasks"])
+    assert {task["name"] for task in data["tasks"]} == {
+        "app.tasks.slow_task",
+        "app.tasks.create_message_task",
     }
-    
-    with patch('app.main.celery_app.control.inspect') as mock_inspect:
-        mock_inspector = MagicMock()
-        mock_inspector.active.return_value = None
-        mock_inspector.scheduled.return_value = None
-        mock_inspector.reserved.return_value = mock_reserved
-        mock_inspect.return_value = mock_inspector
-        
-        response = client.get("/tasks/")
-        assert response.status_code == 200
-        data = response.json()
-        assert data["total"] == 2
-        assert all(task["status"] == "RESERVED" for task in data["tasks"])
 
 
-def test_list_all_tasks_mixed_states():
-    """Test list_all_tasks with tasks in different states (lines 107-146)."""
-    mock_active = {"worker1": [{"id": "active-1"}]}
-    mock_scheduled = {"worker1": [{"request": {"id": "scheduled-1"}}]}
-    mock_reserved = {"worker1": [{"id": "reserved-1"}]}
-    
-    with patch('app.main.celery_app.control.inspect') as mock_inspect:
-        mock_inspector = MagicMock()
-        mock_inspector.active.return_value = mock_active
-        mock_inspector.scheduled.return_value = mock_scheduled
-        mock_inspector.reserved.return_value = mock_reserved
-        mock_inspect.return_value = mock_inspector
-        
-        response = client.get("/tasks/")
-        assert response.status_code == 200
-        data = response.json()
-        assert data["total"] == 3
-        
-        statuses = [task["status"] for task in data["tasks"]]
-        assert "ACTIVE" in statuses
-        assert "SCHEDULED" in statuses
-        assert "RESERVED" in statuses
+def test_list_all_tasks_with_scheduled_tasks(registry):
+    """Test list_all_tasks reports received tasks with an ETA as SCHEDULED."""
+    registry.handle_event({"type": "task-received", "uuid": "scheduled-1", "eta": "2030-01-01T00:00:00"})
+    registry.handle_event({"type": "task-received", "uuid": "scheduled-2", "eta": "2030-01-01T00:00:00"})
 
+    response = client.get("/tasks/")
+    data = response.json()
+    assert data["total"] == 2
+    assert all(task["status"] == "SCHEDULED" for task in data["tasks"])
 
-def test_list_all_tasks_with_duplicate_ids():
-    """Test list_all_tasks deduplicates task IDs (lines 111-141)."""
-    # Same task ID in active and reserved (shouldn't duplicate)
-    mock_active = {"worker1": [{"id": "task-1"}]}
-    mock_reserved = {"worker1": [{"id": "task-1"}]}  # Same ID
-    
-    with patch('app.main.celery_app.control.inspect') as mock_inspect:
-        mock_inspector = MagicMock()
-        mock_inspector.active.return_value = mock_active
-        mock_inspector.scheduled.return_value = None
-        mock_inspector.reserved.return_value = mock_reserved
-        mock_inspect.return_value = mock_inspector
-        
-        response = client.get("/tasks/")
-        assert response.status_code == 200
-        data = response.json()
-        # Should only have 1 task (deduplicated)
-        assert data["total"] == 1
-        assert data["tasks"][0]["task_id"] == "task-1"
-
-
-def test_list_all_tasks_with_missing_task_ids():
-    """Test list_all_tasks handles tasks without IDs (lines 118-120, 128-130, 138-140)."""
-    mock_active = {
-        "worker1": [
-            {"id": "task-1"},
-            {"name": "no-id-task"},  # Missing id
-            {"id": None}  # None id
-        ]
-    }
-    
+
+def test_list_all_tasks_with_reserved_tasks(registry):
+    """Test list_all_tasks reports received tasks as RESERVED."""
+    registry.handle_event({"type": "task-received", "uuid": "reserved-1"})
+    registry.handle_event({"type": "task-received", "uuid": "reserved-2"})
+
+    response = client.get("/tasks/")
+    data = response.json()
+    assert data["total"] == 2
+    assert all(task["status"] == "RESERVED" for task in data["tasks"])
+
+
+def test_list_all_tasks_mixed_states(registry):
+    """Test list_all_tasks with tasks in different in-flight states."""
+    registry.handle_event({"type": "task-sent", "uuid": "pending-1"})
+    registry.handle_event({"type": "task-received", "uuid": "reserved-1"})
+    registry.handle_event({"type": "task-received", "uuid": "active-1"})
+    registry.handle_event({"type": "task-started", "uuid": "active-1"})
+
+    response = client.get("/tasks/")
+    data = response.json()
+    assert data["total"] == 3
+    statuses = {task["status"] for task in data["tasks"]}
+    assert statuses == {"PENDING", "RESERVED", "ACTIVE"}
+
+
+def test_list_all_tasks_excludes_finished_by_default(registry):
+    """Test finished tasks are only listed when their state is requested."""
+    registry.handle_event({"type": "task-received", "uuid": "done-1"})
+    registry.handle_event({"type": "task-succeeded", "uuid": "done-1"})
+    registry.handle_event({"type": "task-received", "uuid": "failed-1"})
+    registry.handle_event({"type": "task-failed", "uuid": "failed-1"})
+
+    assert client.get("/tasks/").json()["total"] == 0
+
+    response = client.get("/tasks/?state=SUCCESS&state=failure")
+    data = response.json()
+    assert data["total"] == 2
+    assert {task["status"] for task in data["tasks"]} == {"SUCCESS", "FAILURE"}
+
+
+def test_list_all_tasks_filter_by_name(registry):
+    """Test list_all_tasks filters by task name."""
+    registry.handle_event({"type": "task-received", "uuid": "slow-1", "name": "app.tasks.slow_task"})
+    registry.handle_event(
+        {"type": "task-received", "uuid": "msg-1", "name": "app.tasks.create_message_task"}
+    )
+
+    response = client.get("/tasks/?name=app.tasks.slow_task")
+    data = response.json()
+    assert data["total"] == 1
+    assert data["tasks"][0]["task_id"] == "slow-1"
+
+
+def test_list_all_tasks_deduplicates_ids(registry):
+    """Test a task seen in several events is listed once with its latest state."""
+    registry.handle_event({"type": "task-sent", "uuid": "task-1"})
+    registry.handle_event({"type": "task-received", "uuid": "task-1"})
+    registry.handle_event({"type": "task-started", "uuid": "task-1"})
+
+    response = client.get("/tasks/")
+    data = response.json()
+    assert data["total"] == 1
+    assert data["tasks"][0]["task_id"] == "task-1"
+    assert data["tasks"][0]["status"] == "ACTIVE"
+
+
+def test_list_all_tasks_does_not_inspect_workers(registry):
+    """Test list_all_tasks never broadcasts inspect() calls to workers."""
     with patch('app.main.celery_app.control.inspect') as mock_inspect:
-        mock_inspector = MagicMock()
-        mock_inspector.active.return_value = mock_active
-        mock_inspector.scheduled.return_value = None
-        mock_inspector.reserved.return_value = None
-        mock_inspect.return_value = mock_inspector
-        
-        response = client.get("/tasks/")
-        assert response.status_code == 200
-        data = response.json()
-        # Should only include the task with valid ID
-        assert data["total"] == 1
-        assert data["tasks"][0]["task_id"] == "task-1"
+        client.get("/tasks/")
+        mock_inspect.assert_not_called()
 
 
 # =============================================================================
@@ -266,6 +289,101 @@ def test_get_task_status_failed_with_error():
         assert "error" in data["result"]
 
 
+# =============================================================================
+# Bulk Task Status Tests
+# =============================================================================
+
+
+def test_get_task_statuses_multi_get():
+    """Test bulk status lookup reads every task from the result backend."""
+    from app.celery_app import celery_app
+
+    done_id = "11111111-1111-1111-1111-111111111111"
+    failed_id = "22222222-2222-2222-2222-222222222222"
+    pending_id = "33333333-3333-3333-3333-333333333333"
+    celery_app.backend.store_result(done_id, {"id": 1}, "SUCCESS")
+    celery_app.backend.store_result(failed_id, ValueError("boom"), "FAILURE")
+
+    response = client.post(
+        "/tasks/status", json={"task_ids": [done_id, failed_id, pending_id, done_id]}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data) == {done_id, failed_id, pending_id}
+    assert data[done_id] == {"task_id": done_id, "status": "SUCCESS", "result": {"id": 1}}
+    assert data[failed_id]["status"] == "FAILURE"
+    assert "boom" in data[failed_id]["result"]["error"]
+    assert data[pending_id]["status"] == "PENDING"
+    assert data[pending_id]["result"] is None
+
+
+def test_get_task_statuses_single_backend_call():
+    """Test that key/value backends are queried with one mget."""
+    from app.celery_app import celery_app
+
+    # Backends are thread-local, so patch the class rather than the instance
+    backend_class = type(celery_app.backend)
+    task_ids = [f"12345678-1234-5678-1234-5678123456{i:02d}" for i in range(10)]
+    with patch.object(
+        backend_class, "mget", autospec=True, side_effect=backend_class.mget
+    ) as mock_mget:
+        response = client.post("/tasks/status", json={"task_ids": task_ids})
+
+    assert response.status_code == 200
+    assert len(response.json()) == 10
+    mock_mget.assert_called_once()
+
+
+def test_get_task_statuses_fallback_backend():
+    """Test backends without multi-get fall back to per-task lookups."""
+    task_id = "12345678-1234-5678-1234-567812345678"
+    with patch('app.main.KeyValueStoreBackend', ()), \
+            patch('app.main.AsyncResult') as mock_async_result:
+        mock_async_result.return_value.status = "SUCCESS"
+        mock_async_result.return_value.result = {"id": 7}
+
+        response = client.post("/tasks/status", json={"task_ids": [task_id]})
+
+    assert response.status_code == 200
+    assert response.json()[task_id]["result"] == {"id": 7}
+
+
+def test_get_task_statuses_fallback_backend_is_bounded():
+    """Test that per-task fallback lookups run on the shared, bounded pool."""
+    task_ids = [str(uuid.UUID(int=i)) for i in range(20)]
+    threads = set()
+
+    def lookup(task_id):
+        threads.add(threading.current_thread().name)
+        return TaskStatusResponse(task_id=task_id, status="PENDING")
+
+    with patch('app.main.KeyValueStoreBackend', ()), \
+            patch('app.main._lookup_task_status', side_effect=lookup):
+        response = client.post("/tasks/status", json={"task_ids": task_ids})
+
+    assert response.status_code == 200
+    assert list(response.json()) == task_ids
+    assert all(name.startswith("task-status") for name in threads)
+    assert len(threads) <= settings.TASK_STATUS_LOOKUP_CONCURRENCY
+
+
+def test_get_task_statuses_invalid_ids():
+    """Test that invalid task IDs reject the whole request."""
+    response = client.post(
+        "/tasks/status",
+        json={"task_ids": ["12345678-1234-5678-1234-567812345678", "not-a-uuid"]},
+    )
+    assert response.status_code == 422
+    assert "not-a-uuid" in response.json()["detail"]
+
+
+def test_get_task_statuses_empty():
+    """Test that an empty list of task IDs is rejected."""
+    response = client.post("/tasks/status", json={"task_ids": []})
+    assert response.status_code == 422
+
+
 # =============================================================================
 # Message Endpoint Tests
 # =============================================================================
@@ -297,8 +415,11 @@ def test_list_messages_endpoint_mock():
         Message(id=2, content="Message 2", created_at=datetime.now()),
     ]
     
-    with patch('app.main.list_messages', new_callable=AsyncMock) as mock_list:
+    page_cache.clear()
+    with patch('app.main.list_messages', new_callable=AsyncMock) as mock_list, \
+            patch('app.main.message_window_stats', new_callable=AsyncMock) as mock_stats:
         mock_list.return_value = mock_messages
+        mock_stats.return_value = (2, 1, 2)
         
         response = client.get("/messages/?skip=0&limit=10")
         
@@ -318,8 +439,11 @@ def test_list_messages_endpoint_pagination_mock():
         Message(id=4, content="Message 4", created_at=datetime.now()),
     ]
     
-    with patch('app.main.list_messages', new_callable=AsyncMock) as mock_list:
+    page_cache.clear()
+    with patch('app.main.list_messages', new_callable=AsyncMock) as mock_list, \
+            patch('app.main.message_window_stats', new_callable=AsyncMock) as mock_stats:
         mock_list.return_value = mock_messages
+        mock_stats.return_value = (2, 3, 4)
         
         response = client.get("/messages/?skip=2&limit=2")
         
@@ -334,6 +458,118 @@ def test_list_messages_endpoint_pagination_mock():
         assert call_args.kwargs.get('limit') == 2
 
 
+def test_list_messages_endpoint_cursor_first_page_mock():
+    """Test cursor pagination returns items and a next_cursor when more rows exist."""
+    mock_messages = [
+        Message(id=i, content=f"Message {i}", created_at=datetime.now()) for i in range(1, 4)
+    ]
+
+    page_cache.clear()
+    with patch('app.main.list_messages_after', new_callable=AsyncMock) as mock_list, \
+            patch('app.main.message_window_stats', new_callable=AsyncMock) as mock_stats:
+        mock_list.return_value = mock_messages
+        mock_stats.return_value = (3, 1, 3)
+
+        response = client.get("/messages/?cursor=&limit=2")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [item["id"] for item in data["items"]] == [1, 2]
+        assert data["next_cursor"] is not None
+        # One extra row is requested to detect the next page
+        assert mock_list.call_args.kwargs == {
+            "after_id": None,
+            "limit": 3,
+            "since": None,
+            "until": None,
+        }
+
+
+def test_list_messages_endpoint_cursor_follow_mock():
+    """Test that next_cursor seeks after the last id of the previous page."""
+    first = [Message(id=i, content=f"Message {i}", created_at=datetime.now()) for i in (1, 2, 3)]
+    last = [Message(id=3, content="Message 3", created_at=datetime.now())]
+
+    page_cache.clear()
+    with patch('app.main.list_messages_after', new_callable=AsyncMock) as mock_list, \
+            patch('app.main.message_window_stats', new_callable=AsyncMock) as mock_stats:
+        mock_list.return_value = first
+        mock_stats.return_value = (3, 1, 3)
+        next_cursor = client.get("/messages/?cursor=&limit=2").json()["next_cursor"]
+
+        mock_list.return_value = last
+        mock_stats.return_value = (1, 3, 3)
+        response = client.get("/messages/", params={"cursor": next_cursor, "limit": 2})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [item["id"] for item in data["items"]] == [3]
+        assert data["next_cursor"] is None
+        assert mock_list.call_args.kwargs["after_id"] == 2
+
+
+def test_etag_matches():
+    """Test If-None-Match parsing: lists, weak validators and '*'."""
+    assert _etag_matches('"1-1-1"', '"1-1-1"')
+    assert _etag_matches('W/"1-1-1"', '"1-1-1"')
+    assert _etag_matches('"0-0-0", "1-1-1"', '"1-1-1"')
+    assert _etag_matches("*", '"1-1-1"')
+    assert not _etag_matches('"2-1-2"', '"1-1-1"')
+    assert not _etag_matches(None, '"1-1-1"')
+
+
+def test_message_stats_mock():
+    """Test that stats fill empty buckets and total the counts."""
+    with patch('app.main.count_messages_by_bucket', new_callable=AsyncMock) as mock_count:
+        mock_count.return_value = [(datetime(2026, 1, 1, 12, 0), 3), (datetime(2026, 1, 1, 12, 2), 1)]
+
+        response = client.get(
+            "/messages/stats",
+            params={"bucket": "1m", "from": "2026-01-01T12:00:30", "to": "2026-01-01T12:03:00Z"},
+        )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["from"] == "2026-01-01T12:00:30"
+    assert data["total"] == 4
+    assert [(b["start"], b["count"]) for b in data["buckets"]] == [
+        ("2026-01-01T12:00:00", 3),
+        ("2026-01-01T12:01:00", 0),
+        ("2026-01-01T12:02:00", 1),
+    ]
+    bucket, since, until = mock_count.call_args.args[1:]
+    assert bucket == timedelta(minutes=1)
+    assert until == datetime(2026, 1, 1, 12, 3)
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"bucket": "1w"},
+        {"bucket": "0m"},
+        {"from": "2026-01-02T00:00:00", "to": "2026-01-01T00:00:00"},
+        {"bucket": "1s", "from": "2026-01-01T00:00:00", "to": "2026-01-02T00:00:00"},
+    ],
+)
+def test_message_stats_invalid_params(params):
+    """Test that bad buckets, reversed ranges and too many buckets are rejected."""
+    response = client.get("/messages/stats", params=params)
+    assert response.status_code == 400
+
+
+def test_list_messages_endpoint_invalid_cursor():
+    """Test that a malformed cursor is rejected."""
+    response = client.get("/messages/?cursor=not-a-cursor")
+    assert response.status_code == 400
+    assert "Invalid cursor" in response.json()["detail"]
+
+
+def test_list_messages_endpoint_cursor_zero_limit():
+    """Test that cursor pagination requires a positive limit."""
+    response = client.get("/messages/?cursor=&limit=0")
+    assert response.status_code == 400
+
+
 # =============================================================================
 # Legacy Tests (kept for backward compatibility)
 # Note: These tests are skipped because TestClient doesn't work well with async
@@ -384,3 +620,9 @@ def test_get_task_status_failed():
     assert data["task_id"] == valid_uuid
     # Task should be PENDING since it doesn't exist
     assert "status" in data
+
+
+def test_list_messages_endpoint_non_object_cursor():
+    """Test that a well-formed cursor that does not hold an object is rejected."""
+    response = client.get(f"/messages/?cursor={encode_cursor([1, 2])}")
+    assert response.status_code == 400
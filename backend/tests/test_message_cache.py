@@ -0,0 +1,146 @@
+"""Tests for the single-message LRU/TTL cache and its invalidators."""
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.message_cache import (
+    INVALIDATE_EVENT,
+    CachedPage,
+    CeleryEventInvalidator,
+    LocalInvalidator,
+    MessageCache,
+)
+
+
+def test_get_and_set():
+    """Test that cached values are returned and counted as hits."""
+    cache = MessageCache(max_size=10)
+
+    assert cache.get(1) == (False, None)
+    cache.set(1, {"id": 1})
+    assert cache.get(1) == (True, {"id": 1})
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_missing_messages_are_cached():
+    """Test that a None value is cached as 'does not exist'."""
+    cache = MessageCache(max_size=10)
+    cache.set(1, None)
+    assert cache.get(1) == (True, None)
+
+
+def test_lru_eviction():
+    """Test that the least recently used entry is evicted when full."""
+    cache = MessageCache(max_size=2)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    cache.get(1)
+    cache.set(3, "c")
+
+    assert cache.get(2) == (False, None)
+    assert cache.get(1) == (True, "a")
+    assert cache.get(3) == (True, "c")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    """Test that entries expire after their TTL, with a shorter TTL for missing ids."""
+    cache = MessageCache(max_size=10, ttl=60, missing_ttl=2)
+    with patch("app.message_cache.time.monotonic", return_value=100.0):
+        cache.set(1, "a")
+        cache.set(2, None)
+    with patch("app.message_cache.time.monotonic", return_value=103.0):
+        assert cache.get(1) == (True, "a")
+        assert cache.get(2) == (False, None)
+    with patch("app.message_cache.time.monotonic", return_value=161.0):
+        assert cache.get(1) == (False, None)
+    assert cache.stats()["size"] == 0
+
+
+def test_disabled_cache():
+    """Test that a zero-sized cache stores nothing."""
+    cache = MessageCache(max_size=0)
+    cache.set(1, "a")
+    assert cache.get(1) == (False, None)
+
+
+def test_local_invalidator():
+    """Test that published ids are dropped from subscribed caches."""
+    cache = MessageCache(max_size=10)
+    invalidator = LocalInvalidator()
+    invalidator.subscribe(cache.invalidate)
+    cache.set(1, "a")
+    cache.set(2, "b")
+
+    invalidator.publish(iter([1, 3]))
+
+    assert cache.get(1) == (False, None)
+    assert cache.get(2) == (True, "b")
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_pages_are_dropped_only_when_new_ids_can_change_them():
+    """Test that new messages keep full pages that end before their ids."""
+    cache = MessageCache(max_size=10)
+    cache.set("full", CachedPage('"2-1-2"', b"[]", max_id=2, full=True))
+    cache.set("last", CachedPage('"1-3-3"', b"[]", max_id=3, full=False))
+    cache.set("empty", CachedPage('"0-None-None"', b"[]", max_id=None, full=False))
+
+    cache.invalidate_where(lambda page: page.touched_by([4]))
+
+    assert cache.get("full")[0] is True
+    assert cache.get("last") == cache.get("empty") == (False, None)
+    assert cache.stats()["invalidations"] == 2
+
+    # A lower id committed late lands inside the full window
+    cache.invalidate_where(lambda page: page.touched_by([2]))
+    assert cache.get("full") == (False, None)
+
+
+def test_event_invalidator_sends_and_receives_events():
+    """Test that the Celery event invalidator broadcasts ids and applies received ones."""
+    app = MagicMock()
+    consumer = MagicMock()
+    invalidator = CeleryEventInvalidator(app=app, consumer=consumer)
+    cache = MessageCache(max_size=10)
+    invalidator.subscribe(cache.invalidate)
+
+    cache.set(1, "a")
+    invalidator.publish([1])
+    dispatcher = app.events.default_dispatcher.return_value.__enter__.return_value
+    dispatcher.send.assert_called_once_with(INVALIDATE_EVENT, ids=[1])
+    assert cache.get(1) == (False, None)
+
+    # Invalidation published by another replica or a worker
+    [listener] = [call.args[0] for call in consumer.add_listener.call_args_list]
+    cache.set(2, "b")
+    listener({"type": "task-succeeded", "uuid": "t1"})
+    assert cache.get(2) == (True, "b")
+    listener({"type": INVALIDATE_EVENT, "ids": [2]})
+    assert cache.get(2) == (False, None)
+
+
+@pytest.mark.asyncio
+async def test_event_invalidator_publish_async_sends_off_the_event_loop():
+    """Test that publish_async applies ids locally and sends the event from another thread."""
+    app = MagicMock()
+    invalidator = CeleryEventInvalidator(app=app, consumer=MagicMock())
+    cache = MessageCache(max_size=10)
+    invalidator.subscribe(cache.invalidate)
+    send_threads = []
+    dispatcher = app.events.default_dispatcher.return_value.__enter__.return_value
+    dispatcher.send.side_effect = lambda *_args, **_kwargs: send_threads.append(
+        threading.current_thread()
+    )
+
+    cache.set(1, "a")
+    await invalidator.publish_async([1])
+
+    dispatcher.send.assert_called_once_with(INVALIDATE_EVENT, ids=[1])
+    assert send_threads != [threading.current_thread()]
+    assert cache.get(1) == (False, None)
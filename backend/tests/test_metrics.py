@@ -0,0 +1,124 @@
+"""Tests for the Prometheus metrics of the API and the workers."""
+import time
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.celery_app import PUBLISHED_AT_HEADER
+from app.db import TimedAsyncAdaptedQueuePool, async_engine_options
+from app.main import app
+from app.metrics import (
+    UNMATCHED_ROUTE,
+    on_task_failure,
+    on_task_postrun,
+    on_task_prerun,
+    on_task_retry,
+)
+
+client = TestClient(app)
+
+
+def sample(name, **labels):
+    """Current value of a sample in the default registry (0 if never recorded)."""
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_metrics_endpoint():
+    """Test that /metrics serves the text exposition format."""
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "http_request_duration_seconds" in response.text
+    assert "celery_task_runtime_seconds" in response.text
+
+
+def test_request_latency_by_route_template():
+    """Test that requests are labelled by route template, not by raw path."""
+    labels = {"method": "GET", "route": "/tasks/{task_id}", "status": "200"}
+    before = sample("http_request_duration_seconds_count", **labels)
+
+    client.get("/tasks/12345678-1234-5678-1234-567812345678")
+    client.get("/tasks/87654321-4321-8765-4321-876543218765")
+
+    assert sample("http_request_duration_seconds_count", **labels) == before + 2
+    assert sample(
+        "http_requests_in_progress", method="GET", route="/tasks/{task_id}"
+    ) == 0
+
+
+def test_unmatched_paths_share_a_label():
+    """Test that unknown paths do not create one label per path."""
+    labels = {"method": "GET", "route": UNMATCHED_ROUTE, "status": "404"}
+    before = sample("http_request_duration_seconds_count", **labels)
+
+    client.get("/no-such-page")
+    client.get("/another-missing-page")
+
+    assert sample("http_request_duration_seconds_count", **labels) == before + 2
+
+
+@pytest.mark.asyncio
+async def test_timed_pool_observes_acquisition(tmp_path):
+    """Test that each connection checkout records its wait time."""
+    url = f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}"
+    assert async_engine_options(url) == {"poolclass": TimedAsyncAdaptedQueuePool}
+    assert async_engine_options("sqlite+aiosqlite:///:memory:") == {}
+
+    engine = create_async_engine(url, **async_engine_options(url))
+    before = sample("db_connection_acquire_seconds_count")
+
+    async with engine.connect():
+        pass
+    await engine.dispose()
+
+    assert sample("db_connection_acquire_seconds_count") == before + 1
+
+
+def test_task_runtime_and_queue_wait():
+    """Test that prerun/postrun record runtime and time spent in the queue."""
+    task = SimpleNamespace(
+        name="tests.metrics_task",
+        request=SimpleNamespace(get={PUBLISHED_AT_HEADER: time.time() - 2}.get),
+    )
+
+    on_task_prerun(task_id="metrics-1", task=task)
+    on_task_postrun(task_id="metrics-1", task=task, state="SUCCESS")
+
+    assert sample(
+        "celery_task_runtime_seconds_count", task="tests.metrics_task", state="SUCCESS"
+    ) == 1
+    assert sample("celery_task_queue_wait_seconds_count", task="tests.metrics_task") == 1
+    assert sample("celery_task_queue_wait_seconds_sum", task="tests.metrics_task") >= 2
+
+
+def test_postrun_without_prerun_is_ignored():
+    """Test that a postrun with no recorded start does not observe anything."""
+    task = SimpleNamespace(name="tests.orphan_task")
+    on_task_postrun(task_id="metrics-orphan", task=task, state="SUCCESS")
+
+    assert sample(
+        "celery_task_runtime_seconds_count", task="tests.orphan_task", state="SUCCESS"
+    ) == 0
+
+
+@pytest.mark.parametrize("exception", [ValueError("bad"), TimeoutError()])
+def test_task_failures_by_exception(exception):
+    """Test that failures are counted per task and exception type."""
+    sender = SimpleNamespace(name="tests.failing_task")
+    labels = {"task": "tests.failing_task", "exception": type(exception).__name__}
+    before = sample("celery_task_failures_total", **labels)
+
+    on_task_failure(sender=sender, exception=exception)
+
+    assert sample("celery_task_failures_total", **labels) == before + 1
+
+
+def test_task_retries():
+    """Test that retries are counted per task."""
+    on_task_retry(sender=SimpleNamespace(name="tests.retried_task"))
+
+    assert sample("celery_task_retries_total", task="tests.retried_task") == 1
@@ -0,0 +1,274 @@
+"""Tests for range partitioning of the messages table."""
+from datetime import datetime, timedelta
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.db import Base
+from app.partitions import (
+    DEFAULT_PARTITION,
+    LEGACY_PARTITION,
+    Partition,
+    drop_partitions_before,
+    ensure_partitions,
+    is_partitioned,
+    list_partitions,
+    next_period,
+    partition_messages_table,
+    partition_name,
+    period_start,
+    prepare_messages_table,
+)
+from app.tasks import maintain_message_partitions
+
+
+class FakePostgresConnection:
+    """Records executed SQL and answers the catalog queries used by app.partitions."""
+
+    def __init__(self, bounds, default=False):
+        self.dialect = MagicMock()
+        self.dialect.name = "postgresql"
+        self.bounds = bounds
+        self.default = default
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        result = MagicMock()
+        if "partdefid" in sql:
+            result.scalar.return_value = self.default
+        elif "pg_partitioned_table" in sql:
+            result.scalar.return_value = True
+        elif "pg_inherits" in sql:
+            result.all.return_value = self.bounds
+        else:
+            self.statements.append(" ".join(sql.split()))
+        return result
+
+
+@pytest.mark.parametrize(
+    ("interval", "start", "following"),
+    [
+        ("day", datetime(2026, 10, 16), datetime(2026, 10, 17)),
+        ("week", datetime(2026, 10, 12), datetime(2026, 10, 19)),
+        ("month", datetime(2026, 10, 1), datetime(2026, 11, 1)),
+    ],
+)
+def test_periods(interval, start, following):
+    """Test period alignment and stepping for each interval."""
+    assert period_start(datetime(2026, 10, 16, 13, 45), interval) == start
+    assert next_period(start, interval) == following
+
+
+def test_next_month_rolls_over_year():
+    """Test that December is followed by January of the next year."""
+    assert next_period(datetime(2026, 12, 1), "month") == datetime(2027, 1, 1)
+
+
+def test_invalid_interval():
+    """Test that unknown intervals are rejected."""
+    with pytest.raises(ValueError, match="Invalid partition interval"):
+        period_start(datetime(2026, 1, 1), "year")
+
+
+def test_list_partitions_parses_bounds():
+    """Test that partition bounds are read from the catalog, skipping DEFAULT."""
+    connection = FakePostgresConnection(
+        [
+            ("messages_p20261101", "FOR VALUES FROM ('2026-11-01 00:00:00') TO ('2026-12-01 00:00:00')"),
+            ("messages_legacy", "FOR VALUES FROM (MINVALUE) TO ('2026-11-01 00:00:00')"),
+            ("messages_default", "DEFAULT"),
+        ]
+    )
+    assert list_partitions(connection) == [
+        Partition("messages_legacy", None, datetime(2026, 11, 1)),
+        Partition("messages_p20261101", datetime(2026, 11, 1), datetime(2026, 12, 1)),
+    ]
+
+
+def test_ensure_partitions_continues_after_newest():
+    """Test that missing partitions are created from the newest upper bound on."""
+    connection = FakePostgresConnection(
+        [("messages_legacy", "FOR VALUES FROM (MINVALUE) TO ('2026-11-01 00:00:00')")]
+    )
+
+    created = ensure_partitions(connection, "month", ahead=2, now=datetime(2026, 10, 16))
+
+    assert created == ["messages_p20261101", "messages_p20261201"]
+    assert connection.statements[0] == (
+        'CREATE TABLE IF NOT EXISTS "messages_p20261101" PARTITION OF messages '
+        "FOR VALUES FROM ('2026-11-01 00:00:00') TO ('2026-12-01 00:00:00')"
+    )
+
+
+def test_ensure_partitions_moves_rows_out_of_default():
+    """Test that with a default partition, its rows for the new range move to the new partition."""
+    connection = FakePostgresConnection(
+        [("messages_legacy", "FOR VALUES FROM (MINVALUE) TO ('2026-11-01 00:00:00')")],
+        default=True,
+    )
+
+    created = ensure_partitions(connection, "month", ahead=1, now=datetime(2026, 10, 16))
+
+    assert created == ["messages_p20261101"]
+    assert connection.statements == [
+        'CREATE TABLE "messages_p20261101" (LIKE messages INCLUDING DEFAULTS INCLUDING GENERATED)',
+        "WITH moved AS ( DELETE FROM messages_default "
+        "WHERE created_at >= '2026-11-01 00:00:00' AND created_at < '2026-12-01 00:00:00' "
+        "RETURNING id, content, created_at ) "
+        'INSERT INTO "messages_p20261101" (id, content, created_at) SELECT * FROM moved',
+        'ALTER TABLE messages ATTACH PARTITION "messages_p20261101" '
+        "FOR VALUES FROM ('2026-11-01 00:00:00') TO ('2026-12-01 00:00:00')",
+    ]
+
+
+def test_ensure_partitions_up_to_date():
+    """Test that nothing is created when enough future partitions exist."""
+    connection = FakePostgresConnection(
+        [("messages_p20261101", "FOR VALUES FROM ('2026-11-01 00:00:00') TO ('2027-01-01 00:00:00')")]
+    )
+    assert ensure_partitions(connection, "month", ahead=1, now=datetime(2026, 11, 5)) == []
+
+
+def test_drop_partitions_before():
+    """Test that only partitions entirely older than the cutoff are detached and dropped."""
+    connection = FakePostgresConnection(
+        [
+            ("messages_legacy", "FOR VALUES FROM (MINVALUE) TO ('2026-09-01 00:00:00')"),
+            ("messages_p20260901", "FOR VALUES FROM ('2026-09-01 00:00:00') TO ('2026-10-01 00:00:00')"),
+            ("messages_p20261001", "FOR VALUES FROM ('2026-10-01 00:00:00') TO ('2026-11-01 00:00:00')"),
+        ]
+    )
+
+    dropped = drop_partitions_before(connection, datetime(2026, 10, 1))
+
+    assert dropped == ["messages_legacy", "messages_p20260901"]
+    assert connection.statements == [
+        'ALTER TABLE messages DETACH PARTITION "messages_legacy"',
+        'DROP TABLE "messages_legacy"',
+        'ALTER TABLE messages DETACH PARTITION "messages_p20260901"',
+        'DROP TABLE "messages_p20260901"',
+    ]
+
+
+def test_partition_name():
+    """Test partition naming by start date."""
+    assert partition_name(datetime(2026, 11, 1)) == "messages_p20261101"
+
+
+def test_not_partitioned_is_noop(test_db_engine):
+    """Test that every operation is a no-op on databases without partitioning."""
+    with test_db_engine.begin() as connection:
+        assert not is_partitioned(connection)
+        assert ensure_partitions(connection, "month", 3, datetime(2026, 10, 16)) == []
+        assert drop_partitions_before(connection, datetime(2026, 10, 16)) == []
+
+
+def test_maintain_message_partitions_task():
+    """Test that the beat task creates upcoming partitions and applies retention."""
+    with (
+        patch("app.tasks.ensure_partitions", return_value=["messages_p20261101"]) as ensure,
+        patch("app.tasks.drop_partitions_before", return_value=["messages_legacy"]) as drop,
+        patch("app.tasks.sync_engine"),
+        patch("app.tasks.settings") as settings,
+    ):
+        settings.MESSAGE_PARTITION_INTERVAL = "month"
+        settings.MESSAGE_PARTITIONS_AHEAD = 3
+        settings.MESSAGE_RETENTION_DAYS = 30
+
+        result = maintain_message_partitions()
+
+    assert result == {"created": ["messages_p20261101"], "dropped": ["messages_legacy"]}
+    assert ensure.call_args.args[1:3] == ("month", 3)
+    now = ensure.call_args.args[3]
+    assert (now - drop.call_args.args[1]).days == 30
+
+
+def test_maintain_message_partitions_without_retention():
+    """Test that nothing is dropped when no retention is configured."""
+    with (
+        patch("app.tasks.ensure_partitions", return_value=[]),
+        patch("app.tasks.drop_partitions_before") as drop,
+        patch("app.tasks.sync_engine"),
+        patch("app.tasks.settings") as settings,
+    ):
+        settings.MESSAGE_RETENTION_DAYS = None
+        assert maintain_message_partitions() == {"created": [], "dropped": []}
+    drop.assert_not_called()
+
+
+@pytest.fixture
+def postgres_connection():
+    """A PostgreSQL connection in a scratch schema, rolled back afterwards."""
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        connection.execute(text("CREATE SCHEMA partition_test"))
+        connection.execute(text("SET LOCAL search_path TO partition_test"))
+        Base.metadata.create_all(connection)
+        yield connection
+        transaction.rollback()
+    engine.dispose()
+
+
+@pytest.mark.postgresql
+def test_partition_populated_messages_table(postgres_connection):
+    """Test that an existing table with rows becomes the legacy partition, keeping its rows."""
+    connection = postgres_connection
+    now = datetime(2026, 10, 16, 12)
+    boundary = next_period(period_start(now, "month"), "month")
+    connection.execute(
+        text("INSERT INTO messages (content, created_at) VALUES (:content, :created_at)"),
+        [{"content": f"Old {i}", "created_at": now - timedelta(days=i * 20)} for i in range(5)],
+    )
+
+    # Re-running the preparation after a partial failure is harmless
+    prepare_messages_table(connection, boundary)
+    prepare_messages_table(connection, boundary)
+    partition_messages_table(connection, boundary)
+    # Lands in the default partition until a partition covers it
+    late = next_period(next_period(boundary, "month"), "month") + timedelta(days=1)
+    connection.execute(
+        text("INSERT INTO messages (content, created_at) VALUES ('Late', :created_at)"),
+        {"created_at": late},
+    )
+    created = ensure_partitions(connection, "month", ahead=1, now=now)
+
+    assert is_partitioned(connection)
+    assert created == [partition_name(boundary)]
+    assert list_partitions(connection)[0].name == LEGACY_PARTITION
+    assert connection.execute(text("SELECT count(*) FROM messages")).scalar() == 6
+    assert connection.execute(
+        text("SELECT tableoid::regclass::text FROM messages WHERE content = 'Late'")
+    ).scalar() == DEFAULT_PARTITION
+
+    # Creating the partition for the late row moves it out of the default partition
+    ensure_partitions(connection, "month", ahead=1, now=late)
+    assert connection.execute(
+        text("SELECT tableoid::regclass::text FROM messages WHERE content = 'Late'")
+    ).scalar() == partition_name(period_start(late, "month"))
+    primary_keys = connection.execute(
+        text(
+            "SELECT conrelid::regclass::text, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE contype = 'p' AND conrelid IN ('messages'::regclass, CAST(:legacy AS regclass))"
+        ),
+        {"legacy": LEGACY_PARTITION},
+    ).all()
+    assert sorted(primary_keys) == [
+        ("messages", "PRIMARY KEY (id, created_at)"),
+        (LEGACY_PARTITION, "PRIMARY KEY (id, created_at)"),
+    ]
+
+    partition = connection.execute(
+        text(
+            "INSERT INTO messages (content, created_at) VALUES ('New', :created_at) "
+            "RETURNING tableoid::regclass::text"
+        ),
+        {"created_at": boundary + timedelta(days=1)},
+    ).scalar()
+    assert partition == partition_name(boundary)
@@ -0,0 +1,85 @@
+"""Tests for the non-blocking task publisher."""
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from celery.backends.rpc import RPCBackend
+import pytest
+
+from app.celery_app import celery_app
+from app.publisher import TaskPublisher, require_shared_result_backend
+from app.tasks import create_message_task, slow_task
+
+
+pytestmark = [pytest.mark.celery]
+
+
+async def test_delay_publishes_off_the_event_loop():
+    """Test that publishing runs on a publisher thread, not the calling thread."""
+    publisher = TaskPublisher(pool_size=2)
+    task = MagicMock()
+    threads = []
+    task.apply_async.side_effect = lambda **kwargs: threads.append(threading.current_thread())
+
+    await publisher.delay(task, "hello", priority=1)
+
+    task.apply_async.assert_called_once_with(args=("hello",), kwargs={"priority": 1})
+    assert threads[0] is not threading.current_thread()
+    assert threads[0].name.startswith("task-publisher")
+    publisher.shutdown()
+
+
+async def test_apply_async_returns_result():
+    """Test publishing a real task to the in-memory broker."""
+    publisher = TaskPublisher(pool_size=1)
+
+    result = await publisher.apply_async(slow_task, args=[0])
+
+    assert result.id
+    publisher.shutdown()
+
+
+async def test_apply_signature_group():
+    """Test publishing a canvas returns its group result."""
+    from celery import group
+
+    publisher = TaskPublisher(pool_size=1)
+
+    group_result = await publisher.apply_signature(
+        group(create_message_task.s(f"m{i}") for i in range(3))
+    )
+
+    assert len(group_result.results) == 3
+    publisher.shutdown()
+
+
+async def test_warm_up_acquires_and_releases_producers():
+    """Test that warm-up connects pool_size producers and returns them to the pool."""
+    app = MagicMock()
+    publisher = TaskPublisher(app=app, pool_size=3)
+
+    assert await publisher.warm_up() == 3
+
+    assert app.producer_pool.acquire.call_count == 3
+    producer = app.producer_pool.acquire.return_value
+    assert producer.release.call_count == 3
+    publisher.shutdown()
+
+
+async def test_warm_up_tolerates_broker_errors():
+    """Test that an unreachable broker does not prevent startup."""
+    app = MagicMock()
+    app.producer_pool.acquire.return_value.connection.ensure_connection.side_effect = OSError()
+    publisher = TaskPublisher(app=app, pool_size=3)
+
+    assert await publisher.warm_up() == 1
+    app.producer_pool.acquire.return_value.release.assert_called_once()
+    publisher.shutdown()
+
+
+def test_require_shared_result_backend():
+    """Test that rpc://, whose results only reach the publishing thread, is refused."""
+    require_shared_result_backend(celery_app)
+
+    with pytest.raises(RuntimeError, match="rpc://"):
+        require_shared_result_backend(SimpleNamespace(backend=RPCBackend(celery_app)))
@@ -0,0 +1,111 @@
+"""Tests for the SQL-backed Celery result backend."""
+from datetime import timedelta
+import pickle
+
+from celery import Celery
+from celery.app.backends import by_url
+import pytest
+
+from app.helpers import utc_now_naive
+from app.models import TaskResult
+from app.result_backend import SQLResultBackend
+
+
+pytestmark = [pytest.mark.integration, pytest.mark.celery]
+
+TASK_ID = "12345678-1234-5678-1234-567812345678"
+
+
+@pytest.fixture
+def backend(test_db_engine, test_db_session):
+    """SQLResultBackend bound to the SQLite test engine, with a 1 hour TTL."""
+    app = Celery("test-results", broker="memory://")
+    return SQLResultBackend(app=app, engine=test_db_engine, expires=3600)
+
+
+def test_store_and_read_result(backend):
+    """Test that a stored result is readable by task id."""
+    backend.store_result(TASK_ID, {"id": 1}, "SUCCESS")
+
+    meta = backend.get_task_meta(TASK_ID)
+    assert meta["status"] == "SUCCESS"
+    assert meta["result"] == {"id": 1}
+
+
+def test_result_visible_to_other_backend_instances(backend, test_db_engine):
+    """Test that another process/replica with its own backend sees the result."""
+    backend.store_result(TASK_ID, {"id": 1}, "SUCCESS")
+
+    other = SQLResultBackend(app=backend.app, engine=test_db_engine)
+    assert other.get_task_meta(TASK_ID)["status"] == "SUCCESS"
+
+
+def test_unknown_task_is_pending(backend):
+    """Test that a task without a stored result is PENDING."""
+    assert backend.get_task_meta(TASK_ID)["status"] == "PENDING"
+
+
+def test_store_overwrites_previous_state(backend, test_db_session):
+    """Test that each task keeps a single, compact row."""
+    backend.store_result(TASK_ID, None, "STARTED")
+    backend.store_result(TASK_ID, {"id": 1}, "SUCCESS")
+
+    rows = test_db_session.query(TaskResult).all()
+    assert len(rows) == 1
+    assert rows[0].key == f"task:{TASK_ID}"
+    assert backend.get_task_meta(TASK_ID)["status"] == "SUCCESS"
+
+
+def test_failure_result_round_trip(backend):
+    """Test that exceptions are stored and restored."""
+    backend.mark_as_failure(TASK_ID, ValueError("boom"))
+
+    meta = backend.get_task_meta(TASK_ID)
+    assert meta["status"] == "FAILURE"
+    assert isinstance(meta["result"], Exception)
+    assert "boom" in str(meta["result"])
+
+
+def test_mget(backend):
+    """Test that many results are read in one query."""
+    other_id = "22222222-2222-2222-2222-222222222222"
+    backend.store_result(TASK_ID, {"id": 1}, "SUCCESS")
+    backend.store_result(other_id, {"id": 2}, "SUCCESS")
+
+    values = backend.mget([backend.get_key_for_task(TASK_ID), backend.get_key_for_task(other_id)])
+    assert set(values) == {f"task:{TASK_ID}", f"task:{other_id}"}
+
+
+def test_expired_results_are_hidden_and_cleaned_up(backend, test_db_session):
+    """Test that expired rows are never returned and are removed by cleanup()."""
+    backend.store_result(TASK_ID, {"id": 1}, "SUCCESS")
+    test_db_session.query(TaskResult).update(
+        {TaskResult.expires_at: utc_now_naive() - timedelta(seconds=1)}
+    )
+    test_db_session.commit()
+
+    assert backend.get_task_meta(TASK_ID, cache=False)["status"] == "PENDING"
+    assert backend.mget([backend.get_key_for_task(TASK_ID)]) == {}
+
+    assert backend.cleanup() == 1
+    assert test_db_session.query(TaskResult).count() == 0
+
+
+def test_cleanup_keeps_live_results(backend, test_db_session):
+    """Test that cleanup() only deletes expired rows."""
+    backend.store_result(TASK_ID, {"id": 1}, "SUCCESS")
+
+    assert backend.cleanup() == 0
+    assert test_db_session.query(TaskResult).count() == 1
+
+
+def test_backend_by_name():
+    """Test that Celery resolves the backend from its configured name."""
+    backend_cls, _ = by_url("app.result_backend:SQLResultBackend")
+    assert backend_cls is SQLResultBackend
+
+
+def test_backend_is_picklable(backend):
+    """Test that the backend survives pickling (used by prefork workers)."""
+    clone = pickle.loads(pickle.dumps(backend))
+    assert clone.expires == 3600
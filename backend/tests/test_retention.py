@@ -0,0 +1,130 @@
+"""Tests for the chunked purge of expired messages."""
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import select
+
+from app.models import JobCheckpoint, Message
+from app.retention import JOB_NAME, PurgeResult, load_checkpoint, purge_messages_before
+from app.tasks import purge_expired_messages
+
+NOW = datetime(2026, 10, 16, 12, 0)
+CUTOFF = NOW - timedelta(days=30)
+
+
+def _seed(session, old: int, new: int) -> list[int]:
+    """Insert ``old`` expired messages followed by ``new`` recent ones, returning all ids."""
+    messages = [
+        Message(content=f"old {i}", created_at=CUTOFF - timedelta(days=1)) for i in range(old)
+    ] + [Message(content=f"new {i}", created_at=NOW) for i in range(new)]
+    session.add_all(messages)
+    session.commit()
+    return [message.id for message in messages]
+
+
+def _remaining(session) -> list[str]:
+    return list(session.scalars(select(Message.content).order_by(Message.id)))
+
+
+def test_purge_deletes_expired_rows_in_chunks(test_db_engine, test_db_session):
+    """Test that expired rows are deleted chunk by chunk and recent rows are kept."""
+    ids = _seed(test_db_session, old=7, new=3)
+    deleted = []
+
+    with patch("app.retention.time.sleep") as sleep:
+        result = purge_messages_before(
+            test_db_engine, CUTOFF, chunk_size=3, pause=0.5, on_delete=deleted.extend
+        )
+
+    assert result.deleted == 7
+    assert result.done is True
+    # Chunks cover ids [1-3], [4-6], [7-9]; the last one reaches the recent rows
+    assert result.chunks == 3
+    assert sorted(deleted) == ids[:7]
+    assert sleep.call_count == 2
+    sleep.assert_called_with(0.5)
+    assert _remaining(test_db_session) == ["new 0", "new 1", "new 2"]
+
+    checkpoint = test_db_session.get(JobCheckpoint, JOB_NAME)
+    assert checkpoint.position == ids[6]
+    assert checkpoint.processed == 7
+    assert checkpoint.rows_per_second > 0
+
+
+def test_purge_resumes_from_checkpoint(test_db_engine, test_db_session):
+    """Test that an interrupted run resumes after the last committed chunk."""
+    _seed(test_db_session, old=4, new=1)
+
+    budget_spent = purge_messages_before(test_db_engine, CUTOFF, chunk_size=2, max_seconds=0)
+    assert (budget_spent.chunks, budget_spent.done) == (0, False)
+
+    def crash(ids):
+        raise RuntimeError("worker lost")
+
+    with pytest.raises(RuntimeError):
+        purge_messages_before(test_db_engine, CUTOFF, chunk_size=2, on_delete=crash)
+
+    with test_db_engine.connect() as connection:
+        position = load_checkpoint(connection)
+    assert _remaining(test_db_session) == ["old 2", "old 3", "new 0"]
+
+    with patch("app.retention.time.sleep"):
+        rest = purge_messages_before(test_db_engine, CUTOFF, chunk_size=2)
+
+    assert rest.deleted == 2
+    assert rest.done is True
+    assert rest.position == position + 2
+    assert _remaining(test_db_session) == ["new 0"]
+    assert test_db_session.get(JobCheckpoint, JOB_NAME).processed == 4
+
+
+def test_purge_with_nothing_expired(test_db_engine, test_db_session):
+    """Test that a table with only recent rows stops after one chunk."""
+    _seed(test_db_session, old=0, new=3)
+
+    result = purge_messages_before(test_db_engine, CUTOFF, chunk_size=100)
+
+    assert (result.deleted, result.chunks, result.done) == (0, 1, True)
+    assert len(_remaining(test_db_session)) == 3
+
+
+def test_purge_expired_messages_task():
+    """Test that the beat task applies the configured retention and chunking."""
+    with (
+        patch("app.tasks.purge_messages_before") as purge,
+        patch("app.tasks.settings") as settings,
+    ):
+        purge.return_value = PurgeResult(
+            deleted=10, chunks=2, seconds=1.0, rows_per_second=10.0, position=42
+        )
+        settings.MESSAGE_RETENTION_DAYS = 30
+        settings.MESSAGE_PURGE_CHUNK_SIZE = 5000
+        settings.MESSAGE_PURGE_PAUSE_MS = 250
+        settings.MESSAGE_PURGE_MAX_SECONDS = 60
+        result = purge_expired_messages()
+
+    assert result == {
+        "deleted": 10,
+        "chunks": 2,
+        "seconds": 1.0,
+        "rows_per_second": 10.0,
+        "position": 42,
+        "done": True,
+    }
+    kwargs = purge.call_args.kwargs
+    assert (kwargs["chunk_size"], kwargs["pause"], kwargs["max_seconds"]) == (5000, 0.25, 60)
+
+
+def test_purge_expired_messages_without_retention():
+    """Test that nothing is purged when no retention is configured."""
+    with (
+        patch("app.tasks.purge_messages_before") as purge,
+        patch("app.tasks.settings") as settings,
+    ):
+        settings.MESSAGE_RETENTION_DAYS = None
+        result = purge_expired_messages()
+
+    purge.assert_not_called()
+    assert result["deleted"] == 0
+    assert result["done"] is True
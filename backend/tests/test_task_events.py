@@ -0,0 +1,185 @@
+"""Tests for task event fan-out and the SSE endpoint."""
+import asyncio
+import json
+import threading
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from httpx import ASGITransport, AsyncClient
+import pytest
+
+from app.main import app
+from app.schemas import TaskStatusResponse
+from app.task_events import TaskEventBroadcaster, event_payload, task_event_broadcaster
+from app.task_registry import task_registry
+
+
+TASK_ID = "12345678-1234-5678-1234-567812345678"
+
+
+def _parse_sse(text):
+    events = []
+    for frame in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines() if not line.startswith(":"))
+        if lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def registry():
+    """Provide an empty shared task registry and clear it afterwards."""
+    task_registry.clear()
+    yield task_registry
+    task_registry.clear()
+
+
+def test_event_payload_states():
+    """Test that Celery events are converted to client payloads."""
+    assert event_payload({"type": "task-started", "uuid": "t1", "pid": 1}) == {
+        "task_id": "t1",
+        "status": "STARTED",
+    }
+    assert event_payload({"type": "task-succeeded", "uuid": "t1", "result": "{'id': 1}"}) == {
+        "task_id": "t1",
+        "status": "SUCCESS",
+        "result": "{'id': 1}",
+    }
+    failed = event_payload({"type": "task-failed", "uuid": "t1", "exception": "ValueError()"})
+    assert failed["error"] == "ValueError()"
+    assert event_payload({"type": "worker-heartbeat"}) is None
+
+
+def test_event_payload_progress():
+    """Test that custom progress fields are passed through."""
+    payload = event_payload(
+        {"type": "task-progress", "uuid": "t1", "hostname": "w1", "current": 3, "total": 10}
+    )
+    assert payload == {
+        "task_id": "t1",
+        "status": "PROGRESS",
+        "progress": {"current": 3, "total": 10},
+    }
+
+
+async def test_broadcaster_delivers_from_other_threads():
+    """Test that events published from a thread reach every subscriber of the task."""
+    broadcaster = TaskEventBroadcaster()
+    first = broadcaster.subscribe("t1")
+    second = broadcaster.subscribe("t1")
+    other = broadcaster.subscribe("t2")
+
+    thread = threading.Thread(
+        target=broadcaster.publish, args=({"type": "task-started", "uuid": "t1"},)
+    )
+    thread.start()
+    thread.join()
+
+    assert (await asyncio.wait_for(first.get(), 1))["status"] == "STARTED"
+    assert (await asyncio.wait_for(second.get(), 1))["status"] == "STARTED"
+    assert other.empty()
+
+    broadcaster.unsubscribe("t1", first)
+    broadcaster.unsubscribe("t1", second)
+    assert broadcaster.subscriber_count("t1") == 0
+    assert broadcaster.subscriber_count() == 1
+
+
+async def test_broadcaster_drops_oldest_when_full():
+    """Test that a slow subscriber keeps only the newest events."""
+    broadcaster = TaskEventBroadcaster(max_queue_size=1)
+    queue = broadcaster.subscribe("t1")
+
+    broadcaster.publish({"type": "task-received", "uuid": "t1"})
+    broadcaster.publish({"type": "task-started", "uuid": "t1"})
+    await asyncio.sleep(0)
+
+    assert queue.qsize() == 1
+    assert queue.get_nowait()["status"] == "STARTED"
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_stream_task_events_finished_task(registry):
+    """Test that a finished task sends its final state and closes the stream."""
+    registry.handle_event({"type": "task-succeeded", "uuid": TASK_ID})
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get(f"/tasks/{TASK_ID}/events")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert _parse_sse(response.text) == [("SUCCESS", {"task_id": TASK_ID, "status": "SUCCESS"})]
+    assert task_event_broadcaster.subscriber_count(TASK_ID) == 0
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_stream_task_events_live_transitions(registry):
+    """Test that transitions published after subscribing are streamed until completion."""
+    registry.handle_event({"type": "task-received", "uuid": TASK_ID})
+
+    async def publish_when_subscribed():
+        while task_event_broadcaster.subscriber_count(TASK_ID) == 0:
+            await asyncio.sleep(0.01)
+        for event in (
+            {"type": "task-started", "uuid": TASK_ID},
+            {"type": "task-progress", "uuid": TASK_ID, "current": 1, "total": 2},
+            {"type": "task-succeeded", "uuid": TASK_ID, "result": "{'id': 1}"},
+        ):
+            await asyncio.to_thread(task_event_broadcaster.publish, event)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        publisher = asyncio.create_task(publish_when_subscribed())
+        response = await client.get(f"/tasks/{TASK_ID}/events")
+        await publisher
+
+    statuses = [name for name, _ in _parse_sse(response.text)]
+    assert statuses == ["RESERVED", "STARTED", "PROGRESS", "SUCCESS"]
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_stream_task_events_unknown_task_uses_result_backend(registry):
+    """Test that tasks unknown to the registry are resolved from the result backend."""
+    with patch("app.main._fetch_task_statuses") as mock_fetch:
+        mock_fetch.return_value = {
+            TASK_ID: TaskStatusResponse(task_id=TASK_ID, status="FAILURE", result={"error": "boom"})
+        }
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get(f"/tasks/{TASK_ID}/events")
+
+    [(name, data)] = _parse_sse(response.text)
+    assert name == "FAILURE"
+    assert data["result"] == {"error": "boom"}
+
+
+def test_stream_task_events_invalid_uuid():
+    """Test that invalid task IDs return 404."""
+    response = TestClient(app).get("/tasks/not-a-uuid/events")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_stream_task_events_running_task_starts_as_started(registry):
+    """Test that the first frame uses Celery's STARTED for a task the registry has as ACTIVE."""
+    registry.handle_event({"type": "task-started", "uuid": TASK_ID})
+
+    async def finish_when_subscribed():
+        while task_event_broadcaster.subscriber_count(TASK_ID) == 0:
+            await asyncio.sleep(0.01)
+        await asyncio.to_thread(
+            task_event_broadcaster.publish, {"type": "task-succeeded", "uuid": TASK_ID}
+        )
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        publisher = asyncio.create_task(finish_when_subscribed())
+        response = await client.get(f"/tasks/{TASK_ID}/events")
+        await publisher
+
+    assert [name for name, _ in _parse_sse(response.text)] == ["STARTED", "SUCCESS"]
+
+
+def test_stream_task_events_disabled():
+    """Test that the stream is refused when no task events would ever arrive."""
+    with patch("app.main.settings.TASK_EVENTS_ENABLED", False):
+        response = TestClient(app).get(f"/tasks/{TASK_ID}/events")
+
+    assert response.status_code == 409
@@ -0,0 +1,221 @@
+"""Tests for persistent task lifecycle records."""
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from celery.signals import before_task_publish, task_failure, task_postrun, task_prerun
+from fastapi.testclient import TestClient
+import pytest
+
+from app.crud import list_task_records
+from app.main import app
+from app.models import TaskRecord
+from app.tasks import slow_task
+from app.task_records import (
+    TaskRecordWriter,
+    connect_signals,
+    merge_transitions,
+    on_before_task_publish,
+    on_task_failure,
+    on_task_postrun,
+    on_task_prerun,
+)
+
+
+client = TestClient(app)
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _transition(task_id, state, created_at=T0, **fields):
+    row = {
+        "task_id": task_id,
+        "state": state,
+        "name": None,
+        "error": None,
+        "created_at": created_at,
+        "started_at": None,
+        "finished_at": None,
+        "updated_at": created_at,
+    }
+    row.update(fields)
+    return row
+
+
+def test_merge_transitions_collapses_per_task():
+    """Test that transitions of one task collapse into a single row."""
+    rows = merge_transitions([
+        _transition("t1", "PENDING", name="app.tasks.slow_task"),
+        _transition("t1", "STARTED", created_at=T0 + timedelta(seconds=1), started_at=T0),
+        _transition("t2", "PENDING"),
+        _transition("t1", "SUCCESS", created_at=T0 + timedelta(seconds=2), finished_at=T0),
+    ])
+
+    assert len(rows) == 2
+    t1 = rows[0]
+    assert t1["state"] == "SUCCESS"
+    assert t1["name"] == "app.tasks.slow_task"
+    assert t1["created_at"] == T0
+    assert t1["started_at"] == T0
+    assert t1["finished_at"] == T0
+
+
+def test_merge_transitions_pending_never_overrides():
+    """Test that a late PENDING transition keeps the worker's state."""
+    rows = merge_transitions([
+        _transition("t1", "STARTED", created_at=T0 + timedelta(seconds=1)),
+        _transition("t1", "PENDING", created_at=T0),
+    ])
+    assert rows[0]["state"] == "STARTED"
+    assert rows[0]["created_at"] == T0
+
+
+@pytest.mark.integration
+def test_writer_flush_upserts_across_batches(test_db_engine, test_db_session):
+    """Test that separate flushes merge into one record per task."""
+    writer = TaskRecordWriter(engine=test_db_engine)
+
+    with patch.object(writer, "_ensure_started"):
+        writer.record("t1", "STARTED", name="app.tasks.slow_task", started_at=T0)
+        writer.record("t1", "SUCCESS", finished_at=T0)
+        assert writer.flush() == 2
+
+        # The publisher's PENDING transition arrives after the worker's
+        writer.record("t1", "PENDING", name="app.tasks.slow_task", created_at=T0 - timedelta(seconds=5))
+        writer.record("t2", "PENDING", name="app.tasks.create_message_task")
+        writer.flush()
+
+    records = {r.task_id: r for r in test_db_session.query(TaskRecord).all()}
+    assert records["t1"].state == "SUCCESS"
+    assert records["t1"].created_at == T0 - timedelta(seconds=5)
+    assert records["t1"].started_at == T0
+    assert records["t2"].state == "PENDING"
+
+
+@pytest.mark.integration
+def test_writer_failure_is_logged_not_raised():
+    """Test that a database error never propagates to the caller."""
+    engine = MagicMock()
+    engine.begin.side_effect = Exception("Database down")
+    writer = TaskRecordWriter(engine=engine)
+
+    with patch.object(writer, "_ensure_started"):
+        writer.record("t1", "PENDING")
+        assert writer.flush() == 1
+
+
+def test_signal_handlers_record_transitions():
+    """Test that Celery signal handlers hand transitions to the writer."""
+    task = MagicMock()
+    task.name = "app.tasks.slow_task"
+
+    with patch("app.task_records.task_record_writer") as writer:
+        on_before_task_publish(sender="app.tasks.slow_task", headers={"id": "t1", "task": "app.tasks.slow_task"})
+        on_task_prerun(task_id="t1", task=task)
+        on_task_failure(task_id="t1", exception=ValueError("boom"), sender=task)
+        on_task_postrun(task_id="t1", task=task, state="FAILURE")
+
+    states = [call.args[1] for call in writer.record.call_args_list]
+    assert states == ["PENDING", "STARTED", "FAILURE", "FAILURE"]
+    assert "boom" in writer.record.call_args_list[2].kwargs["error"]
+
+
+@pytest.fixture
+def task_records_enabled():
+    """Connect the signal handlers as ``TASK_RECORDS_ENABLED`` does (off in conftest)."""
+    with patch("app.task_records.task_record_writer") as writer:
+        connect_signals()
+        yield writer
+        for signal, handler in (
+            (before_task_publish, on_before_task_publish),
+            (task_prerun, on_task_prerun),
+            (task_postrun, on_task_postrun),
+            (task_failure, on_task_failure),
+        ):
+            signal.disconnect(handler)
+
+
+def test_enabled_writer_records_executed_tasks(task_records_enabled):
+    """Test that, once enabled, executed tasks reach the writer through the signals."""
+    slow_task.apply(args=(0,), task_id="t-enabled")
+
+    calls = task_records_enabled.record.call_args_list
+    assert [(call.args[0], call.args[1]) for call in calls] == [
+        ("t-enabled", "STARTED"),
+        ("t-enabled", "SUCCESS"),
+    ]
+
+
+def test_before_task_publish_without_id_is_ignored():
+    """Test that publishes without a task id are not recorded."""
+    with patch("app.task_records.task_record_writer") as writer:
+        on_before_task_publish(sender="x", headers={})
+    writer.record.assert_not_called()
+
+
+async def test_list_task_records_filters_and_keyset(async_test_db_session):
+    """Test filtering by state/name/time and paging newest first."""
+    for i in range(5):
+        async_test_db_session.add(TaskRecord(
+            task_id=f"t{i}",
+            name="app.tasks.slow_task" if i % 2 else "app.tasks.create_message_task",
+            state="SUCCESS" if i < 3 else "FAILURE",
+            created_at=T0 + timedelta(minutes=i),
+            updated_at=T0 + timedelta(minutes=i),
+        ))
+    await async_test_db_session.commit()
+
+    records = await list_task_records(async_test_db_session, limit=2)
+    assert [r.task_id for r in records] == ["t4", "t3"]
+
+    last = records[-1]
+    records = await list_task_records(
+        async_test_db_session, before=(last.created_at, last.task_id), limit=2
+    )
+    assert [r.task_id for r in records] == ["t2", "t1"]
+
+    records = await list_task_records(async_test_db_session, states=["FAILURE"])
+    assert [r.task_id for r in records] == ["t4", "t3"]
+
+    records = await list_task_records(async_test_db_session, name="app.tasks.slow_task")
+    assert [r.task_id for r in records] == ["t3", "t1"]
+
+    records = await list_task_records(
+        async_test_db_session, since=T0 + timedelta(minutes=1), until=T0 + timedelta(minutes=3)
+    )
+    assert [r.task_id for r in records] == ["t2", "t1"]
+
+
+def test_task_history_endpoint_pagination():
+    """Test GET /tasks/history returns a next_cursor when more records exist."""
+    records = [
+        TaskRecord(task_id=f"t{i}", name="n", state="SUCCESS", created_at=T0, updated_at=T0)
+        for i in (3, 2, 1)
+    ]
+
+    with patch("app.main.list_task_records", new_callable=AsyncMock) as mock_list:
+        mock_list.return_value = records
+        response = client.get("/tasks/history?limit=2&state=success")
+        assert response.status_code == 200
+        data = response.json()
+        assert [item["task_id"] for item in data["items"]] == ["t3", "t2"]
+        assert mock_list.call_args.kwargs["states"] == ["SUCCESS"]
+
+        mock_list.return_value = records[2:]
+        response = client.get("/tasks/history", params={"limit": 2, "cursor": data["next_cursor"]})
+        assert response.json()["next_cursor"] is None
+        assert mock_list.call_args.kwargs["before"] == (T0, "t2")
+
+
+def test_task_history_endpoint_timezone_aware_range():
+    """Test that aware since/until values are normalized to naive UTC."""
+    with patch("app.main.list_task_records", new_callable=AsyncMock) as mock_list:
+        mock_list.return_value = []
+        response = client.get("/tasks/history", params={"since": "2026-01-01T14:00:00+02:00"})
+        assert response.status_code == 200
+        assert mock_list.call_args.kwargs["since"] == T0
+
+
+def test_task_history_endpoint_invalid_cursor():
+    """Test that a malformed cursor is rejected."""
+    response = client.get("/tasks/history?cursor=garbage")
+    assert response.status_code == 400
@@ -0,0 +1,128 @@
+"""Tests for the event-driven task registry."""
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.task_registry import TaskEventsConsumer, TaskRegistry
+
+
+pytestmark = [pytest.mark.unit]
+
+
+def test_handle_event_tracks_lifecycle():
+    """Test that a task moves through the states reported by its events."""
+    registry = TaskRegistry()
+
+    registry.handle_event({"type": "task-sent", "uuid": "t1", "name": "app.tasks.slow_task"})
+    assert registry.get("t1").state == "PENDING"
+
+    registry.handle_event({"type": "task-received", "uuid": "t1"})
+    assert registry.get("t1").state == "RESERVED"
+
+    registry.handle_event({"type": "task-started", "uuid": "t1"})
+    assert registry.get("t1").state == "ACTIVE"
+
+    registry.handle_event({"type": "task-succeeded", "uuid": "t1"})
+    entry = registry.get("t1")
+    assert entry.state == "SUCCESS"
+    assert entry.name == "app.tasks.slow_task"
+
+
+def test_handle_event_ignores_non_task_events():
+    """Test that worker events are ignored."""
+    registry = TaskRegistry()
+    registry.handle_event({"type": "worker-heartbeat", "hostname": "worker1"})
+    assert len(registry) == 0
+
+
+def test_finished_state_is_final():
+    """Test that late events never move a finished task back in flight."""
+    registry = TaskRegistry()
+    registry.handle_event({"type": "task-succeeded", "uuid": "t1"})
+    registry.handle_event({"type": "task-started", "uuid": "t1"})
+    assert registry.get("t1").state == "SUCCESS"
+
+
+def test_late_sent_event_does_not_override_worker_state():
+    """Test that a task-sent arriving after task-received is ignored."""
+    registry = TaskRegistry()
+    registry.handle_event({"type": "task-received", "uuid": "t1"})
+    registry.handle_event({"type": "task-sent", "uuid": "t1"})
+    assert registry.get("t1").state == "RESERVED"
+
+
+def test_retry_goes_back_in_flight():
+    """Test that a retried task can be received and started again."""
+    registry = TaskRegistry()
+    registry.handle_event({"type": "task-started", "uuid": "t1"})
+    registry.handle_event({"type": "task-retried", "uuid": "t1"})
+    registry.handle_event({"type": "task-received", "uuid": "t1"})
+    assert registry.get("t1").state == "RESERVED"
+
+
+def test_list_tasks_uses_indexes():
+    """Test filtering by state and by name."""
+    registry = TaskRegistry()
+    registry.update("a", "ACTIVE", name="slow")
+    registry.update("b", "RESERVED", name="slow")
+    registry.update("c", "ACTIVE", name="create")
+
+    assert {e.task_id for e in registry.list_tasks(states={"ACTIVE"})} == {"a", "c"}
+    assert {e.task_id for e in registry.list_tasks(name="slow")} == {"a", "b"}
+    assert [e.task_id for e in registry.list_tasks(states={"ACTIVE"}, name="slow")] == ["a"]
+
+    registry.update("a", "SUCCESS")
+    assert {e.task_id for e in registry.list_tasks(states={"ACTIVE"})} == {"c"}
+
+
+def test_registry_is_bounded():
+    """Test that the oldest finished tasks are evicted first past max_tasks."""
+    registry = TaskRegistry(max_tasks=2)
+    registry.update("a", "SUCCESS", name="slow")
+    registry.update("b", "ACTIVE")
+    registry.update("c", "FAILURE")
+    registry.update("d", "ACTIVE")
+
+    assert len(registry) == 2
+    assert registry.get("a") is None
+    assert registry.get("c") is None
+    assert registry.list_tasks(name="slow") == []
+    assert {entry.task_id for entry in registry.list_tasks()} == {"b", "d"}
+
+    # In-flight tasks are kept past max_tasks until they finish
+    registry.update("e", "PENDING")
+    assert len(registry) == 3
+    registry.update("b", "SUCCESS")
+    assert len(registry) == 2
+    assert registry.get("b") is None
+
+
+def test_registry_in_flight_hard_cap():
+    """Test that the least recently updated in-flight tasks are evicted past max_in_flight."""
+    registry = TaskRegistry(max_tasks=1, max_in_flight=2)
+    registry.update("a", "ACTIVE")
+    registry.update("b", "ACTIVE")
+    registry.update("a", "RETRY")
+    registry.update("c", "ACTIVE")
+
+    assert registry.get("b") is None
+    assert {entry.task_id for entry in registry.list_tasks()} == {"a", "c"}
+
+
+def test_consumer_feeds_registry():
+    """Test that the consumer wires the receiver to the registry and stops cleanly."""
+    registry = TaskRegistry()
+    app = MagicMock()
+    consumer = TaskEventsConsumer(registry, app=app)
+
+    def capture(**kwargs):
+        handler = app.events.Receiver.call_args.kwargs["handlers"]["*"]
+        handler({"type": "task-started", "uuid": "t1"})
+        consumer._stopped.set()
+
+    app.events.Receiver.return_value.capture.side_effect = capture
+
+    consumer.start()
+    consumer.stop()
+
+    assert registry.get("t1").state == "ACTIVE"
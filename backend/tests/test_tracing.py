@@ -0,0 +1,225 @@
+"""Tests for trace propagation from HTTP request to Celery task to SQL."""
+import json
+import time
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.celery_app import PUBLISHED_AT_HEADER, celery_app
+from app.main import app
+from app.publisher import task_publisher
+from app.tasks import slow_task
+from app.tracing import (
+    TRACEPARENT_HEADER,
+    InMemoryExporter,
+    JsonFileExporter,
+    SpanContext,
+    connect_signals,
+    format_trace,
+    load_exporter,
+    load_spans,
+    on_task_failure,
+    on_task_postrun,
+    on_task_prerun,
+    parse_traceparent,
+    set_exporter,
+    start_span,
+)
+
+client = TestClient(app)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def exporter():
+    """Trace into an in-memory exporter for the duration of a test."""
+    connect_signals()
+    exporter = InMemoryExporter()
+    set_exporter(exporter)
+    yield exporter
+    set_exporter(None)
+
+
+def spans_by_name(exporter):
+    return {span.name: span for span in exporter.spans}
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        (f"00-{TRACE_ID}-{PARENT_ID}-01", SpanContext(TRACE_ID, PARENT_ID)),
+        (f"00-{TRACE_ID}-{PARENT_ID}-00", SpanContext(TRACE_ID, PARENT_ID)),
+        (f"00-{'0' * 32}-{PARENT_ID}-01", None),
+        (f"00-{TRACE_ID}-{'0' * 16}-01", None),
+        (f"01-{TRACE_ID}-{PARENT_ID}-01", None),
+        ("garbage", None),
+        (None, None),
+    ],
+)
+def test_parse_traceparent(value, expected):
+    """Test that only valid W3C traceparent values are accepted."""
+    assert parse_traceparent(value) == expected
+
+
+def test_spans_are_noops_when_disabled():
+    """Test that no span is created without an exporter."""
+    with start_span("disabled") as span:
+        assert span is None
+
+
+def test_nested_spans(exporter):
+    """Test that spans opened inside another share its trace and point to it."""
+    with start_span("outer") as outer, start_span("inner") as inner:
+        pass
+
+    assert [span.name for span in exporter.spans] == ["inner", "outer"]
+    assert inner.trace_id == outer.trace_id
+    assert inner.parent_id == outer.span_id
+    assert outer.parent_id is None
+    assert outer.duration >= inner.duration >= 0
+
+
+def test_span_records_errors(exporter):
+    """Test that an exception escaping a span marks it failed."""
+    with pytest.raises(ValueError), start_span("failing"):
+        raise ValueError("boom")
+
+    span = exporter.spans[0]
+    assert span.status == "error"
+    assert span.attributes["error.type"] == "ValueError"
+    assert span.attributes["error.message"] == "boom"
+
+
+def test_request_span_continues_incoming_trace(exporter):
+    """Test that HTTP requests continue the caller's trace under their route template."""
+    response = client.get(
+        "/tasks/12345678-1234-5678-1234-567812345678",
+        headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"},
+    )
+
+    assert response.status_code == 200
+    span = spans_by_name(exporter)["GET /tasks/{task_id}"]
+    assert (span.trace_id, span.parent_id, span.kind) == (TRACE_ID, PARENT_ID, "server")
+    assert span.attributes["http.status_code"] == 200
+    assert span.attributes["http.target"] == "/tasks/12345678-1234-5678-1234-567812345678"
+
+
+@pytest.mark.asyncio
+async def test_publish_propagates_context(exporter):
+    """Test that the publish span is recorded and travels in the task's headers."""
+    with start_span("request") as request:
+        result = await task_publisher.apply_async(slow_task, args=(1,), queue="tracing-test")
+    with celery_app.connection_for_read() as connection:
+        message = connection.default_channel.basic_get("tracing-test")
+
+    publish = spans_by_name(exporter)["publish app.tasks.slow_task"]
+    assert publish.parent_id == request.span_id
+    assert publish.kind == "producer"
+    assert publish.attributes["celery.task_id"] == result.id
+    assert parse_traceparent(message.headers[TRACEPARENT_HEADER]) == SpanContext(
+        request.trace_id, publish.span_id
+    )
+
+
+def fake_task(headers):
+    return SimpleNamespace(name="tests.traced_task", request=SimpleNamespace(get=headers.get))
+
+
+def test_task_spans_join_the_publishing_trace(exporter):
+    """Test that queue wait and execution (with its SQL) are traced under the publisher."""
+    engine = create_engine("sqlite://")
+    task = fake_task(
+        {
+            TRACEPARENT_HEADER: f"00-{TRACE_ID}-{PARENT_ID}-01",
+            PUBLISHED_AT_HEADER: time.time() - 2,
+        }
+    )
+
+    on_task_prerun(task_id="trace-1", task=task)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    on_task_postrun(task_id="trace-1", task=task, state="SUCCESS")
+
+    spans = spans_by_name(exporter)
+    queue, execution, sql = (
+        spans["queue tests.traced_task"],
+        spans["task tests.traced_task"],
+        spans["db SELECT"],
+    )
+    assert {queue.trace_id, execution.trace_id, sql.trace_id} == {TRACE_ID}
+    assert queue.parent_id == execution.parent_id == PARENT_ID
+    assert sql.parent_id == execution.span_id
+    assert queue.duration >= 2
+    assert queue.end <= execution.start
+    assert execution.attributes["celery.state"] == "SUCCESS"
+    assert sql.attributes["db.statement"] == "SELECT 1"
+
+
+def test_failed_task_span(exporter):
+    """Test that a failed task's span carries the exception."""
+    task = fake_task({})
+
+    on_task_prerun(task_id="trace-2", task=task)
+    on_task_failure(task_id="trace-2", exception=RuntimeError("db down"))
+    on_task_postrun(task_id="trace-2", task=task, state="FAILURE")
+
+    span = spans_by_name(exporter)["task tests.traced_task"]
+    assert span.status == "error"
+    assert span.attributes["error.type"] == "RuntimeError"
+    assert span.parent_id is None
+
+
+def test_sql_spans(exporter):
+    """Test that statements and commits are traced inside a span, and only there."""
+    engine = create_engine("sqlite://")
+    with Session(engine) as session:
+        session.execute(text("CREATE TABLE t (x INTEGER)"))
+        session.commit()
+        with start_span("work") as work:
+            session.execute(text("INSERT INTO t VALUES (1)"))
+            session.commit()
+
+    assert [span.name for span in exporter.spans] == ["db INSERT", "db COMMIT", "work"]
+    assert all(span.parent_id == work.span_id for span in exporter.spans[:2])
+    assert exporter.spans[0].attributes["db.rowcount"] == 1
+
+
+def test_sql_error_span(exporter):
+    """Test that a failing statement closes its span as an error."""
+    engine = create_engine("sqlite://")
+    with pytest.raises(Exception), start_span("work"), engine.connect() as connection:
+        connection.execute(text("SELECT * FROM missing_table"))
+
+    span = spans_by_name(exporter)["db SELECT"]
+    assert span.status == "error"
+    assert span.attributes["error.type"] == "OperationalError"
+
+
+def test_json_file_exporter(tmp_path):
+    """Test that spans are appended as JSON lines that render as a trace tree."""
+    path = tmp_path / "traces.jsonl"
+    set_exporter(JsonFileExporter(str(path)))
+    try:
+        with start_span("POST /tasks/"), start_span("publish app.tasks.create_message_task"):
+            pass
+    finally:
+        set_exporter(None)
+
+    spans = load_spans(str(path))
+    assert [json.loads(line)["name"] for line in path.read_text().splitlines()] == [
+        "publish app.tasks.create_message_task",
+        "POST /tasks/",
+    ]
+    tree = format_trace(spans).splitlines()
+    assert tree[0].endswith("POST /tasks/")
+    assert tree[1].endswith("  publish app.tasks.create_message_task")
+
+
+def test_load_exporter():
+    """Test that exporters are configured by import path."""
+    assert isinstance(load_exporter("app.tracing:InMemoryExporter"), InMemoryExporter)